@@ -1,10 +1,32 @@
 #!/usr/bin/env python3
 """
-interactive_process_video.py
+Extract_persons_with_ID.py
 
 This script loads a YOLO model and processes a video by tracking objects every
-N-th frame, cropping the detected objects, and saving them to an output directory.
-It interactively asks for parameters via the command line.
+N-th frame (or every N seconds), cropping the detected objects, and saving them to
+an output directory. Skipped frames are not decoded. Sampled frames can either be
+tracked one at a time or detected in batches fed by a separate decode thread.
+Optionally, crops that are near-duplicates of the last saved crop of the same
+track are skipped and listed in duplicates.json instead. Every crop is also
+recorded in a per-video index (<video name>_index.npz) with its frame number,
+timestamp, track ID, bounding box and pose keypoints. With pose rules enabled,
+crops whose keypoints clearly show SIT/STD and HFN are labelled locally in
+<video name>_pose_labels.json instead of being saved for the vision model.
+With a motion threshold, sampled frames are only tracked when enough of the
+frame (or of a region-of-interest mask) changed since the last tracked frame, with
+an optional maximum gap between tracked frames.
+Optionally, per-stage timings (decode, inference, crop write) with p50/p95/p99
+latencies are saved to <video name>_metrics.json.
+Given videos, directories or glob patterns, it processes them without any prompts,
+in parallel across a process pool (or in this process for a single worker), one
+output subdirectory per video:
+
+    python Extract_persons_with_ID.py "recordings/*.mp4" --workers 8 --output output
+
+Every option can also come from a JSON config file (--config) or an EXTRACT_*
+environment variable (see cli_config.py). The options and videos are checked
+before OpenCV, ultralytics and the model are loaded, so a misconfigured job fails
+in well under a second.
  
 Requirements:
     pip install ultralytics opencv-python
@@ -14,87 +36,435 @@ import os
 # Workaround for OpenMP duplicate runtime error
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
-import cv2
-from ultralytics import YOLO
-
-def main():
-    print("=== YOLO Video Tracker and Cropper ===")
-    
-    # Get model path interactively.
-    model_path = input("Enter the path to the YOLO model file (default: yolov8n-pose.pt): ").strip()
-    if not model_path:
-        model_path = "yolov8n-pose.pt"
-    
-    # Get video file path.
-    video_path = input("Enter the video file path (default: example_data/example_video.mp4): ").strip()
-    if not video_path:
-        video_path = "example_data/example_video.mp4"
-    
-    # Get frame interval (e.g., process every N-th frame).
-    frame_interval_input = input("Enter the frame interval (default: 30): ").strip()
-    try:
-        frame_interval = int(frame_interval_input) if frame_interval_input else 30
-    except ValueError:
-        print("Invalid input. Using default frame interval of 30.")
-        frame_interval = 30
-
-    # Get output directory.
-    output_dir = input("Enter the output directory (default: output): ").strip()
-    if not output_dir:
-        output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Load the YOLO model.
-    print(f"Loading model from '{model_path}'...")
-    try:
-        model = YOLO(model_path)
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        return
+import argparse
+import glob
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cli_config import parse_args_with_config
+from crop_dedup import CropDeduplicator
+from crop_index import INDEX_SUFFIX, CropIndex
+from crop_writer import ARCHIVE_FORMATS, CropWriter
+from frame_sampling import MotionGate, batched, load_roi_mask, probe_video, sample_frames, threaded_frames
+from metrics import NULL_METRICS, ProgressLine, RunMetrics
+from pose_classifier import POSE_LABELS_SUFFIX, PoseClassifier
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+
+def crop_name(frame_count, track_id):
+    """Builds the name of a crop (without extension) from its frame number and tracking ID."""
+    return f"frame_{frame_count}_id_{int(track_id)}"
+
+def save_crops(frame, frame_count, boxes, track_ids, writer, deduplicator=None, duplicates=None, index=None,
+               keypoints=None, pose_classifier=None, pose_labels=None):
+    """Crops each tracked box out of the frame and queues it on the crop writer.
+
+    With a `deduplicator`, near-duplicate crops are not saved; `duplicates` maps
+    their names to the saved crop they duplicate. With a `pose_classifier`, crops
+    it labels from their `keypoints` are not saved either; their labels go into
+    `pose_labels` ("labels", plus "audit" for the ones still saved for the API).
+    Each crop, saved or skipped, is added to the crop `index` if one is given.
+    """
+    for position, (box, track_id) in enumerate(zip(boxes, track_ids)):
+        # Extract bounding box coordinates.
+        x1, y1, x2, y2 = map(int, box[:4])
+        # The crop is a view into the frame; every decoded frame is a new array, so it stays valid.
+        crop = frame[y1:y2, x1:x2]
+        name = crop_name(frame_count, track_id)
+        duplicate_of = None
+        if deduplicator is not None and crop.size:
+            duplicate_of = deduplicator.check(int(track_id), crop, name)
+        person_keypoints = keypoints[position] if keypoints is not None else None
+        if index is not None:
+            index.add(frame_count, int(track_id), (x1, y1, x2, y2), name, duplicate_of, person_keypoints)
+        if duplicate_of is not None:
+            duplicates[name] = duplicate_of
+            continue
+        if pose_classifier is not None:
+            resolved = pose_classifier.check(person_keypoints)
+            if resolved is not None:
+                labels, audit = resolved
+                pose_labels["labels"][name] = labels
+                if not audit:
+                    continue
+                pose_labels["audit"].append(name)
+        writer.submit(crop, name)
+
+def tracked_boxes(result):
+    """Returns (boxes, track_ids, keypoints) as numpy arrays for a tracking result, or None if nothing is tracked.
+
+    `keypoints` has shape (persons, 17, 3) with x, y and confidence, or is None for
+    models without pose output.
+    """
+    boxes = result.boxes
+    if boxes.id is None:
+        return None
+    keypoints = getattr(result, "keypoints", None)
+    keypoints = keypoints.data.cpu().numpy() if keypoints is not None else None
+    return boxes.xyxy.cpu().numpy(), boxes.id.cpu().numpy(), keypoints
+
+def track_frames(model, frames, verbose=True, metrics=NULL_METRICS):
+    """Tracks objects one frame at a time, yielding (frame_count, frame, boxes, track_ids, keypoints)."""
+    for frame_count, frame in frames:
+        if verbose:
+            print(f"Processing frame {frame_count}...")
+        try:
+            # Use the model to track objects on the current frame.
+            with metrics.timer("inference"):
+                results = model.track(frame, persist=True, verbose=verbose)
+            tracked = tracked_boxes(results[0])
+        except Exception as e:
+            print(f"Error processing frame {frame_count}: {e}")
+            continue
+        if tracked is not None:
+            yield (frame_count, frame, *tracked)
+
+def track_batches(model, frames, batch_size, verbose=True, metrics=NULL_METRICS):
+    """Tracks objects on batches of frames, yielding the same tuples as track_frames().
+
+    Ultralytics runs detection on the whole batch in one forward pass and then
+    updates its single tracker with each frame's detections in order, so tracking
+    IDs stay continuous across frames and batches.
+    """
+    for batch in batched(frames, batch_size):
+        if verbose:
+            print(f"Processing frames {batch[0][0]}-{batch[-1][0]}...")
+        try:
+            with metrics.timer("inference"):
+                results = model.track([frame for _, frame in batch], persist=True, verbose=False)
+            tracked = [tracked_boxes(result) for result in results]
+        except Exception as e:
+            print(f"Error processing frames {batch[0][0]}-{batch[-1][0]}: {e}")
+            continue
+        for (frame_count, frame), frame_tracked in zip(batch, tracked):
+            if frame_tracked is not None:
+                yield (frame_count, frame, *frame_tracked)
+
+def reset_tracker(model):
+    """Clears the tracker state kept by model.track(persist=True) so a new video starts fresh."""
+    predictor = getattr(model, "predictor", None)
+    for tracker in getattr(predictor, "trackers", None) or []:
+        tracker.reset()
+
+def extract_video(model, video_path, output_dir, frame_interval=30, seconds_interval=None, batch_size=1,
+                  image_format="jpg", quality=95, archive=None, dedup_distance=None, pose_confidence=None,
+                  pose_audit_every=20, motion_threshold=None, motion_max_interval=None, roi_mask=None,
+                  collect_metrics=False, progress_interval=None, verbose=True):
+    """Tracks and crops the persons in one video and returns a summary with timing.
+
+    With `dedup_distance`, a crop within that many hash bits of the last saved crop
+    of its track is skipped; the skipped crops are mapped to the saved crop whose
+    labels apply to them in `<video name>_duplicates.json`. All crops are listed with
+    their frame, timestamp, track ID, box and keypoints in `<video name>_index.npz`.
+
+    With `pose_confidence`, crops whose SIT/STD and HFN labels follow from keypoints
+    of at least that confidence are not saved; their labels are written to
+    `<video name>_pose_labels.json`. One in `pose_audit_every` of them is still saved
+    and listed under "audit", so the rules can be compared with the MLLM labels.
+
+    With `motion_threshold`, a sampled frame is only tracked and cropped if at least
+    that fraction of it changed since the last tracked frame (see MotionGate), so
+    the frame or seconds interval becomes the highest sampling rate. A frame is still
+    tracked at least every `motion_max_interval` frames if given. `roi_mask` is the
+    path of a mask image; only its white pixels are compared.
+
+    With `collect_metrics`, per-stage timings and counters are written to
+    `<video name>_metrics.json`; `progress_interval` additionally prints a progress
+    line with ETA every that many seconds.
+
+    Raises IOError if the video or the ROI mask cannot be opened. KeyboardInterrupt is passed on
+    after the crops queued so far have been written.
+    """
+    import cv2
 
-    # Open the video file.
-    print(f"Opening video file '{video_path}'...")
+    motion_gate = None
+    if motion_threshold is not None:
+        motion_gate = MotionGate(motion_threshold, max_interval=motion_max_interval,
+                                 roi_mask=load_roi_mask(roi_mask) if roi_mask else None)
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
-        print(f"Error: Could not open video file: {video_path}")
-        return
+        raise IOError(f"Could not open video file: {video_path}")
+    os.makedirs(output_dir, exist_ok=True)
+    reset_tracker(model)
 
-    frame_count = 0
-    print("Processing video... (press CTRL+C to abort)")
-    try:
+    # Crops are encoded and written on background threads; one archive per video if requested.
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    metrics = RunMetrics(video_path) if collect_metrics else NULL_METRICS
+    writer = CropWriter(output_dir, image_format=image_format, quality=quality, archive=archive,
+                        archive_name=video_name, metrics=metrics)
+    deduplicator = CropDeduplicator(dedup_distance) if dedup_distance is not None else None
+    duplicates = {}
+    pose_classifier = None
+    pose_labels = {"labels": {}, "audit": []}
+    if pose_confidence is not None:
+        pose_classifier = PoseClassifier(min_confidence=pose_confidence, audit_every=pose_audit_every)
+        pose_labels["categories"] = list(pose_classifier.categories)
+    index = CropIndex(video_path, cap.get(cv2.CAP_PROP_FPS))
+    index_path = os.path.join(output_dir, f"{video_name}{INDEX_SUFFIX}")
+    sampled = [0]
+    frames_total = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    if seconds_interval and cap.get(cv2.CAP_PROP_FPS):
+        expected_samples = int(frames_total / cap.get(cv2.CAP_PROP_FPS) / seconds_interval) + 1
+    else:
+        expected_samples = int(frames_total // frame_interval) + 1
+
+    def counted(frames):
+        # Runs on the decode thread in batched mode, so "decode" is the time to grab and retrieve a sample.
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                break  # End of video
+            with metrics.timer("decode"):
+                item = next(frames, None)
+            if item is None:
+                return
+            sampled[0] += 1
+            metrics.count("sampled_frames")
+            yield item
 
-            if frame_count % frame_interval == 0:
-                print(f"Processing frame {frame_count}...")
+    start_time = time.time()
+    try:
+        with ProgressLine(metrics, "sampled_frames", expected_samples, progress_interval, unit="frames"):
+            # Only the sampled frames are decoded; the rest are skipped with grab().
+            frames = counted(sample_frames(cap, frame_interval, seconds_interval))
+            if motion_gate is not None:
+                # Checked next to decoding, so static frames never reach the model.
+                frames = motion_gate.filter(frames, metrics=metrics)
+            if batch_size > 1:
+                # Decode on a separate thread while the model works on the previous batch.
+                frames = threaded_frames(frames, max_queued=2 * batch_size)
+                tracked_frames = track_batches(model, frames, batch_size, verbose=verbose, metrics=metrics)
+            else:
+                tracked_frames = track_frames(model, frames, verbose=verbose, metrics=metrics)
+
+            for frame_count, frame, boxes, track_ids, keypoints in tracked_frames:
                 try:
-                    # Use the model to track objects on the current frame.
-                    results = model.track(frame, persist=True)
-                    # Loop through detections in the first result.
-                    for i, det in enumerate(results[0].boxes.xyxy):
-                        # Extract bounding box coordinates.
-                        x1, y1, x2, y2 = map(int, det[:4])
-                        crop = frame[y1:y2, x1:x2]
-                        # Save the cropped image with a unique name.
-                        crop_name = f"frame_{frame_count}_id_{results[0].boxes.id[i]}.jpg"
-                        crop_path = os.path.join(output_dir, crop_name)
-                        cv2.imwrite(crop_path, crop)
+                    with metrics.timer("crop"):
+                        save_crops(frame, frame_count, boxes, track_ids, writer, deduplicator, duplicates, index,
+                                   keypoints, pose_classifier, pose_labels)
                 except Exception as e:
                     print(f"Error processing frame {frame_count}: {e}")
+    finally:
+        cap.release()
+        writer.close()
+        index.save(index_path)
+        if deduplicator is not None:
+            with open(os.path.join(output_dir, f"{video_name}_duplicates.json"), 'w') as duplicates_file:
+                json.dump(duplicates, duplicates_file, indent=4)
+        if pose_classifier is not None:
+            with open(os.path.join(output_dir, f"{video_name}{POSE_LABELS_SUFFIX}"), 'w') as pose_file:
+                json.dump(pose_labels, pose_file, indent=4)
 
-            frame_count += 1
+    elapsed_time = time.time() - start_time
+    metrics_path = None
+    if metrics.enabled:
+        if motion_gate is not None:
+            metrics.count("tracked_frames", motion_gate.passed)
+        metrics.count("crops", writer.written)
+        metrics.count("failed_crops", writer.failed)
+        metrics.count("duplicate_crops", len(duplicates))
+        metrics.count("local_crops", len(pose_labels["labels"]) - len(pose_labels["audit"]))
+        metrics_path = os.path.join(output_dir, f"{video_name}_metrics.json")
+        metrics.write(metrics_path)
+    return {
+        "video": video_path,
+        "output": writer.archive_path or output_dir,
+        "index": index_path,
+        "sampled_frames": sampled[0],
+        "tracked_frames": motion_gate.passed if motion_gate is not None else sampled[0],
+        "crops": writer.written,
+        "failed_crops": writer.failed,
+        "duplicate_crops": len(duplicates),
+        "local_crops": len(pose_labels["labels"]) - len(pose_labels["audit"]),
+        "audit_crops": len(pose_labels["audit"]),
+        "seconds": round(elapsed_time, 2),
+        "frames_per_second": round(sampled[0] / elapsed_time, 2) if elapsed_time > 0 else 0.0,
+        "metrics": metrics_path,
+    }
 
-    except KeyboardInterrupt:
-        print("Processing interrupted by user.")
+def find_videos(patterns):
+    """Expands video files, directories and glob patterns into a sorted list of video paths."""
+    videos = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern)
+        videos.update(path for path in candidates
+                      if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS))
+    return sorted(videos)
 
-    except Exception as main_e:
-        print("An error occurred during video processing:", main_e)
+def video_output_dirs(videos, output_root):
+    """Gives each video its own output subdirectory, named after the video."""
+    output_dirs = {}
+    used = set()
+    for video_path in videos:
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        candidate, suffix = name, 1
+        # Videos with the same name from different directories must not share output.
+        while candidate in used:
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+        used.add(candidate)
+        output_dirs[video_path] = os.path.join(output_root, candidate)
+    return output_dirs
 
-    finally:
-        cap.release()
-        print("Video processing complete. Output saved in:", output_dir)
+_worker_model = None
+
+def _init_worker(model_path, torch_threads):
+    """Loads the YOLO model once per worker process."""
+    global _worker_model
+    from ultralytics import YOLO
+
+    if torch_threads:
+        # Split the cores between workers instead of every worker using all of them.
+        import torch
+        torch.set_num_threads(torch_threads)
+    _worker_model = YOLO(model_path)
+
+def _extract_in_worker(video_path, output_dir, options):
+    try:
+        return extract_video(_worker_model, video_path, output_dir, verbose=False, **options)
+    except Exception as e:
+        return {"video": video_path, "output": output_dir, "error": str(e)}
+
+def run_parallel(videos, output_root, model_path="yolov8n-pose.pt", workers=None, **options):
+    """Extracts crops from many videos across a process pool and returns per-video summaries.
+
+    `options` are passed to extract_video(). No more workers than videos are used,
+    and with a single worker the videos are processed in this process, which saves
+    starting a pool (and a second interpreter) for short single-video jobs. A
+    summary of all videos is also written to extraction_summary.json in `output_root`.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(videos)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    output_dirs = video_output_dirs(videos, output_root)
+    os.makedirs(output_root, exist_ok=True)
+
+    start_time = time.time()
+    summaries = []
+
+    def finished(summary):
+        summaries.append(summary)
+        if "error" in summary:
+            print(f"[{len(summaries)}/{len(videos)}] {summary['video']}: error: {summary['error']}")
+        else:
+            print(f"[{len(summaries)}/{len(videos)}] {summary['video']}: {summary['crops']} crops from "
+                  f"{summary['sampled_frames']} frames in {summary['seconds']:.1f} s "
+                  f"({summary['frames_per_second']:.2f} frames/s, {summary['duplicate_crops']} duplicates skipped, "
+                  f"{summary['local_crops']} labelled from keypoints)")
+
+    if workers == 1:
+        _init_worker(model_path, None)
+        for video_path in videos:
+            finished(_extract_in_worker(video_path, output_dirs[video_path], options))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, torch_threads)) as executor:
+            futures = [executor.submit(_extract_in_worker, video_path, output_dirs[video_path], options)
+                       for video_path in videos]
+            for future in as_completed(futures):
+                finished(future.result())
+
+    elapsed_time = time.time() - start_time
+    summaries.sort(key=lambda summary: summary["video"])
+    with open(os.path.join(output_root, "extraction_summary.json"), 'w') as summary_file:
+        json.dump({"seconds": round(elapsed_time, 2), "workers": workers, "videos": summaries}, summary_file, indent=4)
+    failed = sum(1 for summary in summaries if "error" in summary)
+    print(f"Processed {len(videos) - failed}/{len(videos)} videos in {elapsed_time:.1f} seconds "
+          f"with {workers} workers. Summary saved in {os.path.join(output_root, 'extraction_summary.json')}")
+    return summaries
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Track and crop persons in many videos in parallel.")
+    parser.add_argument("videos", nargs="+", help="Video files, directories or glob patterns.")
+    parser.add_argument("--model", default="yolov8n-pose.pt",
+                        help="YOLO model file; a bare official model name is downloaded if missing.")
+    parser.add_argument("--output", default="output", help="Output root; each video gets a subdirectory.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--frame-interval", type=int, default=30)
+    parser.add_argument("--seconds-interval", type=float, default=None,
+                        help="Sample one frame every N seconds instead of by frame interval.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Frames per inference batch.")
+    parser.add_argument("--format", dest="image_format", default="jpg", choices=("jpg", "png", "webp"))
+    parser.add_argument("--quality", type=int, default=95)
+    parser.add_argument("--archive", choices=ARCHIVE_FORMATS, default=None,
+                        help="Write each video's crops into one archive.")
+    parser.add_argument("--dedup-distance", type=int, default=None,
+                        help="Skip crops within this many hash bits (of 64) of their track's last saved crop.")
+    parser.add_argument("--pose-confidence", type=float, default=None,
+                        help="Label crops from keypoints of at least this confidence when SIT/STD and HFN are clear.")
+    parser.add_argument("--pose-audit-every", type=int, default=20,
+                        help="Still save one in N keypoint-labelled crops for comparison with the MLLM (0: none).")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="Only track sampled frames in which at least this fraction (0-1) changed.")
+    parser.add_argument("--motion-max-interval", type=int, default=None,
+                        help="With --motion-threshold, still track a frame at least every N frames.")
+    parser.add_argument("--roi-mask", default=None,
+                        help="Mask image; motion is only measured in its white pixels.")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Save per-stage timings and counters to <video name>_metrics.json.")
+    parser.add_argument("--progress-interval", type=float, default=None,
+                        help="With --metrics, print a progress line with ETA every N seconds.")
+    args = parse_args_with_config(parser, argv, "EXTRACT")
+    if not args.videos:
+        parser.error("no videos given")
+    if os.path.dirname(args.model) and not os.path.isfile(args.model):
+        parser.error(f"model file '{args.model}' does not exist")
+    if args.roi_mask and not os.path.isfile(args.roi_mask):
+        parser.error(f"ROI mask '{args.roi_mask}' does not exist")
+    if args.roi_mask and args.motion_threshold is None:
+        parser.error("--roi-mask requires --motion-threshold")
+    for name, value, low, high in (("--workers", args.workers, 1, None),
+                                   ("--frame-interval", args.frame_interval, 1, None),
+                                   ("--batch-size", args.batch_size, 1, None),
+                                   ("--quality", args.quality, 0, 100),
+                                   ("--dedup-distance", args.dedup_distance, 0, 64),
+                                   ("--pose-confidence", args.pose_confidence, 0, 1),
+                                   ("--pose-audit-every", args.pose_audit_every, 0, None),
+                                   ("--motion-threshold", args.motion_threshold, 0, 1),
+                                   ("--motion-max-interval", args.motion_max_interval, 1, None)):
+        if value is not None and (value < low or (high is not None and value > high)):
+            bound = f"between {low} and {high}" if high is not None else f"at least {low}"
+            parser.error(f"{name} must be {bound}")
+    for name, value in (("--seconds-interval", args.seconds_interval), ("--progress-interval", args.progress_interval)):
+        if value is not None and value <= 0:
+            parser.error(f"{name} must be positive")
+    if args.progress_interval is not None and not args.metrics:
+        parser.error("--progress-interval requires --metrics")
+    return args
+
+def readable_videos(videos):
+    """Returns the videos whose header can be read and prints the others, before any model is loaded."""
+    readable = []
+    for video_path in videos:
+        try:
+            probe_video(video_path)
+        except IOError as e:
+            print(f"Skipping {video_path}: {e}")
+            continue
+        readable.append(video_path)
+    return readable
+
+def cli(argv):
+    """Non-interactive entry point; returns the exit status (1 if any video was unreadable or failed)."""
+    args = parse_args(argv)
+    videos = find_videos(args.videos)
+    if not videos:
+        print("No videos found.")
+        return 1
+    readable = readable_videos(videos)
+    if not readable:
+        return 1
+    print(f"Found {len(readable)} videos.")
+    summaries = run_parallel(readable, args.output, model_path=args.model, workers=args.workers,
+                 frame_interval=args.frame_interval, seconds_interval=args.seconds_interval,
+                 batch_size=args.batch_size, image_format=args.image_format, quality=args.quality,
+                 archive=args.archive, dedup_distance=args.dedup_distance, pose_confidence=args.pose_confidence,
+                 pose_audit_every=args.pose_audit_every, motion_threshold=args.motion_threshold,
+                 motion_max_interval=args.motion_max_interval, roi_mask=args.roi_mask, collect_metrics=args.metrics,
+                 progress_interval=args.progress_interval)
+    failed = any("error" in summary for summary in summaries)
+    return 1 if failed or len(readable) < len(videos) else 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(cli(sys.argv[1:]))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+bench_api_batch.py
+
+Measures batch throughput of the OpenAI and Azure image analysis scripts against
+the local mock chat-completions server at several concurrency levels and numbers
+of images per request.
+
+Usage:
+    python benchmarks/bench_api_batch.py --images 200 --latency 0.5 --workers 1 8 32 --group-sizes 1 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_images_Azure_API
+import run_images_openai_API
+from mock_chat_server import start_server
+
+
+def make_dummy_images(directory, count, size=20000):
+    """Writes `count` placeholder .jpg files; the mock server never decodes them."""
+    for i in range(count):
+        with open(os.path.join(directory, f"frame_{i}_id_{i % 7}.jpg"), "wb") as f:
+            f.write(os.urandom(size))
+
+
+def run_case(name, server, func, *args, **kwargs):
+    requests_before = server.requests_served
+    start_time = time.time()
+    succeeded = func(*args, **kwargs)
+    elapsed_time = time.time() - start_time
+    rate = succeeded * 60 / elapsed_time if elapsed_time > 0 else 0.0
+    return name, succeeded, server.requests_served - requests_before, elapsed_time, rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch API throughput against a mock server.")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock server response delay in seconds.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rpm", type=int, default=0, help="Requests-per-minute limit, 0 for none.")
+    parser.add_argument("--tpm", type=int, default=0, help="Tokens-per-minute limit, 0 for none.")
+    parser.add_argument("--group-sizes", type=int, nargs="+", default=[1], help="Images per request.")
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        image_dir = os.path.join(work_dir, "images")
+        os.makedirs(image_dir)
+        make_dummy_images(image_dir, args.images)
+
+        for group_size in args.group_sizes:
+            for workers in args.workers:
+                output_dir = os.path.join(work_dir, f"openai_{workers}_{group_size}")
+                results.append(run_case(
+                    f"openai w={workers} k={group_size}", server, run_images_openai_API.process_directory,
+                    "mock-key", "your_prompt_here", image_dir, output_dir,
+                    max_workers=workers, requests_per_minute=args.rpm or None, tokens_per_minute=args.tpm or None,
+                    endpoint=f"{server.base_url}/v1/chat/completions", use_cache=False, group_size=group_size))
+
+                output_dir = os.path.join(work_dir, f"azure_{workers}_{group_size}")
+                results.append(run_case(
+                    f"azure w={workers} k={group_size}", server, run_images_Azure_API.process_directory,
+                    server.base_url, "gpt-4o", "mock-key", "your_prompt_here", image_dir, output_dir,
+                    max_workers=workers, requests_per_minute=args.rpm or None, tokens_per_minute=args.tpm or None,
+                    use_cache=False, group_size=group_size))
+    server.shutdown()
+
+    print()
+    print(f"{'case':<24}{'ok':>6}{'requests':>10}{'seconds':>10}{'images/min':>12}")
+    for name, succeeded, requests_sent, elapsed_time, rate in results:
+        print(f"{name:<24}{succeeded:>6}{requests_sent:>10}{elapsed_time:>10.2f}{rate:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+bench_batched_inference.py
+
+Compares the per-frame tracking path of Extract_persons_with_ID.py with batched
+tracking (decode thread + bounded queue + one forward pass per batch).
+Reports sampled frames per second and average CPU utilisation across all cores.
+Crops are not written, so only decoding and inference are measured.
+
+Usage:
+    python benchmarks/bench_batched_inference.py --video example_data/example_video.mp4 --batch-sizes 1 4 8 16
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+from ultralytics import YOLO
+
+from Extract_persons_with_ID import track_batches, track_frames
+from frame_sampling import sample_frames, threaded_frames
+
+
+def run_case(model_path, video_path, frame_interval, batch_size):
+    model = YOLO(model_path)
+    cap = cv2.VideoCapture(video_path)
+    # Warm up on the first frame so model fusing and allocation are not timed.
+    ret, frame = cap.read()
+    if ret:
+        model.predict(frame, verbose=False)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    sampled = [0]
+
+    def counted(frames):
+        for item in frames:
+            sampled[0] += 1
+            yield item
+
+    frames = counted(sample_frames(cap, frame_interval))
+    if batch_size > 1:
+        tracked_frames = track_batches(model, threaded_frames(frames, max_queued=2 * batch_size), batch_size)
+    else:
+        tracked_frames = track_frames(model, frames)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    tracks = 0
+    for _, _, _, track_ids, _ in tracked_frames:
+        tracks += len(track_ids)
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+    cap.release()
+    cpu_utilisation = cpu_time / wall_time / (os.cpu_count() or 1) if wall_time > 0 else 0.0
+    return batch_size, sampled[0], tracks, wall_time, cpu_utilisation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-frame vs. batched YOLO inference.")
+    parser.add_argument("--video", default="example_data/example_video.mp4")
+    parser.add_argument("--model", default="yolov8n-pose.pt")
+    parser.add_argument("--interval", type=int, default=30)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    results = [run_case(args.model, args.video, args.interval, batch_size) for batch_size in args.batch_sizes]
+
+    print()
+    print(f"{'mode':<16}{'frames':>8}{'tracks':>8}{'seconds':>10}{'frames/s':>10}{'CPU util':>10}")
+    for batch_size, frames_done, tracks, wall_time, cpu_utilisation in results:
+        mode = "per-frame" if batch_size == 1 else f"batch={batch_size}"
+        fps = frames_done / wall_time if wall_time > 0 else 0.0
+        print(f"{mode:<16}{frames_done:>8}{tracks:>8}{wall_time:>10.2f}{fps:>10.2f}{cpu_utilisation:>10.1%}")
+
+
+if __name__ == '__main__':
+    main()
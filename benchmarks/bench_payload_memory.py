@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+bench_payload_memory.py
+
+Measures the peak Python memory of requests in flight with tracemalloc, for the
+original payload building (base64 string -> request dict -> json.dumps) and for
+the pre-sized body written by request_body.py, at several concurrency levels.
+
+Every worker reads one large image from disk and posts it to the mock
+chat-completions server, whose latency keeps all requests in flight at the same
+time. The server runs in a separate process so its own buffers are not counted.
+
+Usage:
+    python benchmarks/bench_payload_memory.py --image-mb 4 --concurrency 1 8 32
+"""
+
+import argparse
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import numpy as np
+import requests
+
+from vision_client import CompatibleProvider, VisionClient
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(port, latency):
+    """Starts mock_chat_server.py in a subprocess and waits until it accepts connections."""
+    process = subprocess.Popen([sys.executable, os.path.join(BENCHMARK_DIR, "mock_chat_server.py"),
+                                "--port", str(port), "--latency", str(latency)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("The mock server did not start.")
+
+
+def json_dumps_request(endpoint, image_path, prompt_text):
+    """The original approach: base64 string in the request dict, serialised with json.dumps."""
+    with open(image_path, "rb") as image_file:
+        image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
+    data = {
+        "model": "mock",
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant"},
+            {"role": "user", "content": [
+                {"type": "text", "text": prompt_text},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}",
+                                                    "detail": "high"}}
+            ]}
+        ],
+        "max_tokens": 300,
+        "temperature": 0.1
+    }
+    response = requests.post(endpoint, headers={"Content-Type": "application/json"}, data=json.dumps(data))
+    return response.status_code == 200
+
+
+def streamed_request(client, image_path, prompt_text):
+    """The client's path: raw bytes base64-encoded straight into a pre-sized body."""
+    with open(image_path, "rb") as image_file:
+        image_bytes = image_file.read()
+    return client.analyze_image_bytes(prompt_text, image_bytes, label=image_path) is not None
+
+
+def measure(request, concurrency):
+    """Runs `concurrency` requests at once and returns (succeeded, peak traced bytes above the start)."""
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        succeeded = sum(executor.map(lambda _: request(), range(concurrency)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return succeeded, peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request payload memory with tracemalloc.")
+    parser.add_argument("--image-mb", type=float, default=4.0, help="Size of the test image in MB.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=1.0, help="Mock server latency in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = start_mock_server(port, args.latency)
+    endpoint = f"http://127.0.0.1:{port}/v1/chat/completions"
+    client = VisionClient(CompatibleProvider(f"http://127.0.0.1:{port}", "mock"))
+    prompt_text = "your_prompt_here"
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            image_path = os.path.join(work_dir, "frame.jpg")
+            size = int(args.image_mb * 1024 * 1024)
+            # Incompressible bytes; the payload size only depends on the file size.
+            np.random.default_rng(args.seed).integers(0, 256, size, dtype=np.uint8).tofile(image_path)
+
+            cases = [("json.dumps", lambda: json_dumps_request(endpoint, image_path, prompt_text)),
+                     ("pre-sized body", lambda: streamed_request(client, image_path, prompt_text))]
+            print(f"Image: {size / 1e6:.1f} MB, base64 {4 * ((size + 2) // 3) / 1e6:.1f} MB")
+            print(f"{'payload':<16}{'in flight':>10}{'ok':>6}{'peak MB':>10}{'per request MB':>16}{'x image':>9}")
+            for concurrency in args.concurrency:
+                for name, request in cases:
+                    succeeded, peak = measure(request, concurrency)
+                    per_request = peak / concurrency
+                    print(f"{name:<16}{concurrency:>10}{succeeded:>6}{peak / 1e6:>10.1f}"
+                          f"{per_request / 1e6:>16.2f}{per_request / size:>9.2f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
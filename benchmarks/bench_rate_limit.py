@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+bench_rate_limit.py
+
+Replayable rate-limit simulation: runs a batch against the mock chat-completions
+server while it enforces its own requests-per-minute quota and replays a scripted
+sequence of 429/503 responses, then reports achieved vs. allowed throughput and
+how many requests were throttled.
+
+Usage:
+    python benchmarks/bench_rate_limit.py --images 150 --server-rpm 300 --script "200*20,503*3,429*2,200*20,503"
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_images_openai_API
+from bench_api_batch import make_dummy_images
+from mock_chat_server import parse_status_script, start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate server-side rate limiting and transient errors.")
+    parser.add_argument("--images", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock server response delay in seconds.")
+    parser.add_argument("--server-rpm", type=int, default=300, help="Quota enforced by the mock server.")
+    parser.add_argument("--burst", type=int, default=5, help="Mock server quota bucket size.")
+    parser.add_argument("--client-rpm", type=int, default=0,
+                        help="Limit configured on the client, 0 to learn it from the response headers.")
+    parser.add_argument("--script", default="200*20,503*3,429*2,200*20,503",
+                        help="Status codes the server replays before applying its quota.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the backoff jitter.")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    server = start_server(latency=args.latency, requests_per_minute=args.server_rpm, burst=args.burst,
+                          status_script=parse_status_script(args.script), retry_after=1.0)
+    with tempfile.TemporaryDirectory() as work_dir:
+        image_dir = os.path.join(work_dir, "images")
+        os.makedirs(image_dir)
+        make_dummy_images(image_dir, args.images)
+
+        start_time = time.time()
+        succeeded = run_images_openai_API.process_directory(
+            "mock-key", "your_prompt_here", image_dir, os.path.join(work_dir, "output"),
+            max_workers=args.workers, requests_per_minute=args.client_rpm or None,
+            endpoint=f"{server.base_url}/v1/chat/completions")
+        elapsed_time = time.time() - start_time
+    server.shutdown()
+
+    # The server lets a full bucket through up front and then refills at its quota rate.
+    allowed = args.burst + args.server_rpm * elapsed_time / 60
+    print()
+    print(f"Server responses:     {dict(sorted(server.status_counts.items()))}")
+    print(f"Succeeded:            {succeeded}/{args.images} in {elapsed_time:.1f} seconds")
+    print(f"Achieved throughput:  {succeeded * 60 / elapsed_time:.1f} requests/minute")
+    print(f"Allowed throughput:   {args.server_rpm} requests/minute")
+    print(f"Quota utilisation:    {succeeded / allowed:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+mock_chat_server.py
+
+Local stand-in for the OpenAI and Azure chat-completions endpoints. It accepts
+the same request bodies as the real services and answers with a fixed reply
+after a configurable delay, so the batch scripts can be benchmarked without
+network access or API cost. Requests with several images get one numbered
+"Image <n>: <reply>" line per image, like a grouped request asks for.
+
+The server can also enforce its own requests-per-minute quota (answering 429
+with Retry-After and x-ratelimit-* headers like the real APIs) and replay a
+scripted sequence of status codes, e.g. "200*20,429*3,503,200*10". For
+longer runs, a seeded random fraction of requests can fail with 500/503, and the
+latency can vary uniformly by +/- a jitter, so runs are reproducible.
+
+Requests asking for structured output (response_format or a forced tool call)
+get the reply's labels as JSON, in message content or as tool call arguments. A
+seeded fraction of those can be answered with malformed JSON (--invalid-rate) to
+exercise the validation and re-queueing of invalid replies.
+
+Usage:
+    python benchmarks/mock_chat_server.py --port 8000 --latency 0.5 --rpm 120 --script "200*5,503*2"
+    python benchmarks/mock_chat_server.py --latency 0.5 --jitter 0.2 --error-rate 0.05 --seed 1
+    python benchmarks/mock_chat_server.py --invalid-rate 0.1 --seed 1
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "SIT, ART"
+
+
+def parse_status_script(script):
+    """Expands a script such as "200*3,429,503*2" into a list of status codes."""
+    statuses = []
+    for part in (script or "").split(','):
+        part = part.strip()
+        if not part:
+            continue
+        code, _, repeat = part.partition('*')
+        statuses.extend([int(code)] * int(repeat or 1))
+    return statuses
+
+
+def count_images(request):
+    """Returns the number of image parts in a chat-completions request body."""
+    images = 0
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            images += sum(1 for part in content if part.get("type") == "image_url")
+    return images
+
+
+def structured_reply(reply, images, valid=True):
+    """Returns the labels of a comma-separated reply as the JSON a structured request asks for."""
+    labels = [label.strip() for label in reply.split(',') if label.strip()]
+    if images > 1:
+        content = json.dumps({"images": [{"image": number, "labels": labels} for number in range(1, images + 1)]})
+    else:
+        content = json.dumps({"labels": labels})
+    # A truncated object stands in for a reply that does not follow the format.
+    return content if valid else content[:len(content) // 2]
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    """Answers POST requests to any path ending in /chat/completions."""
+
+    def do_POST(self):
+        if not self.path.split('?')[0].endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self.send_error(400, "Invalid JSON body")
+            return
+
+        time.sleep(self.server.request_latency())
+        status, headers = self.server.admit()
+        if status != 200:
+            message = "Rate limit exceeded" if status == 429 else "Mock server error"
+            self._send_json(status, {"error": {"code": str(status), "message": message}}, headers)
+            return
+
+        reply = self.server.reply
+        images = count_images(request)
+        structured = "response_format" in request or "tool_choice" in request
+        if structured:
+            reply = structured_reply(reply, images, valid=self.server.valid_reply())
+        elif images > 1:
+            reply = "\n".join(f"Image {number}: {reply}" for number in range(1, images + 1))
+        message = {"role": "assistant", "content": reply}
+        if "tool_choice" in request:
+            tool_name = request["tool_choice"].get("function", {}).get("name", "tool")
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call-mock", "type": "function", "function": {"name": tool_name, "arguments": reply}}]}
+        # Roughly four bytes of request body per prompt token, like the client-side estimate.
+        prompt_tokens = len(body) // 4
+        completion_tokens = len(reply) // 4 + 1
+        payload = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+        self._send_json(200, payload, headers)
+
+    def _send_json(self, status, payload, headers=None):
+        encoded = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable.
+        pass
+
+
+class MockChatServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock configuration, quota and status counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, reply=DEFAULT_REPLY, requests_per_minute=None,
+                 status_script=None, retry_after=1.0, burst=None, jitter=0.0, error_rate=0.0, invalid_rate=0.0,
+                 seed=None):
+        super().__init__(address, MockChatHandler)
+        self.latency = latency
+        self.reply = reply
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst or requests_per_minute
+        self.retry_after = retry_after
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.invalid_rate = invalid_rate
+        self._random = random.Random(seed)
+        self.status_counts = {}
+        self._script = list(status_script or [])
+        self._allowance = float(self.burst or 0)
+        self._last_refill = time.monotonic()
+        self._count_lock = threading.Lock()
+
+    @property
+    def requests_served(self):
+        """Number of requests answered with 200."""
+        return self.status_counts.get(200, 0)
+
+    def request_latency(self):
+        """Returns the delay for the next request: the latency plus or minus a random jitter."""
+        if not self.jitter:
+            return self.latency
+        with self._count_lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def valid_reply(self):
+        """Decides whether the next structured reply is well-formed."""
+        if not self.invalid_rate:
+            return True
+        with self._count_lock:
+            return self._random.random() >= self.invalid_rate
+
+    def admit(self):
+        """Decides the status of the next request and the rate-limit headers to send."""
+        with self._count_lock:
+            headers = {}
+            status = self._script.pop(0) if self._script else 200
+            if status == 200 and self.error_rate and self._random.random() < self.error_rate:
+                status = self._random.choice((500, 503))
+            if self.requests_per_minute:
+                now = time.monotonic()
+                rate = self.requests_per_minute / 60.0
+                self._allowance = min(float(self.burst),
+                                      self._allowance + (now - self._last_refill) * rate)
+                self._last_refill = now
+                if status == 200:
+                    if self._allowance >= 1:
+                        self._allowance -= 1
+                    else:
+                        status = 429
+                reset = max(0.0, (1 - self._allowance) / rate)
+                headers = {
+                    "x-ratelimit-limit-requests": str(self.requests_per_minute),
+                    "x-ratelimit-remaining-requests": str(int(self._allowance)),
+                    "x-ratelimit-reset-requests": f"{reset:.3f}s",
+                }
+                if status == 429:
+                    headers["Retry-After"] = f"{max(reset, 0.001):.3f}"
+            if status == 429 and "Retry-After" not in headers:
+                headers["Retry-After"] = str(self.retry_after)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            return status, headers
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(host="127.0.0.1", port=0, latency=0.5, reply=DEFAULT_REPLY, requests_per_minute=None,
+                 status_script=None, retry_after=1.0, burst=None, jitter=0.0, error_rate=0.0, invalid_rate=0.0,
+                 seed=None):
+    """Starts a mock server on a background thread and returns it (port 0 picks a free port)."""
+    server = MockChatServer((host, port), latency=latency, reply=reply, requests_per_minute=requests_per_minute,
+                            status_script=status_script, retry_after=retry_after, burst=burst, jitter=jitter,
+                            error_rate=error_rate, invalid_rate=invalid_rate, seed=seed)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock chat-completions endpoint for benchmarking.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before answering.")
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="Assistant message content to return.")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests-per-minute quota to enforce, 0 for none.")
+    parser.add_argument("--burst", type=int, default=0, help="Quota bucket size, defaults to --rpm.")
+    parser.add_argument("--script", default="", help='Status codes to replay first, e.g. "200*5,429*2,503".')
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds for scripted 429s.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Vary the latency uniformly by +/- this many seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500/503.")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="Fraction of structured replies answered with malformed JSON.")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for jitter and injected errors.")
+    args = parser.parse_args()
+
+    server = MockChatServer((args.host, args.port), latency=args.latency, reply=args.reply,
+                            requests_per_minute=args.rpm or None, status_script=parse_status_script(args.script),
+                            retry_after=args.retry_after, burst=args.burst or None, jitter=args.jitter,
+                            error_rate=args.error_rate, invalid_rate=args.invalid_rate, seed=args.seed)
+    print(f"Mock chat-completions server listening on {server.base_url}")
+    print(f"  OpenAI endpoint: {server.base_url}/v1/chat/completions")
+    print(f"  Azure base URL:  {server.base_url}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
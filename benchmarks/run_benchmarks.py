@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+run_benchmarks.py
+
+Reproducible benchmark suite for the whole pipeline. Every scenario runs on
+synthetic data (synthetic_data.py) and, for the API, against the local mock
+chat-completions server, so it needs no GPU, network, recordings or API key:
+
+- extraction:  decode/sampling frames per second on a synthetic video, the share
+               of frames the motion gate passes on, plus full tracking and
+               cropping if a YOLO model file is given,
+- api_batch:   images per minute of both batch scripts at several concurrency
+               levels, with configurable latency, rate limit and error injection,
+- aggregation: JSON-to-table conversion and track aggregation rows per second,
+- html:        HTML report generation time, with and without thumbnails.
+
+Results are written as JSON together with the commit and machine they were
+measured on. Passing an earlier result file with --compare prints the change of
+every number, so regressions between commits are easy to spot.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --scenarios api_batch html --compare bench.json --output bench_new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "processing"))
+
+from mock_chat_server import start_server
+from synthetic_data import make_crop_index, make_crops, make_json_outputs, make_video
+
+SCENARIOS = ("extraction", "api_batch", "aggregation", "html")
+
+
+def timed(func, *args, **kwargs):
+    """Returns (result, seconds) of one call."""
+    start_time = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+def per_second(count, seconds):
+    return round(count / seconds, 2) if seconds > 0 else None
+
+
+def bench_extraction(args, work_dir):
+    import cv2
+
+    from frame_sampling import MotionGate, read_every_frame, sample_frames
+
+    video_path = os.path.join(work_dir, "synthetic.mp4")
+    make_video(video_path, frames=args.frames, seed=args.seed)
+    results = {"frames": args.frames, "frame_interval": args.frame_interval}
+    for name, sampler in (("read_every_frame", read_every_frame), ("grab_sampling", sample_frames)):
+        cap = cv2.VideoCapture(video_path)
+        sampled, seconds = timed(lambda: sum(1 for _ in sampler(cap, args.frame_interval)))
+        cap.release()
+        results[name] = {"sampled": sampled, "seconds": round(seconds, 3),
+                         "video_frames_per_second": per_second(args.frames, seconds)}
+
+    gate = MotionGate(args.motion_threshold)
+    cap = cv2.VideoCapture(video_path)
+    tracked, seconds = timed(lambda: sum(1 for _ in gate.filter(sample_frames(cap, args.frame_interval))))
+    cap.release()
+    results["motion_gate"] = {"sampled": gate.checked, "tracked": tracked, "seconds": round(seconds, 3),
+                              "video_frames_per_second": per_second(args.frames, seconds)}
+
+    if not args.yolo_model or not os.path.exists(args.yolo_model):
+        results["tracking"] = "skipped: pass --yolo-model with a local model file"
+        return results
+    from ultralytics import YOLO
+
+    from Extract_persons_with_ID import extract_video
+
+    model = YOLO(args.yolo_model)
+    for batch_size in args.batch_sizes:
+        summary = extract_video(model, video_path, os.path.join(work_dir, f"crops_{batch_size}"),
+                                frame_interval=args.frame_interval, batch_size=batch_size, verbose=False)
+        results[f"tracking_batch_{batch_size}"] = {key: summary[key] for key in
+                                                   ("sampled_frames", "crops", "seconds", "frames_per_second")}
+    return results
+
+
+def bench_api_batch(args, work_dir):
+    import run_images_Azure_API
+    import run_images_openai_API
+
+    image_dir = os.path.join(work_dir, "crops")
+    make_crops(image_dir, args.images, seed=args.seed)
+    results = {"images": args.images, "latency": args.latency, "rpm": args.rpm, "error_rate": args.error_rate}
+    for provider in ("openai", "azure"):
+        for workers in args.workers:
+            # A fresh server per case, so the seeded jitter and errors are the same for every case.
+            server = start_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                  seed=args.seed, requests_per_minute=args.rpm or None)
+            output_dir = os.path.join(work_dir, f"{provider}_{workers}")
+            options = dict(max_workers=workers, requests_per_minute=args.rpm or None, use_cache=False,
+                           collect_metrics=True)
+            if provider == "openai":
+                succeeded, seconds = timed(run_images_openai_API.process_directory, "mock-key", "your_prompt_here",
+                                           image_dir, output_dir,
+                                           endpoint=f"{server.base_url}/v1/chat/completions", **options)
+            else:
+                succeeded, seconds = timed(run_images_Azure_API.process_directory, server.base_url, "gpt-4o",
+                                           "mock-key", "your_prompt_here", image_dir, output_dir, **options)
+            server.shutdown()
+            with open(os.path.join(output_dir, "run_metrics.json")) as metrics_file:
+                metrics = json.load(metrics_file)
+            network = metrics["stages"].get("network", {})
+            results[f"{provider}_workers_{workers}"] = {
+                "succeeded": succeeded,
+                "seconds": round(seconds, 3),
+                "images_per_minute": round(succeeded * 60 / seconds, 1) if seconds > 0 else None,
+                "requests": metrics["counters"].get("requests", 0),
+                "retries": metrics["counters"].get("retries", 0),
+                "network_p50": network.get("p50"),
+                "network_p95": network.get("p95"),
+            }
+    return results
+
+
+def bench_aggregation(args, work_dir):
+    from crop_index import load_crop_index
+    from directory_json_to_excel import convert_directory
+    from track_aggregation import aggregate, join_labels, load_label_table
+
+    json_dir = os.path.join(work_dir, "json")
+    make_json_outputs(json_dir, args.rows, seed=args.seed)
+    index_path = make_crop_index(os.path.join(work_dir, "synthetic_index.npz"), args.rows)
+    results = {"rows": args.rows}
+    formats = ["csv"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        results["parquet"] = "skipped: pyarrow is not installed"
+    for output_format in formats:
+        (rows, _, _), seconds = timed(convert_directory, json_dir, os.path.join(work_dir, f"table.{output_format}"))
+        results[output_format] = {"rows": rows, "seconds": round(seconds, 3), "rows_per_second": per_second(rows, seconds)}
+
+    def track_aggregation():
+        timeline = join_labels(load_crop_index(index_path), load_label_table(os.path.join(work_dir, "table.csv")))
+        aggregate(timeline, os.path.join(work_dir, "track_aggregation"))
+        return len(timeline)
+
+    rows, seconds = timed(track_aggregation)
+    results["track_aggregation"] = {"rows": rows, "seconds": round(seconds, 3),
+                                    "rows_per_second": per_second(rows, seconds)}
+    return results
+
+
+def bench_html(args, work_dir):
+    from html_json_output_visualization import generate_html
+
+    json_dir = os.path.join(work_dir, "html_json")
+    image_dir = os.path.join(work_dir, "html_crops")
+    make_json_outputs(json_dir, args.html_items, seed=args.seed)
+    make_crops(image_dir, args.html_items, seed=args.seed)
+    results = {"items": args.html_items}
+    for name, thumbnail_size in (("full_images", None), ("thumbnails", 128)):
+        _, seconds = timed(generate_html, json_dir, image_dir, os.path.join(work_dir, f"report_{name}.html"),
+                           thumbnail_size=thumbnail_size)
+        results[name] = {"seconds": round(seconds, 3), "items_per_second": per_second(args.html_items, seconds)}
+    return results
+
+
+def environment():
+    """Describes the commit and machine the results were measured on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def flatten(results, prefix=""):
+    """Flattens nested results into {"scenario.case.metric": number}."""
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(previous, current):
+    """Prints every number present in both result files with its relative change."""
+    before = flatten(previous["scenarios"])
+    after = flatten(current["scenarios"])
+    print(f"\nChanges since {previous['environment'].get('commit')} ({previous['environment'].get('timestamp')}):")
+    for name in sorted(set(before) & set(after)):
+        change = (after[name] - before[name]) / before[name] if before[name] else 0.0
+        print(f"  {name:<60}{before[name]:>12}{after[name]:>12}{change:>+9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the reproducible pipeline benchmarks.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results.")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=600, help="Frames of the synthetic video.")
+    parser.add_argument("--frame-interval", type=int, default=30)
+    parser.add_argument("--motion-threshold", type=float, default=0.002,
+                        help="Changed fraction for the motion gate case.")
+    parser.add_argument("--yolo-model", help="Local YOLO model file; without it tracking is skipped.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--images", type=int, default=200, help="Crops sent in the API scenario.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock server latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Mock server latency jitter in seconds.")
+    parser.add_argument("--rpm", type=int, default=0, help="Mock server requests-per-minute quota, 0 for none.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock requests failing with 5xx.")
+    parser.add_argument("--rows", type=int, default=20000, help="JSON files in the aggregation scenario.")
+    parser.add_argument("--html-items", type=int, default=2000, help="Items in the HTML scenario.")
+    args = parser.parse_args()
+
+    benchmarks = {"extraction": bench_extraction, "api_batch": bench_api_batch,
+                  "aggregation": bench_aggregation, "html": bench_html}
+    results = {"environment": environment(), "settings": vars(args), "scenarios": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scenario in args.scenarios:
+            print(f"Running {scenario}...")
+            scenario_dir = os.path.join(work_dir, scenario)
+            os.makedirs(scenario_dir)
+            results["scenarios"][scenario] = benchmarks[scenario](args, scenario_dir)
+
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=4)
+    print(json.dumps(results["scenarios"], indent=4))
+    print(f"Results saved to {args.output}")
+    if args.compare:
+        with open(args.compare) as previous_file:
+            compare(json.load(previous_file), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+synthetic_data.py
+
+Deterministic synthetic inputs for the benchmarks, so every stage can be timed
+on a plain machine without the study recordings:
+
+- a classroom-like video with a few "students" (filled silhouettes) that shift,
+  lean and occasionally stand up,
+- a directory of person-sized JPEG crops named like the extractor's output,
+- the matching API responses as JSON files, in the format the batch scripts write,
+- a crop index for the same crops, as written by the extractor.
+
+Everything is generated from a seed, so two runs produce identical files.
+
+Usage:
+    python benchmarks/synthetic_data.py --video synthetic.mp4 --frames 300
+    python benchmarks/synthetic_data.py --crops crops --json json --count 1000
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+CATEGORIES = ['SIT', 'STD', 'ECP', 'ART', 'HTR', 'HFN', 'HTC', 'LTB', 'HRL']
+
+
+def draw_person(frame, x, y, scale, standing, color):
+    """Draws a simple silhouette (head, torso, arms, legs) with its feet line at `y`."""
+    height = int((170 if standing else 120) * scale)
+    head = int(14 * scale)
+    top = y - height
+    cv2.circle(frame, (x, top + head), head, color, -1)
+    cv2.rectangle(frame, (x - int(22 * scale), top + 2 * head), (x + int(22 * scale), top + int(height * 0.6)),
+                  color, -1)
+    arm_y = top + int(height * 0.3)
+    cv2.line(frame, (x - int(22 * scale), arm_y), (x - int(40 * scale), arm_y + int(40 * scale)), color,
+             max(1, int(8 * scale)))
+    cv2.line(frame, (x + int(22 * scale), arm_y), (x + int(40 * scale), arm_y + int(40 * scale)), color,
+             max(1, int(8 * scale)))
+    hip_y = top + int(height * 0.6)
+    if standing:
+        for offset in (-10, 10):
+            cv2.line(frame, (x + int(offset * scale), hip_y), (x + int(offset * scale), y), color,
+                     max(1, int(10 * scale)))
+    else:
+        for offset in (-10, 10):
+            knee = (x + int((offset + 35) * scale), hip_y)
+            cv2.line(frame, (x + int(offset * scale), hip_y), knee, color, max(1, int(10 * scale)))
+            cv2.line(frame, knee, (knee[0], y), color, max(1, int(10 * scale)))
+
+
+def make_video(path, frames=300, fps=30.0, width=1280, height=720, persons=6, seed=0):
+    """Writes a synthetic classroom video and returns its path.
+
+    Students sit behind a row of desks, drift a few pixels from frame to frame and
+    now and then stand up for a few seconds, so tracking, sampling and
+    deduplication all have something to do.
+    """
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Could not open a video writer for {path}")
+    background = np.full((height, width, 3), 200, dtype=np.uint8)
+    background[int(height * 0.7):] = (120, 140, 160)
+    # Low-amplitude fixed noise so encoders and hashes see some texture.
+    background = cv2.add(background, rng.integers(0, 20, background.shape, dtype=np.uint8))
+    spacing = width // (persons + 1)
+    positions = np.array([[spacing * (i + 1), int(height * 0.8)] for i in range(persons)], dtype=float)
+    colors = [tuple(int(c) for c in rng.integers(20, 120, 3)) for _ in range(persons)]
+    standing_until = np.full(persons, -1)
+    try:
+        for number in range(frames):
+            frame = background.copy()
+            positions[:, 0] += rng.normal(0, 0.6, persons)
+            stand = (standing_until < number) & (rng.random(persons) < 0.2 / fps)
+            standing_until[stand] = number + int(fps * rng.uniform(1, 4))
+            for i in range(persons):
+                draw_person(frame, int(positions[i, 0]), int(positions[i, 1]), height / 720,
+                            standing_until[i] >= number, colors[i])
+            cv2.rectangle(frame, (0, int(height * 0.68)), (width, int(height * 0.72)), (90, 70, 50), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def crop_names(count, tracks=12):
+    """Returns `count` extractor-style crop names, `tracks` students per sampled frame."""
+    return [f"frame_{(i // tracks) * 30}_id_{i % tracks + 1}" for i in range(count)]
+
+
+def make_crops(directory, count, seed=0, min_side=80, max_side=400, quality=90):
+    """Writes `count` JPEG crops of random person-like sizes and returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for name in crop_names(count):
+        width = int(rng.integers(min_side, max_side // 2 + 1))
+        height = int(rng.integers(max(min_side, width), max_side + 1))
+        # Smooth random texture compresses like a photo rather than like pure noise.
+        small = rng.integers(0, 256, (max(2, height // 16), max(2, width // 16), 3), dtype=np.uint8)
+        image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+        path = os.path.join(directory, f"{name}.jpg")
+        cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        paths.append(path)
+    return paths
+
+
+def make_json_outputs(directory, count, seed=0):
+    """Writes `count` chat-completions responses with random category labels, one per crop name."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for name in crop_names(count):
+        labels = ["STD" if rng.random() < 0.1 else "SIT"]
+        labels += [category for category in CATEGORIES[2:] if rng.random() < 0.25]
+        result = {
+            "id": "chatcmpl-synthetic",
+            "object": "chat.completion",
+            "model": "synthetic",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": ", ".join(labels)},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 900, "completion_tokens": 6, "total_tokens": 906},
+        }
+        path = os.path.join(directory, f"{name}.json")
+        with open(path, "w") as json_file:
+            json.dump(result, json_file, indent=4)
+        paths.append(path)
+    return paths
+
+
+def make_crop_index(path, count, fps=30.0):
+    """Writes a crop index matching crop_names(count), as the extractor would."""
+    from crop_index import CropIndex
+
+    index = CropIndex("synthetic.mp4", fps)
+    for name in crop_names(count):
+        _, frame, _, track_id = name.split("_")
+        index.add(int(frame), int(track_id), (0, 0, 100, 200), name)
+    index.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark inputs.")
+    parser.add_argument("--video", help="Write a synthetic video to this path (.mp4).")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--persons", type=int, default=6)
+    parser.add_argument("--crops", help="Write synthetic crops into this directory.")
+    parser.add_argument("--json", help="Write synthetic API responses into this directory.")
+    parser.add_argument("--index", help="Write a crop index for the crops to this path (.npz).")
+    parser.add_argument("--count", type=int, default=1000, help="Number of crops / responses.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.video:
+        make_video(args.video, frames=args.frames, persons=args.persons, seed=args.seed)
+        print(f"Wrote {args.frames} frames to {args.video}")
+    if args.crops:
+        make_crops(args.crops, args.count, seed=args.seed)
+        print(f"Wrote {args.count} crops to {args.crops}")
+    if args.json:
+        make_json_outputs(args.json, args.count, seed=args.seed)
+        print(f"Wrote {args.count} responses to {args.json}")
+    if args.index:
+        make_crop_index(args.index, args.count)
+        print(f"Wrote a crop index of {args.count} crops to {args.index}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+cli_config.py
+
+Headless configuration for the command-line entry points. Every option of a
+script's argparse parser can also be set in a JSON config file (--config) or in
+an environment variable, so scheduled jobs need neither prompts nor long command
+lines. For an option such as --frame-interval of the extractor, the value is
+taken from the first of:
+
+    the command line        --frame-interval 15
+    the environment         EXTRACT_FRAME_INTERVAL=15
+    the config file         {"frame_interval": 15}
+    the parser default
+
+Config keys are the option names with underscores (dashes are accepted too);
+environment variables are the same names upper-cased after the script's prefix.
+The config file itself can also be given as <PREFIX>_CONFIG. Flags take
+true/false, yes/no, on/off or 1/0, and list options such as the extractor's
+videos take a JSON list in the config file and space-separated values in the
+environment. Values are converted and checked like command-line values, so a
+bad setting stops the script before it loads anything heavy.
+"""
+
+import argparse
+import json
+import os
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off", "")
+
+
+def load_config(path):
+    """Reads a JSON config file holding one object of option values."""
+    with open(path, "r") as config_file:
+        config = json.load(config_file)
+    if not isinstance(config, dict):
+        raise ValueError("expected a JSON object of option values")
+    return config
+
+
+def option_actions(parser):
+    """Maps each option destination of a parser to its argparse action."""
+    return {action.dest: action for action in parser._actions
+            if action.dest not in (argparse.SUPPRESS, "help", "config")}
+
+
+def convert_single(action, value):
+    if value is not None and action.type is not None:
+        # Through str() so that e.g. 1.5 for an int option fails instead of being truncated.
+        value = action.type(value if isinstance(value, str) else str(value))
+    if value is not None and action.choices is not None and value not in action.choices:
+        raise ValueError(f"{value!r} is not one of {', '.join(map(str, action.choices))}")
+    return value
+
+
+def convert_value(action, value):
+    """Converts a config file or environment value the way argparse converts the option."""
+    if action.nargs == 0:
+        # store_true / store_false: the value is the flag's resulting setting.
+        if isinstance(value, str):
+            text = value.strip().lower()
+            if text not in TRUE_VALUES + FALSE_VALUES:
+                raise ValueError(f"{value!r} is not a true/false value")
+            return text in TRUE_VALUES
+        return bool(value)
+    if action.nargs in ("+", "*") or isinstance(action.nargs, int):
+        values = value.split() if isinstance(value, str) else list(value)
+        return [convert_single(action, item) for item in values]
+    return convert_single(action, value)
+
+
+def parse_args_with_config(parser, argv, env_prefix):
+    """Parses `argv` with `parser`, taking missing options from --config and `<env_prefix>_*` variables.
+
+    Adds the --config option to the parser. A required option or positional that is
+    set in the config file or the environment is no longer required on the command
+    line. Unknown config keys and invalid values end the script with a usage error.
+    """
+    parser.add_argument("--config", help=f"JSON file of option values (or ${env_prefix}_CONFIG); "
+                                         f"options can also be set as ${env_prefix}_<OPTION> variables.")
+    pre_parser = argparse.ArgumentParser(add_help=False)
+    pre_parser.add_argument("--config")
+    config_path = pre_parser.parse_known_args(argv)[0].config or os.environ.get(f"{env_prefix}_CONFIG")
+
+    actions = option_actions(parser)
+    values = {}
+    if config_path:
+        try:
+            config = load_config(config_path)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read config file '{config_path}': {e}")
+        for key, value in config.items():
+            dest = key.replace("-", "_")
+            if dest not in actions:
+                parser.error(f"unknown option '{key}' in config file '{config_path}'")
+            values[dest] = (value, f"'{key}' in {config_path}")
+    for dest in actions:
+        variable = f"{env_prefix}_{dest.upper()}"
+        if variable in os.environ:
+            values[dest] = (os.environ[variable], f"${variable}")
+
+    defaults = {}
+    for dest, (value, source) in values.items():
+        action = actions[dest]
+        try:
+            defaults[dest] = convert_value(action, value)
+        except (TypeError, ValueError) as e:
+            parser.error(f"invalid value for {source}: {e}")
+        action.required = False
+        if action.nargs == "+":
+            # A positional list given elsewhere may be left out on the command line.
+            action.nargs = "*"
+    parser.set_defaults(**defaults)
+    return parser.parse_args(argv)
+
+
+def read_prompt(args):
+    """Returns the prompt text from --prompt or --prompt-file, or None if neither is set."""
+    if getattr(args, "prompt_file", None):
+        with open(args.prompt_file, "r") as prompt_file:
+            return prompt_file.read().strip()
+    return getattr(args, "prompt", None)
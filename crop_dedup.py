@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+crop_dedup.py
+
+Per-track deduplication of person crops. In classroom footage most students sit
+still for long stretches, so consecutive crops of the same tracking ID are nearly
+identical. Each crop gets a 64-bit difference hash (dHash); a crop whose hash is
+within `max_distance` bits of the last crop kept for its track is reported as a
+duplicate of that crop, so it can be skipped and the earlier labels reused.
+
+Requirements:
+    pip install opencv-python
+"""
+
+HASH_BITS = 64
+
+
+def dhash(image):
+    """Returns the 64-bit difference hash of a BGR or grayscale image.
+
+    The image is shrunk to 9x8 grayscale pixels and each bit records whether a
+    pixel is brighter than its right neighbour, so the hash ignores scale, small
+    shifts and compression noise.
+    """
+    import cv2
+
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(first, second):
+    """Returns the number of differing bits between two hashes."""
+    return bin(first ^ second).count("1")
+
+
+class CropDeduplicator:
+    """Remembers the hash of the last kept crop per track ID.
+
+    check() is meant to be called from a single thread, in frame order.
+    """
+
+    def __init__(self, max_distance=4):
+        self.max_distance = max_distance
+        self.checked = 0
+        self.duplicates = 0
+        self._last = {}
+
+    def check(self, track_id, crop, name):
+        """Returns the name of the kept crop that `crop` duplicates, or None if it should be kept.
+
+        A kept crop becomes the new reference for its track, so a slowly changing
+        posture is resubmitted once it drifts more than `max_distance` bits away.
+        """
+        self.checked += 1
+        crop_hash = dhash(crop)
+        last = self._last.get(track_id)
+        if last is not None and hamming_distance(crop_hash, last[0]) <= self.max_distance:
+            self.duplicates += 1
+            return last[1]
+        self._last[track_id] = (crop_hash, name)
+        return None
+
+    def summary(self):
+        """Returns a one-line report of the dedup ratio."""
+        ratio = self.duplicates / self.checked if self.checked else 0.0
+        return (f"Dedup: {self.duplicates}/{self.checked} crops were near-duplicates of their track's "
+                f"last kept crop ({ratio:.1%}, max distance {self.max_distance}/{HASH_BITS} bits).")
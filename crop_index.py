@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+crop_index.py
+
+Per-video index of the crops written by the extractor: one row per tracked
+person per sampled frame with the frame number, video timestamp, track ID,
+bounding box, crop name (the key of the crop's JSON output) and, with a pose
+model, the 17 body keypoints the model found for the person. It is saved next
+to the crops as a compressed NumPy archive, so the API labels can later be joined
+back to video time without parsing file names.
+
+Requirements:
+    pip install numpy
+"""
+
+import numpy as np
+
+INDEX_SUFFIX = "_index.npz"
+KEYPOINT_SHAPE = (17, 3)
+
+
+class CropIndex:
+    """Collects index rows for one video and saves them as `<video name>_index.npz`.
+
+    `duplicate_of` names the saved crop whose labels apply to a skipped
+    near-duplicate crop, and is empty for crops that were saved. `keypoints` is a
+    (17, 3) array of x, y, confidence in frame coordinates; crops without
+    keypoints (e.g. from a detection-only model) are stored as NaN.
+    """
+
+    def __init__(self, video, fps):
+        self.video = video
+        self.fps = fps
+        self._frames = []
+        self._track_ids = []
+        self._boxes = []
+        self._crops = []
+        self._duplicate_of = []
+        self._keypoints = []
+
+    def __len__(self):
+        return len(self._crops)
+
+    def add(self, frame, track_id, box, crop, duplicate_of="", keypoints=None):
+        self._frames.append(frame)
+        self._track_ids.append(track_id)
+        self._boxes.append(box)
+        self._crops.append(crop)
+        self._duplicate_of.append(duplicate_of or "")
+        self._keypoints.append(np.full(KEYPOINT_SHAPE, np.nan, dtype=np.float32) if keypoints is None
+                               else np.asarray(keypoints, dtype=np.float32).reshape(KEYPOINT_SHAPE))
+
+    def save(self, path):
+        frames = np.asarray(self._frames, dtype=np.int64)
+        timestamps = frames / self.fps if self.fps else np.full(len(frames), np.nan)
+        np.savez_compressed(
+            path,
+            video=np.asarray(self.video),
+            fps=np.asarray(self.fps or 0.0, dtype=np.float64),
+            frame=frames,
+            timestamp=timestamps.astype(np.float64),
+            track_id=np.asarray(self._track_ids, dtype=np.int64),
+            box=np.asarray(self._boxes, dtype=np.int32).reshape(-1, 4),
+            crop=np.asarray(self._crops, dtype=str),
+            duplicate_of=np.asarray(self._duplicate_of, dtype=str),
+            keypoints=np.asarray(self._keypoints, dtype=np.float32).reshape(-1, *KEYPOINT_SHAPE),
+        )
+
+
+def load_crop_index(path):
+    """Loads a saved index as a pandas DataFrame with one row per crop."""
+    import pandas as pd
+
+    with np.load(path) as data:
+        boxes = data["box"]
+        return pd.DataFrame({
+            "video": str(data["video"]),
+            "frame": data["frame"],
+            "timestamp": data["timestamp"],
+            "track_id": data["track_id"],
+            "x1": boxes[:, 0], "y1": boxes[:, 1], "x2": boxes[:, 2], "y2": boxes[:, 3],
+            "crop": data["crop"],
+            "duplicate_of": data["duplicate_of"],
+        })
+
+
+def load_crop_keypoints(path):
+    """Loads the keypoints of a saved index as a (crops, 17, 3) array in the row order of load_crop_index().
+
+    Indexes written before keypoints were recorded give an all-NaN array.
+    """
+    with np.load(path) as data:
+        if "keypoints" in data:
+            return data["keypoints"]
+        return np.full((len(data["crop"]), *KEYPOINT_SHAPE), np.nan, dtype=np.float32)
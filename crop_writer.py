@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+crop_writer.py
+
+Asynchronous crop writer for the video extractor. Crops are handed to a pool of
+writer threads through a bounded queue, so JPEG encoding and disk writes overlap
+with detection instead of stalling it. When the queue is full, submit() blocks,
+which keeps memory bounded on crowded frames.
+
+Crops can be written as individual files or collected into a single tar or zip
+archive per video, which avoids creating thousands of small files on network
+storage.
+
+Requirements:
+    pip install opencv-python
+"""
+
+import io
+import os
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+
+from metrics import NULL_METRICS
+
+ARCHIVE_FORMATS = ("tar", "zip")
+
+
+def encode_params(image_format, quality):
+    """Returns the cv2.imencode parameters for an output format and quality."""
+    import cv2
+
+    if image_format in ("jpg", "jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if image_format == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    return []
+
+
+class CropWriter:
+    """Encodes and stores crops on background threads.
+
+    `image_format` is the file extension to encode to (jpg, png or webp) and
+    `quality` the JPEG/WebP quality. With `archive` set to "tar" or "zip", all crops
+    go into `<output_dir>/<archive_name>.<archive>` instead of separate files.
+    With `metrics`, the time spent encoding and storing each crop and waiting for
+    queue space is recorded.
+    """
+
+    def __init__(self, output_dir, image_format="jpg", quality=95, workers=4, max_queued=64,
+                 archive=None, archive_name="crops", metrics=NULL_METRICS):
+        if archive is not None and archive not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format '{archive}', use one of {ARCHIVE_FORMATS}.")
+        self.output_dir = output_dir
+        self.image_format = image_format.lower().lstrip('.')
+        self.params = encode_params(self.image_format, quality)
+        self.written = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.metrics = metrics
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._archive = None
+        self.archive_path = None
+        if archive == "tar":
+            self.archive_path = os.path.join(output_dir, f"{archive_name}.tar")
+            self._archive = tarfile.open(self.archive_path, "w")
+        elif archive == "zip":
+            self.archive_path = os.path.join(output_dir, f"{archive_name}.zip")
+            # Encoded images are already compressed, so they are stored as-is.
+            self._archive = zipfile.ZipFile(self.archive_path, "w", compression=zipfile.ZIP_STORED)
+        self._workers = [threading.Thread(target=self._work, name=f"crop-writer-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, crop, name):
+        """Queues a crop to be saved as `name` plus the format extension; blocks while the queue is full."""
+        with self.metrics.timer("crop_queue_wait"):
+            self._queue.put((crop, f"{name}.{self.image_format}"))
+
+    def _work(self):
+        import cv2
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            crop, filename = item
+            try:
+                with self.metrics.timer("crop_write"):
+                    ok, encoded = cv2.imencode(f".{self.image_format}", crop, self.params)
+                    if not ok:
+                        raise ValueError("encoding failed")
+                    self._store(filename, encoded.tobytes())
+                self.metrics.count("crop_bytes", len(encoded))
+            except Exception as e:
+                print(f"Error writing crop '{filename}': {e}")
+                with self._lock:
+                    self.failed += 1
+
+    def _store(self, filename, data):
+        if self._archive is None:
+            with open(os.path.join(self.output_dir, filename), "wb") as crop_file:
+                crop_file.write(data)
+            with self._lock:
+                self.written += 1
+                self.bytes_written += len(data)
+            return
+        with self._lock:
+            if isinstance(self._archive, tarfile.TarFile):
+                info = tarfile.TarInfo(filename)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                self._archive.addfile(info, io.BytesIO(data))
+            else:
+                self._archive.writestr(filename, data)
+            self.written += 1
+            self.bytes_written += len(data)
+
+    def close(self):
+        """Waits for all queued crops to be written and closes the archive, if any."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        if self._archive is not None:
+            self._archive.close()
+
+    def summary(self):
+        """Returns a one-line report of what was written."""
+        destination = self.archive_path or self.output_dir
+        return (f"Wrote {self.written} crops ({self.bytes_written / 1e6:.1f} MB, {self.failed} failed) "
+                f"to {destination}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
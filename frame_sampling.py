@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+frame_sampling.py
+
+Frame samplers for the video extractor. Instead of decoding every frame with
+`cap.read()` and discarding most of them, skipped frames are only demuxed with
+`cap.grab()` (or jumped over with a seek for large gaps), and just the sampled
+frames are decoded with `cap.retrieve()`. A MotionGate can further drop sampled
+frames in which nothing moved (inside an optional region-of-interest mask), so
+static periods are not tracked again and again. OpenCV is imported on first use,
+so the entry points can check their options before paying for it.
+
+Requirements:
+    pip install opencv-python
+"""
+
+import queue
+import threading
+
+from metrics import NULL_METRICS
+
+
+def sample_frames(cap, frame_interval=30, seconds_interval=None, seek_threshold=None):
+    """Yields (frame_number, frame) for the sampled frames of an opened capture.
+
+    Every `frame_interval`-th frame is sampled, or, if `seconds_interval` is given,
+    one frame every `seconds_interval` seconds of video time regardless of FPS.
+    With `seek_threshold`, gaps of at least that many frames are skipped with a seek
+    instead of grabbing each frame (only useful for large intervals, since the
+    decoder has to restart from the previous keyframe).
+    """
+    import cv2
+
+    if seconds_interval:
+        yield from _sample_by_time(cap, seconds_interval)
+        return
+
+    frame_number = 0
+    next_sample = 0
+    while True:
+        gap = next_sample - frame_number
+        if seek_threshold and gap >= seek_threshold and cap.set(cv2.CAP_PROP_POS_FRAMES, next_sample):
+            frame_number = next_sample
+        else:
+            for _ in range(gap):
+                if not cap.grab():
+                    return
+                frame_number += 1
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield frame_number, frame
+        frame_number += 1
+        next_sample += frame_interval
+
+
+def _sample_by_time(cap, seconds_interval):
+    """Samples by the container timestamps, so variable frame rate video is handled too."""
+    import cv2
+
+    frame_number = 0
+    next_time_ms = 0.0
+    interval_ms = seconds_interval * 1000.0
+    while cap.grab():
+        timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if timestamp_ms >= next_time_ms:
+            ret, frame = cap.retrieve()
+            if not ret:
+                return
+            yield frame_number, frame
+            # Advance on the interval grid so rounding does not make the samples drift.
+            while next_time_ms <= timestamp_ms:
+                next_time_ms += interval_ms
+        frame_number += 1
+
+
+def read_every_frame(cap, frame_interval=30):
+    """Yields (frame_number, frame) like the original loop: every frame is decoded with read()."""
+    frame_number = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        if frame_number % frame_interval == 0:
+            yield frame_number, frame
+        frame_number += 1
+
+
+class MotionGate:
+    """Passes a sampled frame on only if enough of it changed since the last frame passed on.
+
+    Frames are compared as blurred grayscale thumbnails `width` pixels wide. A pixel
+    counts as changed if its value moved by more than `pixel_delta`, and a frame is
+    passed on once the changed fraction of the region of interest reaches
+    `threshold`. The first frame is always passed on, and with `max_interval` a frame
+    is passed on at least every that many frames even without motion. `roi_mask` is
+    a grayscale image of the video (any size); only its non-zero pixels are compared.
+    """
+
+    def __init__(self, threshold=0.01, max_interval=None, roi_mask=None, width=160, pixel_delta=25):
+        self.threshold = threshold
+        self.max_interval = max_interval
+        self.roi_mask = roi_mask
+        self.width = width
+        self.pixel_delta = pixel_delta
+        self.checked = 0
+        self.passed = 0
+        self.forced = 0
+        self._mask = None
+        self._reference = None
+        self._reference_frame = None
+
+    def thumbnail(self, frame):
+        import cv2
+
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def changed_fraction(self, thumbnail):
+        """Fraction of the region of interest that changed since the reference frame."""
+        import cv2
+
+        changed = cv2.absdiff(thumbnail, self._reference) > self.pixel_delta
+        if self._mask is None:
+            return float(changed.mean())
+        return float(changed[self._mask].mean()) if self._mask.any() else 0.0
+
+    def check(self, frame_number, frame):
+        """Returns True if the frame should be tracked; it then becomes the new reference."""
+        self.checked += 1
+        thumbnail = self.thumbnail(frame)
+        if self.roi_mask is not None and self._mask is None:
+            import cv2
+
+            self._mask = cv2.resize(self.roi_mask, (thumbnail.shape[1], thumbnail.shape[0]),
+                                    interpolation=cv2.INTER_NEAREST) > 0
+        if self._reference is None:
+            passed = True
+        elif self.changed_fraction(thumbnail) >= self.threshold:
+            passed = True
+        elif self.max_interval and frame_number - self._reference_frame >= self.max_interval:
+            passed = True
+            self.forced += 1
+        else:
+            passed = False
+        if passed:
+            self.passed += 1
+            self._reference = thumbnail
+            self._reference_frame = frame_number
+        return passed
+
+    def filter(self, frames, metrics=NULL_METRICS):
+        """Yields the (frame_number, frame) items that pass check(); `metrics` times the check as "motion"."""
+        for frame_number, frame in frames:
+            with metrics.timer("motion"):
+                passed = self.check(frame_number, frame)
+            if passed:
+                yield frame_number, frame
+
+    def summary(self):
+        """One-line report of how many sampled frames were passed on."""
+        ratio = self.passed / self.checked if self.checked else 0.0
+        return (f"Motion gate: tracked {self.passed}/{self.checked} sampled frames ({ratio:.1%}), "
+                f"{self.forced} by the maximum interval.")
+
+
+def load_roi_mask(path):
+    """Loads a region-of-interest mask image; non-zero (white) pixels are the region. Raises IOError if unreadable."""
+    import cv2
+
+    mask = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if mask is None:
+        raise IOError(f"Could not read ROI mask: {path}")
+    return mask
+
+
+def probe_video(path):
+    """Opens a video and returns (frame_count, fps) from its header. Raises IOError if it cannot be opened.
+
+    Lets the entry points reject unreadable videos before loading the YOLO model.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Could not open video file: {path}")
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS)
+    finally:
+        cap.release()
+
+
+_END_OF_STREAM = object()
+
+
+def threaded_frames(frames, max_queued=32):
+    """Runs a frame generator on a separate decode thread feeding a bounded queue.
+
+    The decoder blocks once `max_queued` frames are waiting, so memory stays bounded
+    while decoding overlaps with inference in the consuming thread. Errors raised by
+    the generator are re-raised in the consumer.
+    """
+    frame_queue = queue.Queue(maxsize=max_queued)
+    stop = threading.Event()
+
+    def put(item):
+        # Time out regularly so a stopped consumer never leaves the decoder blocked.
+        while not stop.is_set():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in frames:
+                if not put(item):
+                    return
+            put(_END_OF_STREAM)
+        except Exception as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, name="frame-decoder", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = frame_queue.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stop the decoder before the caller releases the capture it reads from.
+        stop.set()
+        producer.join()
+
+
+def batched(frames, batch_size):
+    """Groups (frame_number, frame) items into lists of up to `batch_size`."""
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
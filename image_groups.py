@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+image_groups.py
+
+Helpers for sending several crops in one chat-completions request. The crops are
+attached as separate image_url parts of a single user message, the prompt asks
+for one numbered line per image, and the reply is split back into one response
+per crop, shaped like an ordinary single-image response so the existing JSON,
+Excel and HTML steps read it unchanged. Sharing the system and text prompt across
+K crops cuts the request count and the prompt-token overhead roughly K-fold.
+"""
+
+import copy
+import re
+
+_LINE_PATTERN = re.compile(r"^\W*image\W*(\d+)\W*[:\-]\s*(.*?)\s*$", re.IGNORECASE)
+
+
+def group_prompt(prompt_text, count):
+    """Extends the prompt with instructions to answer separately for each of `count` images."""
+    return (f"{prompt_text}\n\n"
+            f"This message contains {count} images, each showing one person. Apply the instructions above "
+            f"to each image separately. Reply with exactly one line per image, in the order the images are "
+            f"given, formatted as 'Image <number>: <answer>', and nothing else.")
+
+
+def split_group_reply(content, count):
+    """Returns the answer for each of `count` images, with None for images the reply skipped."""
+    answers = [None] * count
+    lines = [line for line in content.splitlines() if line.strip()]
+    numbered = False
+    for line in lines:
+        match = _LINE_PATTERN.match(line)
+        if match is None:
+            continue
+        numbered = True
+        index = int(match.group(1)) - 1
+        if 0 <= index < count and match.group(2):
+            answers[index] = match.group(2)
+    if not numbered and len(lines) == count:
+        # The model dropped the "Image n:" prefixes but kept one line per image.
+        answers = [line.strip() for line in lines]
+    return answers
+
+
+def split_group_result(result, count):
+    """Splits a grouped API response into one response per image, or None where the reply has no answer.
+
+    Each response keeps the original fields, with its own answer as the message
+    content, an equal share of the token usage and a "group" entry recording the
+    group size and the image's position in it.
+    """
+    answers = split_group_reply(result["choices"][0]["message"]["content"], count)
+    usage = result.get("usage", {})
+    results = []
+    for index, answer in enumerate(answers):
+        if answer is None:
+            results.append(None)
+            continue
+        image_result = copy.deepcopy(result)
+        image_result["choices"] = image_result["choices"][:1]
+        image_result["choices"][0]["message"]["content"] = answer
+        image_result["usage"] = {key: round(value / count) for key, value in usage.items()
+                                 if isinstance(value, (int, float))}
+        image_result["group"] = {"size": count, "index": index}
+        results.append(image_result)
+    return results
+
+
+def chunked(items, size):
+    """Splits a list into consecutive groups of up to `size` items."""
+    return [items[start:start + size] for start in range(0, len(items), size)]
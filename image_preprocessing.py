@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+image_preprocessing.py
+
+Optional pre-upload stage for the image analysis scripts. Images are downscaled
+to a maximum side length and re-encoded as JPEG or WebP before base64 encoding,
+and the vision `detail` level can be chosen per image from its size. Both cut the
+request body and the number of vision tokens billed per image.
+
+Requirements:
+    pip install opencv-python
+"""
+
+import math
+import threading
+
+# OpenAI vision pricing: a fixed base cost plus a cost per 512px tile in "high" detail.
+BASE_IMAGE_TOKENS = 85
+TILE_IMAGE_TOKENS = 170
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def sniff_mime_type(image_bytes):
+    """Returns the MIME type of encoded image bytes from their signature; anything unknown is sent as JPEG."""
+    if image_bytes[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+def estimate_image_tokens(width, height, detail="high"):
+    """Estimates the vision tokens billed for an image of the given size and detail."""
+    if detail == "low":
+        return BASE_IMAGE_TOKENS
+    # The API fits the image into 2048x2048, then scales the shortest side down to 768.
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return BASE_IMAGE_TOKENS + TILE_IMAGE_TOKENS * tiles
+
+
+class ImagePreprocessor:
+    """Resizes and re-encodes images before upload and keeps per-run savings totals.
+
+    `max_side` limits the longer side in pixels (None keeps the size). `image_format`
+    is "jpeg" or "webp". With `auto_detail`, images whose longer side is at most
+    `low_detail_max_side` are sent with detail "low", which the API bills at a flat rate.
+    """
+
+    def __init__(self, max_side=1024, image_format="jpeg", quality=85, auto_detail=True, low_detail_max_side=512):
+        if image_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported image format '{image_format}', use one of {sorted(MIME_TYPES)}.")
+        self.max_side = max_side
+        self.image_format = image_format
+        self.quality = quality
+        self.auto_detail = auto_detail
+        self.low_detail_max_side = low_detail_max_side
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self._lock = threading.Lock()
+
+    def settings(self):
+        """Returns the options that change what is sent, e.g. for cache keys."""
+        return {"max_side": self.max_side, "format": self.image_format, "quality": self.quality,
+                "auto_detail": self.auto_detail, "low_detail_max_side": self.low_detail_max_side}
+
+    def process(self, image_bytes):
+        """Returns (encoded_bytes, mime_type, detail, image_tokens) for an image file's bytes.
+
+        Images that cannot be decoded are passed through unchanged with detail "high".
+        """
+        import cv2
+        import numpy as np
+
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return image_bytes, sniff_mime_type(image_bytes), "high", estimate_image_tokens(1024, 1024)
+
+        height, width = image.shape[:2]
+        tokens_before = estimate_image_tokens(width, height, "high")
+        resized = bool(self.max_side) and max(width, height) > self.max_side
+        if resized:
+            scale = self.max_side / max(width, height)
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+        if self.image_format == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        else:
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        ok, encoded = cv2.imencode(f".{'jpg' if self.image_format == 'jpeg' else 'webp'}", image, params)
+        if ok and (resized or len(encoded) < len(image_bytes)):
+            output_bytes, mime_type = encoded.tobytes(), MIME_TYPES[self.image_format]
+        else:
+            # Re-encoding a small, already compressed crop can make it larger.
+            output_bytes, mime_type = image_bytes, sniff_mime_type(image_bytes)
+
+        detail = "low" if self.auto_detail and max(width, height) <= self.low_detail_max_side else "high"
+        tokens_after = estimate_image_tokens(width, height, detail)
+        with self._lock:
+            self.images += 1
+            self.bytes_in += len(image_bytes)
+            self.bytes_out += len(output_bytes)
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+        return output_bytes, mime_type, detail, tokens_after
+
+    def summary(self):
+        """Returns a one-line report of bytes and estimated tokens saved."""
+        bytes_saved = self.bytes_in - self.bytes_out
+        tokens_saved = self.tokens_before - self.tokens_after
+        bytes_ratio = bytes_saved / self.bytes_in if self.bytes_in else 0.0
+        tokens_ratio = tokens_saved / self.tokens_before if self.tokens_before else 0.0
+        return (f"Preprocessing: {self.images} images, {bytes_saved / 1e6:.1f} MB saved ({bytes_ratio:.1%}), "
+                f"~{tokens_saved} image tokens saved ({tokens_ratio:.1%}).")
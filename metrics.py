@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+metrics.py
+
+Lightweight run metrics shared by the extractor and the image analysis scripts:
+per-stage timers with p50/p95/p99 latency, counters (bytes sent, tokens, retries,
+...), a JSON summary per run and an optional periodic progress line with ETA.
+
+Stage latencies go into log-bucketed histograms, so memory stays constant however
+many samples a run records and percentiles are accurate to a few percent. When
+metrics are disabled, NULL_METRICS is passed instead; its methods do nothing, so
+instrumented code pays one attribute lookup and call per stage.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import Counter
+
+METRICS_FILENAME = "run_metrics.json"
+
+
+class LatencyHistogram:
+    """Histogram of durations in seconds with logarithmic buckets.
+
+    Bucket bounds grow by `growth` per bucket, so any percentile is reported
+    within that relative error. Values below `min_value` share the first bucket.
+    """
+
+    def __init__(self, growth=1.05, min_value=1e-6):
+        self.growth = growth
+        self.min_value = min_value
+        self._log_growth = math.log(growth)
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        bucket = 0 if value <= self.min_value else int(math.log(value / self.min_value) / self._log_growth) + 1
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Returns the upper bound of the bucket holding the q-th percentile (0-100)."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, self.min_value * self.growth ** bucket)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 4),
+            "mean": round(self.total / self.count, 6) if self.count else None,
+            "p50": _rounded(self.percentile(50)),
+            "p95": _rounded(self.percentile(95)),
+            "p99": _rounded(self.percentile(99)),
+            "max": round(self.max, 6),
+        }
+
+
+def _rounded(value):
+    return round(value, 6) if value is not None else None
+
+
+class _StageTimer:
+    """Context manager that records the time spent in its block for one stage."""
+
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics, stage):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._metrics.observe(self._stage, time.perf_counter() - self._start)
+
+
+class RunMetrics:
+    """Thread-safe collection of stage timings and counters for one run."""
+
+    enabled = True
+
+    def __init__(self, name="run"):
+        self.name = name
+        self.started = time.time()
+        self.counters = Counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def timer(self, stage):
+        """Returns a context manager timing its block as one sample of `stage`."""
+        return _StageTimer(self, stage)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def count(self, name, amount=1):
+        if amount:
+            with self._lock:
+                self.counters[name] += amount
+
+    def summary(self):
+        """Returns the metrics as a JSON-serialisable dict."""
+        with self._lock:
+            elapsed = time.time() - self.started
+            return {
+                "name": self.name,
+                "started": round(self.started, 3),
+                "seconds": round(elapsed, 3),
+                "counters": dict(self.counters),
+                "stages": {stage: histogram.summary() for stage, histogram in sorted(self.stages.items())},
+            }
+
+    def write(self, path):
+        """Writes summary() to a JSON file."""
+        with open(path, "w") as metrics_file:
+            json.dump(self.summary(), metrics_file, indent=4)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+class NullMetrics:
+    """Stand-in used when metrics are disabled; every method is a no-op."""
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def timer(self, stage):
+        return self._timer
+
+    def observe(self, stage, seconds):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def summary(self):
+        return {}
+
+    def write(self, path):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class ProgressLine:
+    """Prints "<done>/<total> ... ETA" every `interval` seconds from a counter of `metrics`.
+
+    Use as a context manager around the run; nothing is printed for NULL_METRICS or
+    without an interval. `total` can be raised during the run when work is added.
+    """
+
+    def __init__(self, metrics, counter, total, interval=10.0, unit="items"):
+        self.metrics = metrics
+        self.counter = counter
+        self.total = total
+        self.interval = interval
+        self.unit = unit
+        self._stop = threading.Event()
+        self._thread = None
+
+    def line(self):
+        done = self.metrics.counters.get(self.counter, 0)
+        elapsed = time.time() - self.metrics.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = max(0.0, self.total - done) / rate if rate > 0 and self.total else None
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta is not None else "--:--:--"
+        return f"[progress] {done}/{self.total} {self.unit}, {rate:.2f} {self.unit}/s, ETA {eta_text}"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(self.line(), flush=True)
+
+    def __enter__(self):
+        if self.interval and self.metrics.enabled:
+            self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+pose_classifier.py
+
+Rule-based posture classifier on the COCO keypoints that the YOLO pose model
+already computes for every tracked person. It decides the categories the
+skeleton alone can settle - sitting vs. standing (SIT/STD) and hands on the face
+(HFN) - and says when it cannot. Crops it decides confidently can be labelled
+locally instead of being sent to the vision model; the others go to the API as
+before. A small audit sample of the locally decided crops is still sent, so the
+rules can be checked against the MLLM labels.
+
+Requirements:
+    pip install numpy
+"""
+
+import numpy as np
+
+# COCO keypoint order used by the YOLOv8 pose models.
+NOSE, LEFT_EYE, RIGHT_EYE, LEFT_EAR, RIGHT_EAR = 0, 1, 2, 3, 4
+LEFT_SHOULDER, RIGHT_SHOULDER = 5, 6
+LEFT_WRIST, RIGHT_WRIST = 9, 10
+LEFT_HIP, RIGHT_HIP = 11, 12
+LEFT_KNEE, RIGHT_KNEE = 13, 14
+LEFT_ANKLE, RIGHT_ANKLE = 15, 16
+FACE = (NOSE, LEFT_EYE, RIGHT_EYE, LEFT_EAR, RIGHT_EAR)
+KEYPOINTS = 17
+
+POSE_CATEGORIES = ("SIT", "STD", "HFN")
+POSE_LABELS_SUFFIX = "_pose_labels.json"
+
+# Vertical hip-to-knee drop as a fraction of the torso length. Standing thighs
+# point down (close to 1), seated thighs are close to horizontal (close to 0).
+SIT_MAX_THIGH_DROP = 0.3
+STD_MIN_THIGH_DROP = 0.6
+# Wrist-to-face distance as a fraction of the shoulder width.
+HFN_MAX_DISTANCE = 0.35
+NO_HFN_MIN_DISTANCE = 0.8
+
+
+def _visible(keypoints, indices, min_confidence):
+    """Returns the given keypoints that are detected with at least `min_confidence`."""
+    points = keypoints[list(indices)]
+    return points[points[:, 2] >= min_confidence]
+
+
+def _midpoint(keypoints, first, second, min_confidence):
+    """Returns (x, y, confidence) of the midpoint of two keypoints, or the one visible keypoint, or None."""
+    points = _visible(keypoints, (first, second), min_confidence)
+    if not len(points):
+        return None
+    return points[:, 0].mean(), points[:, 1].mean(), points[:, 2].min()
+
+
+def classify_posture(keypoints, min_confidence=0.5):
+    """Decides SIT vs. STD from the thigh angle; returns (label or None, confidence).
+
+    The thigh drop (knee below hip) is measured against the torso length so the
+    rule does not depend on the crop size. Hidden knees, or a drop between the
+    sitting and standing bands, leave the posture undecided.
+    """
+    shoulders = _midpoint(keypoints, LEFT_SHOULDER, RIGHT_SHOULDER, min_confidence)
+    hips = _midpoint(keypoints, LEFT_HIP, RIGHT_HIP, min_confidence)
+    knees = _midpoint(keypoints, LEFT_KNEE, RIGHT_KNEE, min_confidence)
+    if shoulders is None or hips is None or knees is None:
+        return None, 0.0
+    torso = hips[1] - shoulders[1]
+    if torso <= 0:
+        # Upside down or lying skeletons are left to the vision model.
+        return None, 0.0
+    drop = (knees[1] - hips[1]) / torso
+    confidence = float(min(shoulders[2], hips[2], knees[2]))
+    if drop <= SIT_MAX_THIGH_DROP:
+        return "SIT", confidence
+    if drop >= STD_MIN_THIGH_DROP:
+        return "STD", confidence
+    return None, confidence
+
+
+def classify_hands_on_face(keypoints, min_confidence=0.5):
+    """Decides HFN from the wrist-to-face distance; returns (True/False or None, confidence).
+
+    HFN is present if any visible wrist is close to a visible face keypoint. It is
+    only ruled out when both wrists are visible and far from the face, since a
+    hidden wrist may well be behind the head.
+    """
+    shoulders = _visible(keypoints, (LEFT_SHOULDER, RIGHT_SHOULDER), min_confidence)
+    face = _visible(keypoints, FACE, min_confidence)
+    wrists = _visible(keypoints, (LEFT_WRIST, RIGHT_WRIST), min_confidence)
+    if len(shoulders) < 2 or not len(face):
+        return None, 0.0
+    shoulder_width = np.hypot(*(shoulders[0, :2] - shoulders[1, :2]))
+    if shoulder_width <= 0:
+        return None, 0.0
+    if not len(wrists):
+        return None, 0.0
+    distances = np.hypot(*(wrists[:, None, :2] - face[None, :, :2]).transpose(2, 0, 1)) / shoulder_width
+    closest = distances.min(axis=1)
+    confidence = float(min(shoulders[:, 2].min(), face[:, 2].max(), wrists[:, 2].min()))
+    if closest.min() <= HFN_MAX_DISTANCE:
+        return True, confidence
+    if len(wrists) == 2 and closest.min() >= NO_HFN_MIN_DISTANCE:
+        return False, confidence
+    return None, confidence
+
+
+def classify_keypoints(keypoints, categories=POSE_CATEGORIES, min_confidence=0.5):
+    """Classifies one person's (17, 3) keypoint array of x, y, confidence.
+
+    Returns (labels, decided, confidence): the categories found present, whether
+    every requested category was decided, and the lowest keypoint confidence the
+    decisions rest on.
+    """
+    keypoints = np.asarray(keypoints, dtype=np.float32).reshape(KEYPOINTS, 3)
+    if np.isnan(keypoints).any():
+        return [], False, 0.0
+    labels = []
+    decided = True
+    confidences = []
+    if "SIT" in categories or "STD" in categories:
+        posture, confidence = classify_posture(keypoints, min_confidence)
+        confidences.append(confidence)
+        if posture is None:
+            decided = False
+        elif posture in categories:
+            labels.append(posture)
+    if "HFN" in categories:
+        hands_on_face, confidence = classify_hands_on_face(keypoints, min_confidence)
+        confidences.append(confidence)
+        if hands_on_face is None:
+            decided = False
+        elif hands_on_face:
+            labels.append("HFN")
+    return labels, decided, min(confidences) if confidences else 0.0
+
+
+class PoseClassifier:
+    """Routes crops between the keypoint rules and the vision model and keeps per-run counts.
+
+    A crop is resolved locally when every category in `categories` is decided from
+    keypoints of at least `min_confidence`. One in `audit_every` resolved crops is
+    still sent to the API (marked as audit), so agreement can be measured; 0
+    disables the audit. check() is meant to be called from a single thread.
+    """
+
+    def __init__(self, categories=POSE_CATEGORIES, min_confidence=0.5, audit_every=20):
+        unknown = set(categories) - set(POSE_CATEGORIES)
+        if unknown:
+            raise ValueError(f"Keypoints cannot decide {sorted(unknown)}, use some of {list(POSE_CATEGORIES)}.")
+        self.categories = tuple(categories)
+        self.min_confidence = min_confidence
+        self.audit_every = audit_every
+        self.checked = 0
+        self.resolved = 0
+        self.audited = 0
+
+    def check(self, keypoints):
+        """Returns (labels, audit) for a locally resolved crop, or None if it should go to the API.
+
+        With `audit` True the crop should be sent to the API as well, keeping the
+        local labels next to the reply.
+        """
+        self.checked += 1
+        if keypoints is None:
+            return None
+        labels, decided, _ = classify_keypoints(keypoints, self.categories, self.min_confidence)
+        if not decided:
+            return None
+        self.resolved += 1
+        audit = bool(self.audit_every) and (self.resolved - 1) % self.audit_every == 0
+        self.audited += audit
+        return labels, audit
+
+    def summary(self):
+        """Returns a one-line report of the share of crops resolved without the API."""
+        local = self.resolved - self.audited
+        ratio = local / self.checked if self.checked else 0.0
+        return (f"Pose rules: {local}/{self.checked} crops labelled from keypoints without the API ({ratio:.1%}), "
+                f"{self.audited} more sent for audit ({', '.join(self.categories)}).")
+
+
+def label_agreement(local_labels, api_labels, categories=POSE_CATEGORIES):
+    """Compares local and MLLM labels of the same crops, per category.
+
+    Both arguments map crop names to label lists; only crops present in both are
+    compared. Returns {category: (agreeing crops, compared crops)}.
+    """
+    names = sorted(set(local_labels) & set(api_labels))
+    agreement = {}
+    for category in categories:
+        local = np.array([category in local_labels[name] for name in names], dtype=bool)
+        api = np.array([category in api_labels[name] for name in names], dtype=bool)
+        agreement[category] = (int((local == api).sum()), len(names))
+    return agreement
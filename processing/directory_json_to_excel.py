@@ -1,53 +1,171 @@
 import os
+import sys
 import json
-import pandas as pd
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-# Set the directory path where your JSON files are stored
-json_directory = 'your_JSON_output_directory'
+import numpy as np
 
-# Prepare a list to hold data
-data_for_excel = []
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# List of all possible categories, you can change this to your own categories, or if you want to replicate the original categories, you can use this list.
-all_categories = ['SIT', 'STD', "ECP",
-                 'ART','HTR',
-                  'HFN', 'HTC',
-                  'LTB', "HRL"]
+from cli_config import parse_args_with_config
+from metrics import METRICS_FILENAME
+from structured_output import (CATEGORY_CODES, category_bits, encode_labels, normalise_label, reply_content,
+                               reply_labels)
 
-# Iterate over all JSON files in the specified directory
-for json_file_path in Path(json_directory).glob('*.json'):
-    try:
-        # Read the JSON file
-        with open(json_file_path, 'r') as file:
-            json_data = json.load(file)
+# All possible categories, shared with the request scripts; edit CATEGORY_CODES in structured_output.py to change them.
+all_categories = list(CATEGORY_CODES)
 
-        # Extract the 'content' field from the 'choices' list
-        content = json_data['choices'][0]['message']['content']
+# Excel sheets hold at most this many rows, including the header.
+EXCEL_MAX_ROWS = 1048576
 
-        # Split the content to get the categories
-        categories = content.split(', ')
+def unpack_masks(masks, count):
+    """Unpacks label bitmasks (bit i = i-th category) into a uint8 0/1 matrix in one vectorised step."""
+    masks = np.asarray(masks, dtype=np.uint64)
+    return ((masks[:, None] >> np.arange(count, dtype=np.uint64)) & np.uint64(1)).astype(np.uint8)
 
-        # Create a dictionary to store binary values for each category
-        category_dict = {category: 0 for category in all_categories}
+def reply_json_paths(json_directory):
+    """Lists the JSON replies in a directory, sorted, leaving out the batch scripts' run_metrics.json."""
+    return sorted(str(path) for path in Path(json_directory).glob('*.json') if path.name != METRICS_FILENAME)
 
-        # Set the binary values for the present categories
-        for category in categories:
-            category_dict[category] = 1
+def parse_chunk(json_paths, categories):
+    """Parses a chunk of JSON files into names, a uint8 category matrix and problem counts.
 
-        # Append the extracted data to our list
-        data_for_excel.append({
-            'Name': json_file_path.stem,
-            **category_dict
-        })
+    Both structured replies ({"labels": [...]}) and comma-separated text replies are
+    read. Each file's labels are packed into a bitmask, and the masks of the chunk
+    are unpacked into the matrix at once. Labels outside `categories` are counted
+    instead of added as columns, and files that cannot be read or lack the reply
+    content are listed as malformed.
+    """
+    bits = category_bits(categories)
+    names = []
+    masks = np.zeros(len(json_paths), dtype=np.uint64)
+    unknown = Counter()
+    malformed = []
+    for json_path in json_paths:
+        try:
+            # Read the JSON file and extract the reply from the 'choices' list
+            with open(json_path, 'r') as file:
+                content = reply_content(json.load(file))
+        except (OSError, ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            malformed.append(f"{Path(json_path).name}: {e}")
+            continue
+        mask, unknown_labels = encode_labels(reply_labels(content), bits)
+        masks[len(names)] = mask
+        names.append(Path(json_path).stem)
+        unknown.update(unknown_labels)
+    return names, unpack_masks(masks[:len(names)], len(categories)), unknown, malformed
 
-    except (KeyError, IndexError) as e:
-        # Log the file path and the error
-        print(f"{json_file_path.name}: {str(e)}")
+class TableWriter:
+    """Writes DataFrame chunks incrementally to Parquet or CSV, or collects them for Excel."""
 
-# Create a dataframe from the data
-df = pd.DataFrame(data_for_excel)
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.output_format = os.path.splitext(output_file)[1].lower().lstrip('.')
+        if self.output_format not in ('parquet', 'csv', 'xlsx'):
+            raise ValueError(f"Unsupported output file '{output_file}', use .parquet, .csv or .xlsx.")
+        self.rows = 0
+        self._parquet_writer = None
+        self._excel_chunks = []
 
-# Write the dataframe to an Excel file
-output_excel_file = 'your_output_excel_file_name.xlsx'
-df.to_excel(output_excel_file, index=False)
\ No newline at end of file
+    def write(self, df):
+        if self.output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output_file, table.schema)
+            self._parquet_writer.write_table(table)
+        elif self.output_format == 'csv':
+            df.to_csv(self.output_file, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        else:
+            if self.rows + len(df) >= EXCEL_MAX_ROWS:
+                raise ValueError(f"More than {EXCEL_MAX_ROWS - 1} rows do not fit in an Excel sheet; "
+                                 f"write a .csv or .parquet file instead.")
+            self._excel_chunks.append(df)
+        self.rows += len(df)
+
+    def close(self, columns):
+        import pandas as pd
+
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        elif self.output_format == 'xlsx':
+            df = pd.concat(self._excel_chunks, ignore_index=True) if self._excel_chunks else pd.DataFrame(columns=columns)
+            df.to_excel(self.output_file, index=False)
+        elif self.rows == 0:
+            # Still write the header (or an empty table) when there were no rows.
+            self.write(pd.DataFrame(columns=columns))
+
+def convert_directory(json_directory, output_file, categories=all_categories, workers=None, chunk_size=2000):
+    """Converts all JSON outputs in a directory into one table with a 0/1 column per category.
+
+    The format follows the extension of `output_file`: .parquet and .csv are written
+    chunk by chunk as the worker processes finish, .xlsx is meant for small runs.
+    Returns the number of rows written, the unknown label counts and the malformed files.
+    """
+    # Only the main process builds tables; the parser processes get by without pandas.
+    import pandas as pd
+
+    json_paths = reply_json_paths(json_directory)
+    chunks = [json_paths[start:start + chunk_size] for start in range(0, len(json_paths), chunk_size)]
+    columns = ['Name', *categories]
+    writer = TableWriter(output_file)
+    unknown = Counter()
+    malformed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() returns the chunks in order, so the table keeps the sorted file order.
+        for names, matrix, chunk_unknown, chunk_malformed in executor.map(
+                parse_chunk, chunks, [categories] * len(chunks)):
+            unknown.update(chunk_unknown)
+            malformed.extend(chunk_malformed)
+            if names:
+                df = pd.DataFrame(matrix, columns=list(categories))
+                df.insert(0, 'Name', names)
+                writer.write(df)
+    writer.close(columns)
+    return writer.rows, unknown, malformed
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Convert a directory of JSON outputs into one table with a 0/1 "
+                                                 "column per category.")
+    parser.add_argument("json_directory", help="Directory where the JSON files are stored.")
+    parser.add_argument("output_file", help="Output file; the extension selects the format: .parquet, .csv or "
+                                            ".xlsx (small runs only).")
+    parser.add_argument("--categories", nargs="+", type=normalise_label, default=all_categories, help="Category codes, one column each.")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="JSON files per parser task.")
+    args = parse_args_with_config(parser, argv, "JSON_TABLE")
+    if not os.path.isdir(args.json_directory):
+        parser.error(f"directory '{args.json_directory}' does not exist")
+    if os.path.splitext(args.output_file)[1].lower() not in ('.parquet', '.csv', '.xlsx'):
+        parser.error(f"unsupported output file '{args.output_file}', use .parquet, .csv or .xlsx")
+    if (args.workers is not None and args.workers < 1) or args.chunk_size < 1:
+        parser.error("--workers and --chunk-size must be at least 1")
+    # Checked before parsing so a run too large for Excel fails at once, not after every file is read.
+    if args.output_file.lower().endswith('.xlsx') and len(reply_json_paths(args.json_directory)) >= EXCEL_MAX_ROWS:
+        parser.error(f"more than {EXCEL_MAX_ROWS - 1} JSON files do not fit in an Excel sheet; "
+                     f"write a .parquet or .csv file instead")
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    rows, unknown, malformed = convert_directory(args.json_directory, args.output_file, categories=args.categories,
+                                                 workers=args.workers, chunk_size=args.chunk_size)
+
+    # Log the files that could not be parsed and the labels outside the categories
+    for message in malformed[:20]:
+        print(message)
+    if len(malformed) > 20:
+        print(f"... and {len(malformed) - 20} more malformed files.")
+    if unknown:
+        print(f"Ignored {sum(unknown.values())} unknown labels: "
+              + ", ".join(f"{label} ({count})" for label, count in unknown.most_common(20)))
+    print(f"Wrote {rows} rows to {args.output_file} ({len(malformed)} malformed files skipped).")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
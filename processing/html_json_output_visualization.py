@@ -1,49 +1,167 @@
 import os
+import sys
 import json
+import html
+import re
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-def generate_html(json_directory, image_directory, output_html_file):
-    # Open the output HTML file
-    with open(output_html_file, 'w') as html_file:
-        # Write the HTML header
-        html_file.write('<html><head><title>Vision Processing Evaluation</title></head><body>\n')
-        
-        # Iterate over JSON files and match with images
-        for json_filename in os.listdir(json_directory):
-            if json_filename.endswith('.json'):
-                # Extract the base filename without extension
-                base_filename = os.path.splitext(json_filename)[0]
-                
-                # Find the corresponding image
-                image_filename = next((f for f in os.listdir(image_directory)
-                                       if f.startswith(base_filename) and f.lower().endswith(('.png', '.jpg', '.jpeg'))), None)
-                
-                # If a corresponding image is found, display it with JSON data
-                if image_filename:
-                    image_path = os.path.join(image_directory, image_filename)
-                    json_path = os.path.join(json_directory, json_filename)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-                    # Write the image tag
-                    html_file.write(f'<div><h2>{base_filename}</h2>\n')
-                    html_file.write(f'<img src="{image_path}" alt="{base_filename}" style="max-width: 500px;"><br>\n')
+from cli_config import parse_args_with_config
+from metrics import METRICS_FILENAME
 
-                with open(json_path, 'r') as json_file:
-                    content = json_file.read()  # Directly read the file content, which is expected to be a plain string
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
 
-                    # Prepare the content for HTML display. If you still need to highlight something, you'd replace directly in 'content'
-                    content_for_html = content.replace('\n', '<br>')  # Example of simple formatting, adjust as necessary
+def natural_key(filename):
+    """Sorts "frame_9" before "frame_10"."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', filename)]
 
-                    # Write the content into an HTML file
-                    html_file.write(f'<div><pre>{content_for_html}</pre></div>\n')
+def build_image_index(image_directory):
+    """Lists the image directory once and maps image names to filenames.
 
+    Each image is indexed under its full filename and its name without extension,
+    matching both JSON naming schemes of the batch scripts ("x.json" and "x.png.json").
+    """
+    index = {}
+    for filename in sorted(os.listdir(image_directory)):
+        if filename.lower().endswith(IMAGE_EXTENSIONS):
+            index.setdefault(filename, filename)
+            index.setdefault(os.path.splitext(filename)[0], filename)
+    return index
 
+def read_json_content(json_path):
+    """Returns the file content, or an error note if it cannot be read."""
+    try:
+        with open(json_path, 'r') as json_file:
+            return json_file.read()
+    except OSError as e:
+        return f"Could not read {json_path}: {e}"
 
-    print(f"HTML file created at {output_html_file}")
+def make_thumbnail(image_path, thumbnail_path, max_side):
+    """Writes a JPEG thumbnail with its longer side at most `max_side`; returns False on failure."""
+    import cv2
 
-# Specify the paths
-json_directory_path = "your_JSON_directory_path"  # Replace with your JSON directory path
-image_directory_path = "your_image_directory_path"  # Replace with your image directory path
-output_html_file = "visualization_output_file_name.html"  # Replace with the path to your master file
+    if os.path.exists(thumbnail_path) and os.path.getmtime(thumbnail_path) >= os.path.getmtime(image_path):
+        return True
+    image = cv2.imread(image_path)
+    if image is None:
+        return False
+    height, width = image.shape[:2]
+    scale = max_side / max(width, height)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return cv2.imwrite(thumbnail_path, image, [cv2.IMWRITE_JPEG_QUALITY, 80])
 
-# Generate the HTML file
-generate_html(json_directory_path, image_directory_path, output_html_file)
+def write_page(html_file, title, items, contents, image_sources, navigation=""):
+    """Streams one HTML page, item by item."""
+    html_file.write(f'<html><head><meta charset="utf-8"><title>{html.escape(title)}</title></head><body>\n')
+    html_file.write(navigation)
+    for (base_filename, _), content in zip(items, contents):
+        html_file.write(f'<div><h2>{html.escape(base_filename)}</h2>\n')
+        source = image_sources.get(base_filename)
+        if source:
+            html_file.write(f'<img src="{html.escape(source)}" alt="{html.escape(base_filename)}" '
+                            f'loading="lazy" style="max-width: 500px;"><br>\n')
+        html_file.write(f'<pre>{html.escape(content)}</pre></div>\n')
+    html_file.write(navigation)
+    html_file.write('</body></html>\n')
 
+def generate_html(json_directory, image_directory, output_html_file, items_per_page=500, thumbnail_size=None,
+                  workers=8):
+    """Writes an HTML report showing each JSON output next to its image.
+
+    Images are matched through a single index of the image directory and linked by
+    paths relative to the report. With more than `items_per_page` outputs, the report
+    is split into numbered pages next to `output_html_file`, which becomes an index
+    of the pages. With `thumbnail_size`, downscaled JPEG thumbnails with that longer
+    side are generated in parallel into a "<report name>_thumbs" directory and shown
+    instead of the full images. JSON files are read by `workers` threads, one page at a time.
+    """
+    image_index = build_image_index(image_directory)
+    json_filenames = sorted((f for f in os.listdir(json_directory) if f.endswith('.json') and f != METRICS_FILENAME),
+                            key=natural_key)
+    items = [(os.path.splitext(f)[0], os.path.join(json_directory, f)) for f in json_filenames]
+
+    report_directory = os.path.dirname(os.path.abspath(output_html_file))
+    report_name = os.path.splitext(os.path.basename(output_html_file))[0]
+    thumbnail_directory = os.path.join(report_directory, f"{report_name}_thumbs")
+    if thumbnail_size:
+        os.makedirs(thumbnail_directory, exist_ok=True)
+
+    def image_source(base_filename):
+        image_filename = image_index.get(base_filename)
+        if image_filename is None:
+            return None
+        image_path = os.path.join(image_directory, image_filename)
+        if thumbnail_size:
+            thumbnail_path = os.path.join(thumbnail_directory, f"{os.path.splitext(image_filename)[0]}.jpg")
+            if make_thumbnail(image_path, thumbnail_path, thumbnail_size):
+                image_path = thumbnail_path
+        return os.path.relpath(os.path.abspath(image_path), report_directory).replace(os.sep, '/')
+
+    pages = [items[start:start + items_per_page] for start in range(0, len(items), items_per_page)] or [[]]
+    page_files = [output_html_file] if len(pages) == 1 else \
+        [os.path.join(report_directory, f"{report_name}_page_{number}.html") for number in range(1, len(pages) + 1)]
+
+    missing_images = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for number, (page_items, page_file) in enumerate(zip(pages, page_files), start=1):
+            contents = executor.map(read_json_content, [json_path for _, json_path in page_items])
+            sources = executor.map(image_source, [base_filename for base_filename, _ in page_items])
+            image_sources = {base_filename: source for (base_filename, _), source in zip(page_items, sources)}
+            missing_images += sum(1 for source in image_sources.values() if source is None)
+            navigation = ""
+            if len(pages) > 1:
+                links = [f'<a href="{os.path.basename(output_html_file)}">Index</a>']
+                if number > 1:
+                    links.append(f'<a href="{os.path.basename(page_files[number - 2])}">Previous</a>')
+                if number < len(pages):
+                    links.append(f'<a href="{os.path.basename(page_files[number])}">Next</a>')
+                navigation = f'<p>Page {number} of {len(pages)}: {" | ".join(links)}</p>\n'
+            with open(page_file, 'w', encoding='utf-8') as html_file:
+                write_page(html_file, 'Vision Processing Evaluation', page_items, contents, image_sources, navigation)
+
+    if len(pages) > 1:
+        with open(output_html_file, 'w', encoding='utf-8') as html_file:
+            html_file.write('<html><head><meta charset="utf-8"><title>Vision Processing Evaluation</title>'
+                            '</head><body>\n<h1>Vision Processing Evaluation</h1>\n<ul>\n')
+            for number, (page_items, page_file) in enumerate(zip(pages, page_files), start=1):
+                html_file.write(f'<li><a href="{os.path.basename(page_file)}">Page {number}</a>: '
+                                f'{html.escape(page_items[0][0])} to {html.escape(page_items[-1][0])} '
+                                f'({len(page_items)} items)</li>\n')
+            html_file.write('</ul></body></html>\n')
+
+    if missing_images:
+        print(f"No image found for {missing_images} of {len(items)} JSON files.")
+    print(f"HTML file created at {output_html_file} ({len(items)} items on {len(pages)} pages)")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Write an HTML report showing each JSON output next to its image.")
+    parser.add_argument("json_directory", help="Directory of JSON outputs.")
+    parser.add_argument("image_directory", help="Directory of the images the outputs belong to.")
+    parser.add_argument("output_html_file", help="Report file; the index of the pages for large reports.")
+    parser.add_argument("--items-per-page", type=int, default=500,
+                        help="Outputs per HTML page; larger reports get an index page.")
+    parser.add_argument("--thumbnail-size", type=int,
+                        help="Show downscaled thumbnails with this longer side instead of the full crops.")
+    parser.add_argument("--workers", type=int, default=8, help="Threads reading JSON files and writing thumbnails.")
+    args = parse_args_with_config(parser, argv, "VISUALIZATION")
+    for directory in (args.json_directory, args.image_directory):
+        if not os.path.isdir(directory):
+            parser.error(f"directory '{directory}' does not exist")
+    for name, value in (("--items-per-page", args.items_per_page), ("--thumbnail-size", args.thumbnail_size),
+                        ("--workers", args.workers)):
+        if value is not None and value < 1:
+            parser.error(f"{name} must be at least 1")
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    generate_html(args.json_directory, args.image_directory, args.output_html_file,
+                  items_per_page=args.items_per_page, thumbnail_size=args.thumbnail_size, workers=args.workers)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
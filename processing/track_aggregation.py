@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli_config import parse_args_with_config
+from crop_index import load_crop_index
+from directory_json_to_excel import all_categories, parse_chunk, reply_json_paths, unpack_masks
+from pose_classifier import POSE_CATEGORIES, label_agreement
+from structured_output import category_bits, encode_labels, reply_labels
+
+def load_label_table(labels_path, categories=all_categories):
+    """Loads the labels per crop name from a JSON output directory or a converted table.
+
+    `labels_path` is either the directory of JSON outputs or a .parquet, .csv or
+    .xlsx file written by directory_json_to_excel.py. Returns a DataFrame indexed
+    by crop name with a 0/1 column per category.
+    """
+    if os.path.isdir(labels_path):
+        json_paths = reply_json_paths(labels_path)
+        names, matrix, _, malformed = parse_chunk(json_paths, categories)
+        if malformed:
+            print(f"Skipped {len(malformed)} malformed JSON files.")
+        labels = pd.DataFrame(matrix, columns=list(categories))
+        labels.index = pd.Index(names, name='Name')
+        return labels
+    extension = os.path.splitext(labels_path)[1].lower()
+    if extension == '.parquet':
+        table = pd.read_parquet(labels_path)
+    elif extension == '.csv':
+        table = pd.read_csv(labels_path)
+    else:
+        table = pd.read_excel(labels_path)
+    return table.set_index('Name')[list(categories)].astype(np.uint8)
+
+def load_pose_labels(pose_labels_path, categories=all_categories):
+    """Loads the keypoint labels written by the extractor (`<video name>_pose_labels.json`).
+
+    Returns the labels of the crops that were not sent to the API, in the layout of
+    load_label_table(), the local labels of the audit crops as {name: labels}, and
+    the categories the keypoints decided. The other categories are unknown for the
+    local crops and left as NaN, so the aggregates leave them out.
+    """
+    with open(pose_labels_path, 'r') as pose_file:
+        pose_labels = json.load(pose_file)
+    audit = set(pose_labels.get('audit', []))
+    local = {name: labels for name, labels in pose_labels['labels'].items() if name not in audit}
+    decided = pose_labels.get('categories', list(POSE_CATEGORIES))
+    names = sorted(local)
+    matrix = np.full((len(names), len(categories)), np.nan)
+    column = {category: position for position, category in enumerate(categories)}
+    matrix[:, [column[category] for category in decided if category in column]] = 0
+    for row, name in enumerate(names):
+        for label in local[name]:
+            if label in column:
+                matrix[row, column[label]] = 1
+    labels = pd.DataFrame(matrix, columns=list(categories))
+    labels.index = pd.Index(names, name='Name')
+    return labels, {name: pose_labels['labels'][name] for name in audit}, decided
+
+def table_labels(labels, names):
+    """Returns {name: labels} for the given crop names from a load_label_table() table."""
+    rows = labels[labels.index.isin(list(names))]
+    return {name: [category for category, value in row.items() if value] for name, row in rows.iterrows()}
+
+def pipeline_audit_labels(results_path):
+    """Returns ({name: keypoint labels}, {name: MLLM labels}) for the audit crops in stream_pipeline.py results."""
+    local, api = {}, {}
+    with open(results_path, 'r') as results_file:
+        for line in results_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('status') == 'done' and 'local_labels' in entry:
+                local[entry['name']] = entry['local_labels']
+                api[entry['name']] = reply_labels(', '.join(entry.get('labels', [])))
+    return local, api
+
+def pose_agreement(audit_labels, api_labels, categories):
+    """Prints how often the keypoint labels of the audit crops agree with their MLLM labels."""
+    for category, (agreeing, compared) in label_agreement(audit_labels, api_labels, categories).items():
+        ratio = agreeing / compared if compared else 0.0
+        print(f"Pose rules vs. MLLM, {category}: {agreeing}/{compared} audit crops agree ({ratio:.1%}).")
+
+def join_labels(index, labels, categories=all_categories):
+    """Joins the crop index with the labels of each crop, or of the crop a skipped duplicate matches.
+
+    Returns the timeline: one row per labelled crop sorted by track and frame, with
+    the index columns and a 0/1 column per category (NaN where a category is unknown).
+    """
+    label_key = index['duplicate_of'].where(index['duplicate_of'] != '', index['crop'])
+    timeline = index.assign(label_key=label_key).merge(labels[list(categories)], left_on='label_key',
+                                                       right_index=True, how='inner')
+    timeline = timeline.drop(columns='label_key')
+    missing = len(index) - len(timeline)
+    if missing:
+        print(f"No labels found for {missing} of {len(index)} indexed crops.")
+    return timeline.sort_values(['track_id', 'frame']).reset_index(drop=True)
+
+def load_pipeline_results(results_path, categories=all_categories):
+    """Builds the timeline from a stream_pipeline.py JSONL file, which already holds frame and track data.
+
+    Crops labelled from keypoints (status "local", and duplicates of them) only
+    decide the pose categories; their other categories are NaN.
+    """
+    rows = []
+    with open(results_path, 'r') as results_file:
+        for line in results_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('status') in ('done', 'duplicate', 'local'):
+                rows.append(entry)
+    bits = category_bits(categories)
+    masks = [encode_labels(reply_labels(', '.join(entry.get('labels', []))), bits)[0] for entry in rows]
+    matrix = unpack_masks(masks, len(categories)).astype(float)
+    undecided = [position for position, category in enumerate(categories) if category not in POSE_CATEGORIES]
+    local = [row for row, entry in enumerate(rows) if entry['status'] != 'done' and 'local_labels' in entry]
+    matrix[np.ix_(local, undecided)] = np.nan
+    timeline = pd.DataFrame({
+        'frame': [entry['frame'] for entry in rows],
+        'timestamp': [entry.get('timestamp') for entry in rows],
+        'track_id': [entry['track_id'] for entry in rows],
+        'crop': [entry['name'] for entry in rows],
+    })
+    timeline[list(categories)] = matrix
+    # A crop can appear twice if a run was resumed; the latest line wins.
+    timeline = timeline.drop_duplicates('crop', keep='last')
+    return timeline.sort_values(['track_id', 'frame']).reset_index(drop=True)
+
+def sample_durations(timeline):
+    """Returns the seconds each sample stands for: the time to the track's next sample, at most one sampling interval.
+
+    Capping at the interval keeps a track that was lost for a while from being
+    credited with the whole gap.
+    """
+    timestamps = timeline['timestamp'].astype(float)
+    if timestamps.isna().all():
+        # Without timestamps, durations are counted in samples.
+        return pd.Series(1.0, index=timeline.index)
+    frame_times = np.sort(timestamps.dropna().unique())
+    interval = float(np.median(np.diff(frame_times))) if len(frame_times) > 1 else 1.0
+    following = timestamps.groupby(timeline['track_id']).shift(-1)
+    return (following - timestamps).clip(upper=interval).fillna(interval)
+
+def track_summary(timeline, categories=all_categories):
+    """Per-track totals: time span, samples, and per category seconds, share of time and onsets.
+
+    Samples where a category is unknown (NaN) count neither as present nor as absent
+    for it: its share is taken over the time it was observed, and an onset compares
+    with the track's last sample where it was known.
+    """
+    categories = list(categories)
+    labels = timeline[categories].to_numpy(dtype=float)
+    durations = sample_durations(timeline).to_numpy()
+    tracks = timeline['track_id'].to_numpy()
+    # An onset is a category that is present in a sample but not in the track's last sample where it was known.
+    known = timeline[categories].groupby(timeline['track_id']).ffill()
+    previous = known.groupby(timeline['track_id']).shift(1).to_numpy(dtype=float)
+    onsets = (labels == 1) & (previous != 1)
+
+    frame = pd.DataFrame({'track_id': tracks, 'duration': durations})
+    for position, category in enumerate(categories):
+        frame[f'{category}_seconds'] = np.where(labels[:, position] == 1, durations, 0.0)
+        frame[f'{category}_observed'] = np.where(np.isnan(labels[:, position]), 0.0, durations)
+        frame[f'{category}_onsets'] = onsets[:, position].astype(np.int64)
+    grouped = frame.groupby('track_id')
+    summary = grouped.sum()
+    summary.insert(0, 'samples', grouped.size())
+    summary.insert(0, 'last_seen', timeline.groupby('track_id')['timestamp'].max())
+    summary.insert(0, 'first_seen', timeline.groupby('track_id')['timestamp'].min())
+    summary = summary.rename(columns={'duration': 'seconds'})
+    for category in categories:
+        observed = summary.pop(f'{category}_observed')
+        position = summary.columns.get_loc(f'{category}_seconds') + 1
+        summary.insert(position, f'{category}_share', (summary[f'{category}_seconds'] / observed).round(4))
+    return summary.reset_index()
+
+def category_transitions(timeline, categories=all_categories):
+    """Counts, over consecutive samples of the same track, how often category A was dropped while B was added.
+
+    Row A, column B of the result is the number of A -> B transitions, e.g. SIT -> STD.
+    Steps where A or B is unknown (NaN) in either sample are not counted.
+    """
+    categories = list(categories)
+    labels = timeline[categories].to_numpy(dtype=float)
+    tracks = timeline['track_id'].to_numpy()
+    same_track = tracks[1:] == tracks[:-1]
+    change = labels[1:] - labels[:-1]
+    dropped = ((change == -1) & same_track[:, None]).astype(np.int64)
+    added = ((change == 1) & same_track[:, None]).astype(np.int64)
+    return pd.DataFrame(dropped.T @ added, index=categories, columns=categories)
+
+def frame_counts(timeline, categories=all_categories):
+    """Per sampled frame, the number of tracked students and how many show each category.
+
+    Students for whom a category is unknown are not counted as showing it.
+    """
+    categories = list(categories)
+    counts = timeline.groupby('frame')[categories].sum().astype(np.int64)
+    counts.insert(0, 'students', timeline.groupby('frame').size())
+    counts.insert(0, 'timestamp', timeline.groupby('frame')['timestamp'].first())
+    return counts.reset_index()
+
+def category_cooccurrence(timeline, categories=all_categories):
+    """Counts pairs of different students in the same frame, with category A for one and B for the other.
+
+    Computed as sum over frames of counts^T counts minus each student's own pairs,
+    so it stays a single matrix product however many rows the timeline has.
+    Unknown (NaN) categories are not counted.
+    """
+    categories = list(categories)
+    labels = timeline[categories].fillna(0).to_numpy(dtype=np.int64)
+    counts = timeline.groupby('frame')[categories].sum().to_numpy(dtype=np.int64)
+    return pd.DataFrame(counts.T @ counts - labels.T @ labels, index=categories, columns=categories)
+
+def aggregate(timeline, output_directory, categories=all_categories):
+    """Writes the timeline and all aggregates as CSV files into `output_directory`."""
+    os.makedirs(output_directory, exist_ok=True)
+    outputs = {
+        'timeline.csv': timeline,
+        'track_summary.csv': track_summary(timeline, categories),
+        'frame_counts.csv': frame_counts(timeline, categories),
+    }
+    for filename, table in outputs.items():
+        table.to_csv(os.path.join(output_directory, filename), index=False)
+    category_transitions(timeline, categories).to_csv(os.path.join(output_directory, 'transitions.csv'))
+    category_cooccurrence(timeline, categories).to_csv(os.path.join(output_directory, 'cooccurrence.csv'))
+    print(f"Aggregated {len(timeline)} labelled crops of {timeline['track_id'].nunique()} tracks "
+          f"into {output_directory}")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Aggregate crop labels into per-track and per-frame tables.")
+    parser.add_argument("--index", help="Crop index written by Extract_persons_with_ID.py (<video name>_index.npz).")
+    parser.add_argument("--labels", help="JSON output directory, or a table written by directory_json_to_excel.py.")
+    parser.add_argument("--pose-labels", help="Keypoint labels of the crops the extractor did not save, "
+                                              "if it ran with pose rules.")
+    parser.add_argument("--pipeline-results", help="JSONL results of stream_pipeline.py, which already contain "
+                                                   "the frame and track data (replaces --index and --labels).")
+    parser.add_argument("--output", default="track_aggregation", help="Directory for the CSV files.")
+    args = parse_args_with_config(parser, argv, "AGGREGATION")
+    if not args.pipeline_results and not (args.index and args.labels):
+        parser.error("either --pipeline-results or both --index and --labels are required")
+    for path in (args.pipeline_results,) if args.pipeline_results else (args.index, args.labels, args.pose_labels):
+        if path and not os.path.exists(path):
+            parser.error(f"'{path}' does not exist")
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.pipeline_results:
+        audit_labels, api_labels = pipeline_audit_labels(args.pipeline_results)
+        if audit_labels:
+            pose_agreement(audit_labels, api_labels, POSE_CATEGORIES)
+        timeline = load_pipeline_results(args.pipeline_results)
+    else:
+        labels = load_label_table(args.labels)
+        if args.pose_labels:
+            local_labels, audit_labels, pose_categories = load_pose_labels(args.pose_labels)
+            pose_agreement(audit_labels, table_labels(labels, audit_labels), pose_categories)
+            print(f"Using keypoint labels for {len(local_labels)} crops not sent to the API.")
+            labels = pd.concat([labels, local_labels[~local_labels.index.isin(labels.index)]])
+        timeline = join_labels(load_crop_index(args.index), labels)
+    aggregate(timeline, args.output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
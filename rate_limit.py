@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+rate_limit.py
+
+Client-side rate limiting shared by the OpenAI and Azure image analysis scripts.
+A token bucket is kept for requests-per-minute and, optionally, for
+tokens-per-minute, so that concurrent batch runs stay within the account quota
+instead of relying on fixed sleeps between requests. The adaptive variant also
+follows the rate-limit headers and Retry-After hints sent back by the API.
+"""
+
+import email.utils
+import random
+import re
+import threading
+import time
+
+# Rough token cost of one "high" detail image (a 1024x1024 image is 765 tokens).
+IMAGE_TOKEN_ESTIMATE = 765
+
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+def parse_reset_duration(value):
+    """Parses an x-ratelimit-reset-* value such as '1s', '6m0s' or '20ms' into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers):
+    """Returns the server's requested retry delay in seconds, or None if it sent none."""
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000.0)
+        except ValueError:
+            pass
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(attempt, retry_after=None, base=1.0, cap=60.0):
+    """Exponential backoff with full jitter; a server Retry-After hint sets the minimum."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, base))
+    return delay
+
+
+def _number_header(headers, name):
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def estimate_request_tokens(prompt_text, max_tokens, images=1, image_tokens=None):
+    """Estimates how many tokens a request will count against a TPM quota.
+
+    `image_tokens` is the known per-image cost; without it a "high" detail image is assumed.
+    """
+    if image_tokens is None:
+        image_tokens = IMAGE_TOKEN_ESTIMATE
+    return len(prompt_text) // 4 + images * image_tokens + max_tokens
+
+
+class TokenBucketLimiter:
+    """Blocks callers until both the request and the token budgets allow another call.
+
+    Either limit may be None to leave that dimension unrestricted. The limiter is
+    thread-safe and is meant to be shared by all workers of a batch run.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _request_rate(self):
+        """Requests added to the bucket per second."""
+        return self.requests_per_minute / 60.0
+
+    def _token_rate(self):
+        """Tokens added to the bucket per second."""
+        return self.tokens_per_minute / 60.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(float(self.requests_per_minute),
+                                          self._request_allowance + elapsed * self._request_rate())
+        if self.tokens_per_minute:
+            self._token_allowance = min(float(self.tokens_per_minute),
+                                        self._token_allowance + elapsed * self._token_rate())
+
+    def _wait_time(self, tokens):
+        """Returns how long the caller must wait before `tokens` can be reserved."""
+        wait = 0.0
+        if self.requests_per_minute and self._request_allowance < 1:
+            wait = max(wait, (1 - self._request_allowance) / self._request_rate())
+        if self.tokens_per_minute:
+            # A single request larger than the whole bucket only has to wait for a full bucket.
+            needed = min(tokens, self.tokens_per_minute)
+            if self._token_allowance < needed:
+                wait = max(wait, (needed - self._token_allowance) / self._token_rate())
+        return wait
+
+    def acquire(self, tokens=0):
+        """Waits until a request costing `tokens` may be sent, then reserves its budget."""
+        while True:
+            with self._lock:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+            time.sleep(wait)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Corrects the token bucket once the real usage of a request is known."""
+        if not self.tokens_per_minute or actual_tokens is None:
+            return
+        with self._lock:
+            self._refill()
+            self._token_allowance = min(float(self.tokens_per_minute),
+                                        self._token_allowance + estimated_tokens - actual_tokens)
+
+    # Feedback hooks; the plain token bucket ignores server feedback.
+
+    def update_from_headers(self, headers):
+        """Adjusts the budgets from the rate-limit headers of an API response."""
+
+    def record_success(self):
+        """Notes that a request went through without being throttled."""
+
+    def record_throttle(self, retry_after=None):
+        """Notes that the server rejected a request with 429 Too Many Requests."""
+
+
+class AdaptiveRateLimiter(TokenBucketLimiter):
+    """Token bucket that follows the API's own view of the remaining quota.
+
+    - `x-ratelimit-limit-*` headers lower (or supply missing) configured limits.
+    - `x-ratelimit-remaining-*` headers cap the local allowance; when a budget is
+      exhausted all workers pause until the matching `x-ratelimit-reset-*` time.
+    - A 429 halves the refill rate (at most once per cooldown, so a burst of
+      concurrent 429s counts once) and pauses every worker for the Retry-After
+      period; each success then raises the rate again in small steps, so the run
+      climbs back to the real limit once quota frees up.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, min_scale=0.1, recovery_step=0.05,
+                 decrease_cooldown=1.0):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self.min_scale = min_scale
+        self.recovery_step = recovery_step
+        self.decrease_cooldown = decrease_cooldown
+        self._scale = 1.0
+        self._paused_until = 0.0
+        self._last_decrease = float('-inf')
+
+    def _request_rate(self):
+        return self.requests_per_minute * self._scale / 60.0
+
+    def _token_rate(self):
+        return self.tokens_per_minute * self._scale / 60.0
+
+    def _wait_time(self, tokens):
+        wait = super()._wait_time(tokens)
+        return max(wait, self._paused_until - time.monotonic())
+
+    def _pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        limit_requests = _number_header(headers, 'x-ratelimit-limit-requests')
+        limit_tokens = _number_header(headers, 'x-ratelimit-limit-tokens')
+        remaining_requests = _number_header(headers, 'x-ratelimit-remaining-requests')
+        remaining_tokens = _number_header(headers, 'x-ratelimit-remaining-tokens')
+        reset_requests = parse_reset_duration(headers.get('x-ratelimit-reset-requests'))
+        reset_tokens = parse_reset_duration(headers.get('x-ratelimit-reset-tokens'))
+
+        with self._lock:
+            self._refill()
+            if limit_requests and (not self.requests_per_minute or limit_requests < self.requests_per_minute):
+                self.requests_per_minute = limit_requests
+                self._request_allowance = remaining_requests if remaining_requests is not None else 0.0
+            if limit_tokens and (not self.tokens_per_minute or limit_tokens < self.tokens_per_minute):
+                self.tokens_per_minute = limit_tokens
+                self._token_allowance = remaining_tokens if remaining_tokens is not None else 0.0
+
+            if remaining_requests is not None:
+                if self.requests_per_minute:
+                    self._request_allowance = min(self._request_allowance, remaining_requests)
+                if remaining_requests <= 0 and reset_requests:
+                    self._pause(reset_requests)
+            if remaining_tokens is not None:
+                if self.tokens_per_minute:
+                    self._token_allowance = min(self._token_allowance, remaining_tokens)
+                if remaining_tokens <= 0 and reset_tokens:
+                    self._pause(reset_tokens)
+
+    def record_success(self):
+        with self._lock:
+            self._scale = min(1.0, self._scale + self.recovery_step)
+
+    def record_throttle(self, retry_after=None):
+        with self._lock:
+            self._refill()
+            now = time.monotonic()
+            if now - self._last_decrease >= max(self.decrease_cooldown, retry_after or 0):
+                self._scale = max(self.min_scale, self._scale / 2)
+                self._last_decrease = now
+            self._request_allowance = min(self._request_allowance, 0.0)
+            if retry_after:
+                self._pause(retry_after)
+
+    @property
+    def rate_scale(self):
+        """Fraction of the configured rate currently allowed."""
+        return self._scale
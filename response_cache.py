@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+response_cache.py
+
+Content-addressed on-disk cache of API responses shared by the OpenAI and Azure
+image analysis scripts. Entries are keyed by a hash of the image bytes and every
+request parameter that influences the reply, so a re-run over the same crops with
+the same prompt and model is answered locally without paying for the request again.
+
+The cache is a single SQLite file; when it grows beyond its size limit the least
+recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_FILENAME = "response_cache.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ResponseCache:
+    """Thread-safe, size-bounded LRU cache of API responses stored in SQLite."""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(image_bytes, prompt_text, model, max_tokens, temperature, **extra):
+        """Hashes the image bytes and request parameters into a cache key.
+
+        `image_bytes` may also be a list of images, hashed as if concatenated without
+        copying them. Any extra keyword arguments (e.g. request options added later)
+        are part of the key too.
+        """
+        digest = hashlib.sha256()
+        for chunk in (image_bytes if isinstance(image_bytes, (list, tuple)) else [image_bytes]):
+            digest.update(chunk)
+        params = {"prompt": prompt_text, "model": model, "max_tokens": max_tokens,
+                  "temperature": temperature, **extra}
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Returns the cached response for `key`, or None on a miss."""
+        return self.get_any([key])
+
+    def get_any(self, keys):
+        """Returns the cached response for the first of `keys` that is stored, counted as one hit or miss."""
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    break
+            else:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        """Stores a response and evicts least recently used entries if over the size limit."""
+        encoded = json.dumps(response)
+        size = len(encoded)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._total_bytes -= old[0]
+            self._conn.execute("INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                               (key, encoded, size, time.time()))
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Free down to 90% of the limit so eviction does not run on every insert.
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def summary(self):
+        """Returns a one-line hit/miss report."""
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return f"Response cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1%} hit rate)."
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
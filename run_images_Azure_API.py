@@ -1,191 +1,146 @@
 #!/usr/bin/env python3
 """
-interactive_azure_api_image_analysis.py
+run_images_Azure_API.py
 
-This script interactively gathers parameters from the user to process images using the Azure API.
-You can choose to process a single image or a whole directory (batch mode).
+This script processes images using the Azure API.
+You can process a single image or a whole directory (batch mode).
 For single images, the API response is printed.
 For batch mode, responses are saved as JSON files in the specified output directory.
+The requests are sent through the shared client in vision_client.py.
+Options come from the command line, a --config file or AZURE_OPENAI_* environment
+variables (the key from AZURE_OPENAI_API_KEY), so runs need no prompts:
+
+    python run_images_Azure_API.py images/ --api-base https://my-resource.openai.azure.com/ --deployment gpt-4o --prompt-file prompt.txt
 
 Requirements:
     pip install requests
 """
 
-import os
-import time
-import requests
-import json
-import base64
-
-def encode_image_to_base64(image_path):
-    """Encodes a local image file to base64."""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+import argparse
+import sys
+
+from cli_config import parse_args_with_config, read_prompt
+from metrics import NULL_METRICS
+from rate_limit import AdaptiveRateLimiter
+from vision_client import (AZURE_API_VERSION, DEFAULT_MODEL, AzureProvider, VisionClient, add_request_arguments,
+                           check_request_arguments, preprocessor_from_args, print_single_image, run_request_arguments,
+                           structured_from_args)
+
+def azure_client(api_base, deployment_name, API_KEY, model=DEFAULT_MODEL, max_tokens=300, temperature=0.1,
+                 limiter=None, max_retries=5, cache=None, preprocessor=None, metrics=NULL_METRICS,
+                 api_version=AZURE_API_VERSION, structured=None):
+    """Returns a VisionClient sending requests to one Azure OpenAI deployment."""
+    provider = AzureProvider(api_base, deployment_name, API_KEY, model=model, api_version=api_version,
+                             limiter=limiter)
+    return VisionClient(provider, max_tokens=max_tokens, temperature=temperature, max_retries=max_retries,
+                        cache=cache, preprocessor=preprocessor, metrics=metrics, structured=structured)
 
 def process_single_image(api_base, deployment_name, API_KEY, prompt_text, image_path):
     """Processes a single image through the API and prints the response."""
-    image_base64 = encode_image_to_base64(image_path)
-    base_url = f"{api_base.rstrip('/')}/openai/deployments/{deployment_name}"
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": API_KEY
-    }
-    endpoint = f"{base_url}/chat/completions?api-version=2023-12-01-preview"
-
-    data = {
-        "model": "gpt-4-vision-preview",
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant"},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt_text},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}",
-                            "detail": "high"
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 500
-    }
-
-    try:
-        response = requests.post(endpoint, headers=headers, data=json.dumps(data))
-        print(f"Status Code: {response.status_code}")
-        print(response.text)
-    except Exception as e:
-        print(f"Error processing image: {e}")
-
-def process_image(api_base, deployment_name, API_KEY, prompt_text, image_path, output_directory):
-    """Processes an image through the API and saves the response as JSON."""
-    image_base64 = encode_image_to_base64(image_path)
-    base_url = f"{api_base.rstrip('/')}/openai/deployments/{deployment_name}"
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": API_KEY
-    }
-    endpoint = f"{base_url}/chat/completions?api-version=2023-12-01-preview"
-
-    data = {
-        "model": "gpt-4-vision-preview",
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant"},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt_text},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}",
-                            "detail": "high"
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 300,
-        "temperature": 0.1
-    }
-
-    success = False
-    retries = 5
-    wait_time = 10  # seconds
-
-    while not success and retries > 0:
-        try:
-            response = requests.post(endpoint, headers=headers, data=json.dumps(data))
-            response.raise_for_status()
-            success = True
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 429:  # Too Many Requests
-                print(f"Rate limit exceeded for image '{image_path}'. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-                retries -= 1
-            else:
-                print(f"Error processing image '{image_path}': {e}")
-                return None
-
-    if not success:
-        print(f"Failed to process image '{image_path}' after multiple retries.")
-        return None
-
-    output_filename = f"{os.path.splitext(os.path.basename(image_path))[0]}.json"
-    output_filepath = os.path.join(output_directory, output_filename)
-
-    try:
-        with open(output_filepath, 'w') as output_file:
-            json.dump(response.json(), output_file, indent=4)
-        print(f"Output saved to {output_filepath}")
-    except Exception as e:
-        print(f"Error saving output for image '{image_path}': {e}")
-
-def process_directory(api_base, deployment_name, API_KEY, prompt_text, directory_path, output_directory):
-    """Processes all images in a directory and saves outputs as JSON files with throttling."""
-    if not os.path.exists(output_directory):
-        os.makedirs(output_directory)
-    
-    images_processed = 0
-    batch_start_time = time.time()
-    for entry in os.scandir(directory_path):
-        if entry.is_file() and entry.name.lower().endswith(('.png', '.jpg', '.jpeg')):
-            process_image(api_base, deployment_name, API_KEY, prompt_text, entry.path, output_directory)
-            images_processed += 1
-            time.sleep(1)  # Delay between requests to respect rate limits
-            if images_processed % 20 == 0:
-                elapsed_time = time.time() - batch_start_time
-                if elapsed_time < 60:
-                    time.sleep(60 - elapsed_time)
-                batch_start_time = time.time()
-    
-    if images_processed % 20 != 0:
-        elapsed_time = time.time() - batch_start_time
-        if elapsed_time < 60:
-            time.sleep(60 - elapsed_time)
-
-def main():
-    print("=== Azure API Image Analysis Interactive Script ===")
-    print("Select mode:")
-    print("1. Process a single image")
-    print("2. Process a directory of images (batch mode)")
-    mode = input("Enter 1 or 2: ").strip()
-
-    # Gather common parameters
-    api_base = input("Enter the API base URL (default: https://api.openai.azure.com/): ").strip()
-    if not api_base:
-        api_base = "https://api.openai.azure.com/"
-
-    deployment_name = input("Enter the deployment name (default: gpt-4o): ").strip()
-    if not deployment_name:
-        deployment_name = "gpt-4o"
-
-    API_KEY = input("Enter your API key: ").strip()
-    prompt_text = input("Enter the prompt text (default: your_prompt_here): ").strip()
-    if not prompt_text:
-        prompt_text = "your_prompt_here"
-
-    if mode == "1":
-        image_path = input("Enter the path to the image file: ").strip()
-        if not os.path.exists(image_path):
-            print(f"Image file '{image_path}' does not exist.")
-            return
-        process_single_image(api_base, deployment_name, API_KEY, prompt_text, image_path)
-    elif mode == "2":
-        directory_path = input("Enter the directory path containing images: ").strip()
-        if not os.path.isdir(directory_path):
-            print(f"Directory '{directory_path}' does not exist.")
-            return
-        output_directory = input("Enter the output directory for JSON files (default: output): ").strip()
-        if not output_directory:
-            output_directory = "output"
-        os.makedirs(output_directory, exist_ok=True)
-        process_directory(api_base, deployment_name, API_KEY, prompt_text, directory_path, output_directory)
-    else:
-        print("Invalid mode selected. Please enter 1 or 2.")
+    print_single_image(azure_client(api_base, deployment_name, API_KEY, max_tokens=500), prompt_text, image_path)
+
+def analyze_images(api_base, deployment_name, API_KEY, prompt_text, images, limiter=None,
+                   max_retries=5, cache=None, stats=None, preprocessor=None, label="image", max_tokens=300,
+                   metrics=NULL_METRICS, model=DEFAULT_MODEL, temperature=0.1):
+    """Sends one or more images (as encoded bytes) in a single API request and returns the parsed response.
+
+    Returns None if the request failed. See VisionClient.analyze_images() for the
+    retry, cache and metrics behaviour; a shared `limiter` paces every request.
+    """
+    client = azure_client(api_base, deployment_name, API_KEY, model=model, max_tokens=max_tokens,
+                          temperature=temperature, limiter=limiter, max_retries=max_retries, cache=cache,
+                          preprocessor=preprocessor, metrics=metrics)
+    return client.analyze_images(prompt_text, images, stats=stats, label=label)
+
+def analyze_image_bytes(api_base, deployment_name, API_KEY, prompt_text, image_bytes, limiter=None,
+                        max_retries=5, cache=None, stats=None, preprocessor=None, label="image", metrics=NULL_METRICS,
+                        model=DEFAULT_MODEL, max_tokens=300, temperature=0.1):
+    """Sends an image (as encoded bytes) through the API and returns the parsed response.
+
+    Returns None if the image could not be processed. See analyze_images() for the options.
+    """
+    return analyze_images(api_base, deployment_name, API_KEY, prompt_text, [image_bytes], limiter=limiter,
+                          max_retries=max_retries, cache=cache, stats=stats, preprocessor=preprocessor, label=label,
+                          max_tokens=max_tokens, metrics=metrics, model=model, temperature=temperature)
+
+def process_image(api_base, deployment_name, API_KEY, prompt_text, image_path, output_directory, limiter=None,
+                  max_retries=5, cache=None,
+                  output_name=None, stats=None, preprocessor=None, metrics=NULL_METRICS,
+                  model=DEFAULT_MODEL, max_tokens=300, temperature=0.1):
+    """Processes an image through the API and saves the response as JSON.
+
+    Returns the parsed API response, or None if the image could not be processed.
+    See analyze_images() for the request options.
+    """
+    client = azure_client(api_base, deployment_name, API_KEY, model=model, max_tokens=max_tokens,
+                          temperature=temperature, limiter=limiter, max_retries=max_retries, cache=cache,
+                          preprocessor=preprocessor, metrics=metrics)
+    return client.process_image(prompt_text, image_path, output_directory, output_name=output_name, stats=stats)
+
+def process_image_group(api_base, deployment_name, API_KEY, prompt_text, image_paths, output_directory,
+                        limiter=None, max_retries=5, cache=None, output_names=None, stats=None, preprocessor=None,
+                        metrics=NULL_METRICS, model=DEFAULT_MODEL, max_tokens=300, temperature=0.1):
+    """Sends several images in one API request and saves a separate JSON response for each.
+
+    The prompt is extended to ask for one numbered answer per image and `max_tokens`
+    applies per image. Returns the parsed response for each image, with None for
+    images that failed or were missing from the reply.
+    """
+    client = azure_client(api_base, deployment_name, API_KEY, model=model, max_tokens=max_tokens,
+                          temperature=temperature, limiter=limiter, max_retries=max_retries, cache=cache,
+                          preprocessor=preprocessor, metrics=metrics)
+    return client.process_image_group(prompt_text, image_paths, output_directory, output_names=output_names,
+                                      stats=stats)
+
+def process_directory(api_base, deployment_name, API_KEY, prompt_text, directory_path, output_directory,
+                      max_workers=1, requests_per_minute=20, tokens_per_minute=None, use_cache=True, cache_path=None,
+                      preprocessor=None, group_size=1, collect_metrics=False, progress_interval=None,
+                      model=DEFAULT_MODEL, max_tokens=300, temperature=0.1, structured=None):
+    """Processes all images in a directory and saves outputs as JSON files.
+
+    Up to `max_workers` requests are in flight at once. A shared adaptive token bucket
+    keeps the whole run within `requests_per_minute` and `tokens_per_minute` (None
+    disables a limit) and follows the rate-limit headers returned by the API.
+    See VisionClient.process_directory() for the cache, manifest, grouping and
+    metrics options; `structured` (a StructuredOutput) requests JSON labels and
+    re-sends invalid replies; to spread a run over several deployments or keys, use
+    vision_client.py with a providers file.
+    Returns the number of images processed successfully in this run.
+    """
+    limiter = AdaptiveRateLimiter(requests_per_minute, tokens_per_minute)
+    client = azure_client(api_base, deployment_name, API_KEY, model=model, max_tokens=max_tokens,
+                          temperature=temperature, limiter=limiter, preprocessor=preprocessor, structured=structured)
+    return client.process_directory(prompt_text, directory_path, output_directory, max_workers=max_workers,
+                                    use_cache=use_cache, cache_path=cache_path, group_size=group_size,
+                                    collect_metrics=collect_metrics, progress_interval=progress_interval)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Analyze an image or a directory of images with an Azure OpenAI "
+                                                 "deployment.")
+    parser.add_argument("path", help="Image file to print the reply for, or a directory of images to process.")
+    parser.add_argument("--api-base", default="https://api.openai.azure.com/", help="Azure resource endpoint.")
+    parser.add_argument("--deployment", default="gpt-4o", help="Deployment name.")
+    parser.add_argument("--api-key", help="API key (default: $AZURE_OPENAI_API_KEY).")
+    parser.add_argument("--api-version", default=AZURE_API_VERSION)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Model name, part of the cache key.")
+    parser.add_argument("--rpm", type=float, default=20, help="Requests per minute (0 for no limit).")
+    parser.add_argument("--tpm", type=float, help="Tokens per minute.")
+    add_request_arguments(parser, workers=1)
+    args = parse_args_with_config(parser, argv, "AZURE_OPENAI")
+    check_request_arguments(parser, args, args.path)
+    if not args.api_key:
+        parser.error("no API key given; use --api-key or set AZURE_OPENAI_API_KEY")
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    limiter = AdaptiveRateLimiter(args.rpm or None, args.tpm)
+    client = azure_client(args.api_base, args.deployment, args.api_key, model=args.model, max_tokens=args.max_tokens,
+                          temperature=args.temperature, limiter=limiter, preprocessor=preprocessor_from_args(args),
+                          api_version=args.api_version,
+                          structured=structured_from_args(args))
+    return run_request_arguments(client.with_options(invalid_retries=args.invalid_retries), args, read_prompt(args),
+                                 args.path)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
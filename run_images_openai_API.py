@@ -1,183 +1,138 @@
 #!/usr/bin/env python3
 """
-interactive_openai_api_image_analysis.py
+run_images_openai_API.py
 
-This script interactively gathers parameters from the user to process images
-using the OpenAI API. You can choose to process a single image (with the response printed)
-or process a directory (batch mode) with responses saved as JSON files.
+This script processes images using the OpenAI API. Given a single image, the
+response is printed; given a directory (batch mode), responses are saved as JSON
+files in the output directory. The requests are sent through the shared client in
+vision_client.py. Options come from the command line, a --config file or OPENAI_*
+environment variables (the key from OPENAI_API_KEY), so runs need no prompts:
+
+    python run_images_openai_API.py images/ --prompt-file prompt.txt --workers 4 --output output
  
 Requirements:
     pip install requests
 """
 
-import os
-import time
-import requests
-import json
-import base64
+import argparse
+import sys
+
+from cli_config import parse_args_with_config, read_prompt
+from metrics import NULL_METRICS
+from rate_limit import AdaptiveRateLimiter
+from vision_client import (DEFAULT_MODEL, OPENAI_ENDPOINT, OpenAIProvider, VisionClient, add_request_arguments,
+                           check_request_arguments, preprocessor_from_args, print_single_image, run_request_arguments,
+                           structured_from_args)
 
-def encode_image_to_base64(image_path):
-    """Encodes a local image file to base64."""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+def openai_client(API_KEY, model=DEFAULT_MODEL, max_tokens=300, temperature=0.1, limiter=None,
+                  endpoint=OPENAI_ENDPOINT, max_retries=5, cache=None, preprocessor=None, metrics=NULL_METRICS,
+                  structured=None):
+    """Returns a VisionClient sending requests to the OpenAI API (or another endpoint speaking its protocol)."""
+    provider = OpenAIProvider(API_KEY, model=model, endpoint=endpoint, limiter=limiter)
+    return VisionClient(provider, max_tokens=max_tokens, temperature=temperature, max_retries=max_retries,
+                        cache=cache, preprocessor=preprocessor, metrics=metrics, structured=structured)
 
-def process_single_image(API_KEY, prompt_text, image_path, model="gpt-4-vision-preview", max_tokens=500):
+def process_single_image(API_KEY, prompt_text, image_path, model=DEFAULT_MODEL, max_tokens=500):
     """Processes a single image through the OpenAI API and prints the response."""
-    image_base64 = encode_image_to_base64(image_path)
-    endpoint = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant"},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt_text},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}",
-                            "detail": "high"
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": max_tokens
-    }
-    
-    try:
-        response = requests.post(endpoint, headers=headers, data=json.dumps(data))
-        print(f"Status Code: {response.status_code}")
-        print(response.text)
-    except Exception as e:
-        print(f"Error processing image: {e}")
-
-def process_image(API_KEY, prompt_text, image_path, output_directory, model="gpt-4-vision-preview", max_tokens=300, temperature=0.1):
-    """Processes an image through the OpenAI API and saves the response as JSON."""
-    image_base64 = encode_image_to_base64(image_path)
-    endpoint = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant"},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt_text},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}",
-                            "detail": "high"
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": max_tokens,
-        "temperature": temperature
-    }
-    
-    success = False
-    retries = 5
-    wait_time = 10  # seconds
-    
-    while not success and retries > 0:
-        try:
-            response = requests.post(endpoint, headers=headers, data=json.dumps(data))
-            response.raise_for_status()
-            success = True
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 429:  # Too Many Requests
-                print(f"Rate limit exceeded for image '{image_path}'. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-                retries -= 1
-            else:
-                print(f"Error processing image '{image_path}': {e}")
-                return
-    if not success:
-        print(f"Failed to process image '{image_path}' after multiple retries.")
-        return
-    
-    output_filename = f"{os.path.splitext(os.path.basename(image_path))[0]}.json"
-    output_filepath = os.path.join(output_directory, output_filename)
-    
-    try:
-        with open(output_filepath, 'w') as output_file:
-            json.dump(response.json(), output_file, indent=4)
-        print(f"Output saved to {output_filepath}")
-    except Exception as e:
-        print(f"Error saving output for image '{image_path}': {e}")
-
-def process_directory(API_KEY, prompt_text, directory_path, output_directory, model="gpt-4-vision-preview"):
-    """Processes all images in a directory and saves outputs as JSON files with throttling."""
-    if not os.path.exists(output_directory):
-        os.makedirs(output_directory)
-    
-    images_processed = 0
-    batch_start_time = time.time()
-    for entry in os.scandir(directory_path):
-        if entry.is_file() and entry.name.lower().endswith(('.png', '.jpg', '.jpeg')):
-            process_image(API_KEY, prompt_text, entry.path, output_directory, model=model)
-            images_processed += 1
-            time.sleep(1)  # Delay between requests to respect rate limits
-            if images_processed % 20 == 0:
-                elapsed_time = time.time() - batch_start_time
-                if elapsed_time < 60:
-                    time.sleep(60 - elapsed_time)
-                batch_start_time = time.time()
-    
-    if images_processed % 20 != 0:
-        elapsed_time = time.time() - batch_start_time
-        if elapsed_time < 60:
-            time.sleep(60 - elapsed_time)
-
-def main():
-    print("=== OpenAI API Image Analysis Interactive Script ===")
-    print("Select mode:")
-    print("1. Process a single image")
-    print("2. Process a directory of images (batch mode)")
-    mode = input("Enter 1 or 2: ").strip()
-    
-    API_KEY = input("Enter your OpenAI API key: ").strip()
-    prompt_text = input("Enter the prompt text (default: your_prompt_here): ").strip()
-    if not prompt_text:
-        prompt_text = "your_prompt_here"
-    
-    # Optionally, let the user specify the model (default: gpt-4-vision-preview)
-    model = input("Enter the model (default: gpt-4-vision-preview): ").strip()
-    if not model:
-        model = "gpt-4-vision-preview"
-    
-    if mode == "1":
-        image_path = input("Enter the path to the image file: ").strip()
-        if not os.path.exists(image_path):
-            print(f"Image file '{image_path}' does not exist.")
-            return
-        process_single_image(API_KEY, prompt_text, image_path, model=model)
-    elif mode == "2":
-        directory_path = input("Enter the directory path containing images: ").strip()
-        if not os.path.isdir(directory_path):
-            print(f"Directory '{directory_path}' does not exist.")
-            return
-        output_directory = input("Enter the output directory for JSON files (default: output): ").strip()
-        if not output_directory:
-            output_directory = "output"
-        os.makedirs(output_directory, exist_ok=True)
-        process_directory(API_KEY, prompt_text, directory_path, output_directory, model=model)
-    else:
-        print("Invalid mode selected. Please enter 1 or 2.")
+    print_single_image(openai_client(API_KEY, model=model, max_tokens=max_tokens), prompt_text, image_path)
+
+def analyze_images(API_KEY, prompt_text, images, model=DEFAULT_MODEL, max_tokens=300, temperature=0.1,
+                   limiter=None, endpoint=OPENAI_ENDPOINT, max_retries=5, cache=None, stats=None,
+                   preprocessor=None, label="image", metrics=NULL_METRICS):
+    """Sends one or more images (as encoded bytes) in a single OpenAI API request and returns the parsed response.
+
+    Returns None if the request failed. See VisionClient.analyze_images() for the
+    retry, cache and metrics behaviour; a shared `limiter` paces every request.
+    """
+    client = openai_client(API_KEY, model=model, max_tokens=max_tokens, temperature=temperature, limiter=limiter,
+                           endpoint=endpoint, max_retries=max_retries, cache=cache, preprocessor=preprocessor,
+                           metrics=metrics)
+    return client.analyze_images(prompt_text, images, stats=stats, label=label)
+
+def analyze_image_bytes(API_KEY, prompt_text, image_bytes, model=DEFAULT_MODEL, max_tokens=300, temperature=0.1,
+                        limiter=None, endpoint=OPENAI_ENDPOINT, max_retries=5, cache=None, stats=None,
+                        preprocessor=None, label="image", metrics=NULL_METRICS):
+    """Sends an image (as encoded bytes) through the OpenAI API and returns the parsed response.
+
+    Returns None if the image could not be processed. See analyze_images() for the options.
+    """
+    return analyze_images(API_KEY, prompt_text, [image_bytes], model=model, max_tokens=max_tokens,
+                          temperature=temperature, limiter=limiter, endpoint=endpoint, max_retries=max_retries,
+                          cache=cache, stats=stats, preprocessor=preprocessor, label=label, metrics=metrics)
+
+def process_image(API_KEY, prompt_text, image_path, output_directory, model=DEFAULT_MODEL, max_tokens=300, temperature=0.1,
+                  limiter=None, endpoint=OPENAI_ENDPOINT, max_retries=5, cache=None,
+                  output_name=None, stats=None, preprocessor=None, metrics=NULL_METRICS):
+    """Processes an image through the OpenAI API and saves the response as JSON.
+
+    Returns the parsed API response, or None if the image could not be processed.
+    See analyze_images() for the request options.
+    """
+    client = openai_client(API_KEY, model=model, max_tokens=max_tokens, temperature=temperature, limiter=limiter,
+                           endpoint=endpoint, max_retries=max_retries, cache=cache, preprocessor=preprocessor,
+                           metrics=metrics)
+    return client.process_image(prompt_text, image_path, output_directory, output_name=output_name, stats=stats)
+
+def process_image_group(API_KEY, prompt_text, image_paths, output_directory, model=DEFAULT_MODEL,
+                        max_tokens=300, temperature=0.1, limiter=None, endpoint=OPENAI_ENDPOINT, max_retries=5,
+                        cache=None, output_names=None, stats=None, preprocessor=None, metrics=NULL_METRICS):
+    """Sends several images in one OpenAI API request and saves a separate JSON response for each.
+
+    The prompt is extended to ask for one numbered answer per image and `max_tokens`
+    applies per image. Returns the parsed response for each image, with None for
+    images that failed or were missing from the reply.
+    """
+    client = openai_client(API_KEY, model=model, max_tokens=max_tokens, temperature=temperature, limiter=limiter,
+                           endpoint=endpoint, max_retries=max_retries, cache=cache, preprocessor=preprocessor,
+                           metrics=metrics)
+    return client.process_image_group(prompt_text, image_paths, output_directory, output_names=output_names,
+                                      stats=stats)
+
+def process_directory(API_KEY, prompt_text, directory_path, output_directory, model=DEFAULT_MODEL,
+                      max_workers=1, requests_per_minute=20, tokens_per_minute=None, endpoint=OPENAI_ENDPOINT,
+                      use_cache=True, cache_path=None,
+                      preprocessor=None, group_size=1, collect_metrics=False, progress_interval=None,
+                      structured=None):
+    """Processes all images in a directory and saves outputs as JSON files.
+
+    Up to `max_workers` requests are in flight at once. A shared adaptive token bucket
+    keeps the whole run within `requests_per_minute` and `tokens_per_minute` (None
+    disables a limit) and follows the rate-limit headers returned by the API.
+    See VisionClient.process_directory() for the cache, manifest, grouping and
+    metrics options; `structured` (a StructuredOutput) requests JSON labels and
+    re-sends invalid replies.
+    Returns the number of images processed successfully in this run.
+    """
+    limiter = AdaptiveRateLimiter(requests_per_minute, tokens_per_minute)
+    client = openai_client(API_KEY, model=model, limiter=limiter, endpoint=endpoint, preprocessor=preprocessor,
+                           structured=structured)
+    return client.process_directory(prompt_text, directory_path, output_directory, max_workers=max_workers,
+                                    use_cache=use_cache, cache_path=cache_path, group_size=group_size,
+                                    collect_metrics=collect_metrics, progress_interval=progress_interval)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Analyze an image or a directory of images with the OpenAI API.")
+    parser.add_argument("path", help="Image file to print the reply for, or a directory of images to process.")
+    parser.add_argument("--api-key", help="OpenAI API key (default: $OPENAI_API_KEY).")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--endpoint", default=OPENAI_ENDPOINT, help="Chat-completions endpoint.")
+    parser.add_argument("--rpm", type=float, default=20, help="Requests per minute (0 for no limit).")
+    parser.add_argument("--tpm", type=float, help="Tokens per minute.")
+    add_request_arguments(parser, workers=1)
+    args = parse_args_with_config(parser, argv, "OPENAI")
+    check_request_arguments(parser, args, args.path)
+    if not args.api_key:
+        parser.error("no API key given; use --api-key or set OPENAI_API_KEY")
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    limiter = AdaptiveRateLimiter(args.rpm or None, args.tpm)
+    client = openai_client(args.api_key, model=args.model, max_tokens=args.max_tokens, temperature=args.temperature,
+                           limiter=limiter, endpoint=args.endpoint, preprocessor=preprocessor_from_args(args),
+                           structured=structured_from_args(args))
+    return run_request_arguments(client.with_options(invalid_retries=args.invalid_retries), args, read_prompt(args),
+                                 args.path)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
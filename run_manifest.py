@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+run_manifest.py
+
+Append-only JSONL manifest of a batch run, kept in the output directory. Every
+processed image gets a line with its status, attempt count, latency and token
+usage as soon as it finishes, so an interrupted run can be restarted and will
+only send the images that are not yet done.
+"""
+
+import json
+import os
+import threading
+import time
+
+MANIFEST_FILENAME = "run_manifest.jsonl"
+
+
+class RunManifest:
+    """Thread-safe record of per-image outcomes; the latest line for an image wins."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, 'a')
+
+    def _load(self):
+        with open(self.path, 'r') as manifest_file:
+            for line in manifest_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write can leave a truncated last line.
+                    continue
+                self.entries[entry["image"]] = entry
+
+    def is_done(self, image):
+        """Returns True if `image` completed successfully in this or an earlier run."""
+        entry = self.entries.get(image)
+        return entry is not None and entry["status"] == "done"
+
+    def attempts(self, image):
+        """Returns the number of API attempts recorded for `image` so far."""
+        entry = self.entries.get(image)
+        return entry["attempts"] if entry is not None else 0
+
+    def record(self, image, status, **fields):
+        """Appends the outcome for `image` and flushes it to disk immediately."""
+        entry = {"image": image, "status": status, "time": round(time.time(), 3), **fields}
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self.entries[image] = entry
+
+    def counts(self):
+        """Returns the number of images per status."""
+        counts = {}
+        for entry in self.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+stream_pipeline.py
+
+Streaming mode that takes a video straight to the vision model without the
+intermediate crop and JSON files of the staged workflow:
+
+    decode -> track/crop -> in-memory JPEG -> API request -> parsed result
+
+Frames are decoded on a separate thread into a bounded queue, tracked in the main
+thread, and every crop is JPEG-encoded in memory and submitted to a pool of API
+workers. At most `--max-in-flight` crops wait for or are in an API request; the
+tracker blocks when that many are outstanding, so memory stays bounded. Each
+result is appended to a JSONL file as soon as it arrives. Crops are only written
+to disk if `--crops-dir` is given. With `--dedup-distance`, crops that look the
+same as the last submitted crop of their track are not sent; they reuse its labels.
+With `--pose-confidence`, crops whose keypoints clearly show SIT/STD and HFN are
+labelled locally (status "local") and not sent either.
+
+    python stream_pipeline.py video.mp4 --provider openai --prompt-file prompt.txt --output results.jsonl
+
+Options can also be set in a --config file or as PIPELINE_* environment variables
+(see cli_config.py). The options and the video are checked before OpenCV,
+ultralytics and the model are loaded.
+
+Requirements:
+    pip install ultralytics opencv-python requests
+"""
+
+import os
+# Workaround for OpenMP duplicate runtime error
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from cli_config import parse_args_with_config, read_prompt
+from crop_dedup import CropDeduplicator
+from crop_writer import CropWriter
+from frame_sampling import probe_video, sample_frames, threaded_frames
+from image_preprocessing import ImagePreprocessor
+from pose_classifier import PoseClassifier
+from rate_limit import AdaptiveRateLimiter
+from response_cache import ResponseCache
+from structured_output import (CATEGORY_CODES, STRUCTURED_MODES, StructuredOutput, normalise_label, reply_content,
+                               reply_labels)
+
+API_KEY_VARIABLES = {"openai": "OPENAI_API_KEY", "azure": "AZURE_OPENAI_API_KEY", "compatible": "OPENAI_API_KEY"}
+
+
+def make_analyzer(provider, api_key, prompt_text, model="gpt-4-vision-preview", api_base=None, deployment=None,
+                  limiter=None, cache=None, preprocessor=None, providers=None, structured=None):
+    """Returns a function (image_bytes, label, stats) -> API response or None for the chosen provider.
+
+    A list of `providers` (see vision_client.load_providers()) replaces the single
+    provider; requests are then spread over them with failover. With `structured`
+    (a StructuredOutput), replies are JSON labels. An invalid reply, or one without
+    any content, is sent again once before the crop counts as failed.
+    """
+    from vision_client import AzureProvider, CompatibleProvider, OpenAIProvider, VisionClient
+
+    if providers is None:
+        if provider == "azure":
+            providers = [AzureProvider(api_base, deployment, api_key, limiter=limiter)]
+        elif provider == "compatible" or api_base:
+            providers = [CompatibleProvider(api_base, model, api_key=api_key, limiter=limiter)]
+        else:
+            providers = [OpenAIProvider(api_key, model=model, limiter=limiter)]
+    client = VisionClient(providers, cache=cache, preprocessor=preprocessor, structured=structured)
+
+    def analyze(image_bytes, label, stats):
+        result = client.analyze_image_bytes(prompt_text, image_bytes, stats=stats, label=label)
+        if result is None and stats.get("invalid"):
+            attempts = stats["attempts"]
+            result = client.analyze_image_bytes(prompt_text, image_bytes, stats=stats, label=label)
+            stats["attempts"] += attempts
+        return result
+
+    return analyze
+
+
+def video_crops(model, video_path, frame_interval=30, seconds_interval=None, batch_size=1, quality=90,
+                crop_writer=None, deduplicator=None, pose_classifier=None, verbose=False):
+    """Yields one dict per tracked person with its JPEG bytes, encoded in memory.
+
+    Raises IOError if the video cannot be opened. If a `crop_writer` is given, the
+    crops are also saved through it. If a `deduplicator` is given, near-duplicate
+    crops are yielded without image bytes and with "duplicate_of" naming the crop
+    whose labels they share. If a `pose_classifier` is given, crops it labels from
+    their keypoints are yielded without image bytes and with "local_labels"; audit
+    crops carry both.
+    """
+    # Imported here so the API side of this module works without ultralytics installed.
+    import cv2
+    from Extract_persons_with_ID import crop_name, reset_tracker, track_batches, track_frames
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video file: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or None
+    reset_tracker(model)
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    try:
+        frames = threaded_frames(sample_frames(cap, frame_interval, seconds_interval), max_queued=2 * batch_size)
+        if batch_size > 1:
+            tracked_frames = track_batches(model, frames, batch_size, verbose=verbose)
+        else:
+            tracked_frames = track_frames(model, frames, verbose=verbose)
+        for frame_count, frame, boxes, track_ids, keypoints in tracked_frames:
+            for position, (box, track_id) in enumerate(zip(boxes, track_ids)):
+                x1, y1, x2, y2 = map(int, box[:4])
+                crop = frame[y1:y2, x1:x2]
+                if crop.size == 0:
+                    continue
+                name = crop_name(frame_count, track_id)
+                item = {
+                    "name": name,
+                    "frame": frame_count,
+                    "timestamp": round(frame_count / fps, 3) if fps else None,
+                    "track_id": int(track_id),
+                    "box": [x1, y1, x2, y2],
+                }
+                duplicate_of = deduplicator.check(int(track_id), crop, name) if deduplicator is not None else None
+                if duplicate_of is not None:
+                    yield {**item, "duplicate_of": duplicate_of}
+                    continue
+                if pose_classifier is not None:
+                    resolved = pose_classifier.check(keypoints[position] if keypoints is not None else None)
+                    if resolved is not None:
+                        item["local_labels"] = resolved[0]
+                        if not resolved[1]:
+                            yield item
+                            continue
+                ok, encoded = cv2.imencode(".jpg", crop, params)
+                if not ok:
+                    print(f"Error encoding crop of track {int(track_id)} in frame {frame_count}.")
+                    continue
+                if crop_writer is not None:
+                    crop_writer.submit(crop, name)
+                yield {**item, "image_bytes": encoded.tobytes()}
+    finally:
+        cap.release()
+
+
+def analyze_crops(crops, analyze, results_path, max_in_flight=8):
+    """Sends crops to `analyze` concurrently and appends each result to a JSONL file.
+
+    `crops` is an iterable of dicts with "name" and "image_bytes" (as yielded by
+    video_crops()); all other keys are copied into the result line. Crops with
+    "duplicate_of" are not sent; their line is written with the labels of that crop
+    once its reply arrives, or straight away if that crop was labelled locally.
+    Crops with "local_labels" but no image bytes are written straight away with
+    status "local". Pulling the next crop blocks while
+    `max_in_flight` are outstanding. Returns a summary dict.
+    """
+    slots = threading.BoundedSemaphore(max_in_flight)
+    lock = threading.Lock()
+    counts = {"crops": 0, "done": 0, "failed": 0, "cached": 0, "duplicate": 0, "local": 0}
+    submitted = {}
+    local_labels = {}
+    first_result = [None]
+    start_time = time.time()
+    results_file = open(results_path, "a")
+
+    def run(crop):
+        stats = {}
+        request_start = time.time()
+        entry = {key: value for key, value in crop.items() if key != "image_bytes"}
+        entry["status"] = "failed"
+        try:
+            result = analyze(crop["image_bytes"], crop["name"], stats)
+            if result is not None:
+                content = reply_content(result)
+                entry["labels"] = reply_labels(content)
+                entry["content"] = content
+                entry["total_tokens"] = result.get("usage", {}).get("total_tokens")
+                entry["status"] = "done"
+        except Exception as e:
+            print(f"Error processing crop '{crop['name']}': {e}")
+        entry["cached"] = stats.get("cached", False)
+        entry["latency"] = round(time.time() - request_start, 3)
+        write(entry)
+        return entry
+
+    def write(entry):
+        with lock:
+            results_file.write(json.dumps(entry) + "\n")
+            results_file.flush()
+            counts[entry["status"]] += 1
+            counts["cached"] += entry.get("cached", False)
+            if first_result[0] is None:
+                first_result[0] = time.time() - start_time
+
+    def reuse(crop, future):
+        source = future.result()
+        entry = dict(crop)
+        # A duplicate of a failed crop is failed too, so it is not mistaken for a result.
+        entry["status"] = "duplicate" if source["status"] == "done" else "failed"
+        for key in ("labels", "content"):
+            if key in source:
+                entry[key] = source[key]
+        write(entry)
+
+    def release(_):
+        slots.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            for crop in crops:
+                counts["crops"] += 1
+                if "local_labels" in crop and "image_bytes" not in crop:
+                    local_labels[crop["name"]] = crop["local_labels"]
+                    write({**crop, "status": "local", "labels": crop["local_labels"]})
+                    continue
+                if "duplicate_of" in crop:
+                    source = crop["duplicate_of"]
+                    if source in local_labels:
+                        write({**crop, "status": "duplicate", "labels": local_labels[source],
+                               "local_labels": local_labels[source]})
+                    elif source in submitted:
+                        submitted[source].add_done_callback(partial(reuse, crop))
+                    else:
+                        # The crop it matches was never sent, e.g. because it could not be encoded.
+                        write({**crop, "status": "failed"})
+                    continue
+                slots.acquire()
+                future = executor.submit(run, crop)
+                future.add_done_callback(release)
+                submitted[crop["name"]] = future
+    finally:
+        results_file.close()
+
+    elapsed_time = time.time() - start_time
+    return {
+        "results": results_path,
+        **counts,
+        "seconds": round(elapsed_time, 2),
+        "seconds_to_first_result": round(first_result[0], 2) if first_result[0] is not None else None,
+    }
+
+
+def run_pipeline(video_path, analyze, results_path, model_path="yolov8n-pose.pt", frame_interval=30,
+                 seconds_interval=None, batch_size=1, max_in_flight=8, crops_dir=None, dedup_distance=None,
+                 pose_confidence=None, pose_audit_every=20, verbose=False):
+    """Streams one video through tracking and the API and returns the analyze_crops() summary.
+
+    With `dedup_distance`, crops within that many hash bits of the last submitted crop
+    of their track are skipped and reuse its labels. With `pose_confidence`, crops
+    labelled from keypoints of at least that confidence are not sent, except one in
+    `pose_audit_every`.
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    crop_writer = None
+    if crops_dir:
+        os.makedirs(crops_dir, exist_ok=True)
+        crop_writer = CropWriter(crops_dir)
+    deduplicator = CropDeduplicator(dedup_distance) if dedup_distance is not None else None
+    pose_classifier = None
+    if pose_confidence is not None:
+        pose_classifier = PoseClassifier(min_confidence=pose_confidence, audit_every=pose_audit_every)
+    try:
+        crops = video_crops(model, video_path, frame_interval, seconds_interval, batch_size,
+                            crop_writer=crop_writer, deduplicator=deduplicator, pose_classifier=pose_classifier,
+                            verbose=verbose)
+        return analyze_crops(crops, analyze, results_path, max_in_flight=max_in_flight)
+    finally:
+        if deduplicator is not None:
+            print(deduplicator.summary())
+        if pose_classifier is not None:
+            print(pose_classifier.summary())
+        if crop_writer is not None:
+            crop_writer.close()
+            print(crop_writer.summary())
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Stream a video through person tracking and a vision model.")
+    parser.add_argument("video", help="Video file to process.")
+    parser.add_argument("--provider", choices=sorted(API_KEY_VARIABLES), default="openai")
+    parser.add_argument("--api-key", help="API key (default: $OPENAI_API_KEY or $AZURE_OPENAI_API_KEY).")
+    parser.add_argument("--prompt", help="Prompt text.")
+    parser.add_argument("--prompt-file", help="File containing the prompt text.")
+    parser.add_argument("--model", default="gpt-4-vision-preview", help="OpenAI or compatible server model name.")
+    parser.add_argument("--api-base", help="Azure resource endpoint, or an OpenAI-compatible base URL.")
+    parser.add_argument("--providers", help="JSON file listing several providers to spread requests over "
+                                            "(replaces --provider, --api-key, --api-base and --deployment).")
+    parser.add_argument("--deployment", help="Azure deployment name.")
+    parser.add_argument("--yolo-model", default="yolov8n-pose.pt", help="YOLO model file.")
+    parser.add_argument("--frame-interval", type=int, default=30, help="Track every N-th frame.")
+    parser.add_argument("--seconds-interval", type=float, help="Track one frame every N seconds instead.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Frames per detection batch.")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Maximum concurrent API requests.")
+    parser.add_argument("--rpm", type=float, default=20, help="Requests per minute (0 for no limit).")
+    parser.add_argument("--tpm", type=float, help="Tokens per minute.")
+    parser.add_argument("--max-side", type=int, help="Downscale crops to this longer side before upload.")
+    parser.add_argument("--structured", choices=STRUCTURED_MODES,
+                        help="Request JSON labels with this mode and re-send an invalid reply once.")
+    parser.add_argument("--categories", nargs="+", type=normalise_label, default=list(CATEGORY_CODES),
+                        help="With --structured, the category codes replies may use.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse or store cached responses.")
+    parser.add_argument("--cache", default="response_cache.sqlite", help="Response cache file.")
+    parser.add_argument("--dedup-distance", type=int,
+                        help="Skip crops within this many hash bits (of 64) of their track's last submitted crop.")
+    parser.add_argument("--pose-confidence", type=float,
+                        help="Label crops from keypoints of at least this confidence when SIT/STD and HFN are clear.")
+    parser.add_argument("--pose-audit-every", type=int, default=20,
+                        help="Still send one in N keypoint-labelled crops for comparison with the MLLM (0: none).")
+    parser.add_argument("--crops-dir", help="Also save the crops to this directory.")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file the results are appended to.")
+    parser.add_argument("--verbose", action="store_true", help="Print progress for every frame.")
+    args = parse_args_with_config(parser, argv, "PIPELINE")
+    if args.provider == "azure" and not args.providers and not (args.api_base and args.deployment):
+        parser.error("--provider azure requires --api-base and --deployment")
+    if args.provider == "compatible" and not args.providers and not args.api_base:
+        parser.error("--provider compatible requires --api-base")
+    if not args.prompt and not args.prompt_file:
+        parser.error("one of --prompt or --prompt-file is required")
+    for name, path in (("prompt file", args.prompt_file), ("providers file", args.providers)):
+        if path and not os.path.isfile(path):
+            parser.error(f"{name} '{path}' does not exist")
+    if os.path.dirname(args.yolo_model) and not os.path.isfile(args.yolo_model):
+        parser.error(f"model file '{args.yolo_model}' does not exist")
+    for name, value, low, high in (("--frame-interval", args.frame_interval, 1, None),
+                                   ("--batch-size", args.batch_size, 1, None),
+                                   ("--max-in-flight", args.max_in_flight, 1, None),
+                                   ("--max-side", args.max_side, 1, None),
+                                   ("--dedup-distance", args.dedup_distance, 0, 64),
+                                   ("--pose-confidence", args.pose_confidence, 0, 1),
+                                   ("--pose-audit-every", args.pose_audit_every, 0, None)):
+        if value is not None and (value < low or (high is not None and value > high)):
+            bound = f"between {low} and {high}" if high is not None else f"at least {low}"
+            parser.error(f"{name} must be {bound}")
+    if args.seconds_interval is not None and args.seconds_interval <= 0:
+        parser.error("--seconds-interval must be positive")
+    if not 1 <= len(args.categories) <= 63:
+        parser.error("--categories must list between 1 and 63 codes")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        probe_video(args.video)
+    except IOError as e:
+        print(e)
+        return 1
+    providers = None
+    if args.providers:
+        from vision_client import load_providers
+        try:
+            providers = load_providers(args.providers)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Invalid providers file '{args.providers}': {e}")
+            return 1
+    api_key = args.api_key or os.environ.get(API_KEY_VARIABLES[args.provider])
+    if not api_key and providers is None and args.provider != "compatible":
+        print(f"No API key given; use --api-key or set {API_KEY_VARIABLES[args.provider]}.")
+        return 1
+    prompt_text = read_prompt(args)
+
+    limiter = AdaptiveRateLimiter(args.rpm or None, args.tpm)
+    cache = None if args.no_cache else ResponseCache(args.cache)
+    preprocessor = ImagePreprocessor(max_side=args.max_side) if args.max_side else None
+    analyze = make_analyzer(args.provider, api_key, prompt_text, model=args.model, api_base=args.api_base,
+                            deployment=args.deployment, limiter=limiter, cache=cache, preprocessor=preprocessor,
+                            providers=providers,
+                            structured=StructuredOutput(args.categories, mode=args.structured) if args.structured else None)
+    try:
+        summary = run_pipeline(args.video, analyze, args.output, model_path=args.yolo_model,
+                               frame_interval=args.frame_interval, seconds_interval=args.seconds_interval,
+                               batch_size=args.batch_size, max_in_flight=args.max_in_flight,
+                               crops_dir=args.crops_dir, dedup_distance=args.dedup_distance,
+                               pose_confidence=args.pose_confidence, pose_audit_every=args.pose_audit_every,
+                               verbose=args.verbose)
+    except IOError as e:
+        print(e)
+        return 1
+    finally:
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
+    print(f"Analyzed {summary['done']}/{summary['crops']} crops ({summary['failed']} failed, "
+          f"{summary['cached']} from cache, {summary['duplicate']} duplicates, "
+          f"{summary['local']} labelled from keypoints) in {summary['seconds']:.1f} seconds; "
+          f"first result after {summary['seconds_to_first_result']} seconds. Results: {summary['results']}")
+    if preprocessor is not None:
+        print(preprocessor.summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
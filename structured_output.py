@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+structured_output.py
+
+Structured replies for the posture labels. Instead of a free-text reply such as
+"SIT, HTC" that is split on commas, the request constrains the model to a JSON
+object listing category codes:
+
+    {"labels": ["SIT", "HTC"]}                                   (one image)
+    {"images": [{"image": 1, "labels": ["SIT"]}, ...]}           (several images)
+
+Three request modes are supported, depending on what the model or server offers:
+
+- json_schema: response_format with a strict JSON schema whose enum lists the codes,
+- json_object: plain JSON mode; the codes are only listed in the prompt,
+- tool:        a forced function call whose parameters use the same schema.
+
+Every reply is validated: it must be JSON of the expected shape and use only the
+listed codes. A valid reply is saved with its labels as canonical JSON content, so
+later steps read it the same way whatever mode produced it; an invalid reply is
+not cached and the image is sent again. Labels are packed into an integer bitmask
+per crop (bit i for the i-th category), which the processing scripts unpack into
+0/1 columns in one vectorised step.
+"""
+
+import copy
+import json
+
+# List of all possible categories, you can change this to your own categories, or if you want to replicate the
+# original categories, you can use this list. The request scripts and the processing scripts all default to it;
+# each also takes --categories to use another list for one run.
+CATEGORY_CODES = ('SIT', 'STD', 'ECP', 'ART', 'HTR', 'HFN', 'HTC', 'LTB', 'HRL')
+STRUCTURED_MODES = ("json_schema", "json_object", "tool")
+TOOL_NAME = "report_labels"
+
+
+def normalise_label(label):
+    return label.strip().strip('.').upper()
+
+
+def reply_content(result):
+    """Returns the reply text of a chat-completions response: the message content or the tool call arguments.
+
+    Raises ValueError for a reply with neither, which would otherwise read as an image without labels.
+    """
+    message = result["choices"][0]["message"]
+    if message.get("content"):
+        return message["content"]
+    for tool_call in message.get("tool_calls") or []:
+        return tool_call["function"]["arguments"]
+    raise ValueError("reply has no content")
+
+
+def has_reply_content(result):
+    """Returns whether reply_content() can read a reply from a chat-completions response."""
+    try:
+        reply_content(result)
+    except (ValueError, KeyError, IndexError, TypeError):
+        return False
+    return True
+
+
+def reply_labels(content):
+    """Returns the labels of a reply, either structured JSON or the original comma-separated text."""
+    text = content.strip()
+    if text.startswith('{'):
+        try:
+            labels = json.loads(text).get("labels")
+        except (ValueError, AttributeError):
+            labels = None
+        if isinstance(labels, list):
+            return [normalise_label(label) for label in labels if isinstance(label, str) and normalise_label(label)]
+    return [normalise_label(label) for label in content.split(',') if normalise_label(label)]
+
+
+def category_bits(categories):
+    """Maps each category to its bit in the label mask."""
+    return {category: 1 << position for position, category in enumerate(categories)}
+
+
+def encode_labels(labels, bits):
+    """Packs labels into a bitmask using category_bits(); returns (mask, labels outside the categories)."""
+    mask = 0
+    unknown = []
+    for label in labels:
+        bit = bits.get(label)
+        if bit is None:
+            unknown.append(label)
+        else:
+            mask |= bit
+    return mask, unknown
+
+
+def decode_mask(mask, categories):
+    """Returns the categories set in a bitmask, in category order."""
+    return [category for position, category in enumerate(categories) if mask >> position & 1]
+
+
+class StructuredOutput:
+    """Request fields, prompt instructions and reply validation for one structured mode."""
+
+    def __init__(self, categories=CATEGORY_CODES, mode="json_schema"):
+        if mode not in STRUCTURED_MODES:
+            raise ValueError(f"Unknown structured output mode '{mode}', use one of {', '.join(STRUCTURED_MODES)}.")
+        if len(categories) > 63:
+            raise ValueError("At most 63 categories fit in a label mask.")
+        self.categories = tuple(categories)
+        self.mode = mode
+        self.bits = category_bits(self.categories)
+
+    def schema(self, count=1):
+        """JSON schema of a reply for `count` images."""
+        labels = {"type": "array", "items": {"type": "string", "enum": list(self.categories)}}
+        if count == 1:
+            return {"type": "object", "properties": {"labels": labels}, "required": ["labels"],
+                    "additionalProperties": False}
+        image = {"type": "object", "properties": {"image": {"type": "integer"}, "labels": labels},
+                 "required": ["image", "labels"], "additionalProperties": False}
+        return {"type": "object", "properties": {"images": {"type": "array", "items": image}},
+                "required": ["images"], "additionalProperties": False}
+
+    def request_fields(self, count=1):
+        """Extra chat-completions request fields that constrain the reply."""
+        if self.mode == "json_object":
+            return {"response_format": {"type": "json_object"}}
+        if self.mode == "tool":
+            return {
+                "tools": [{"type": "function", "function": {
+                    "name": TOOL_NAME,
+                    "description": "Report the posture category codes that apply to each person shown.",
+                    "parameters": self.schema(count)}}],
+                "tool_choice": {"type": "function", "function": {"name": TOOL_NAME}},
+            }
+        return {"response_format": {"type": "json_schema", "json_schema": {
+            "name": "posture_labels", "strict": True, "schema": self.schema(count)}}}
+
+    def prompt(self, prompt_text, count=1):
+        """Extends the prompt with the reply format; JSON mode needs it, the other modes benefit from it."""
+        codes = ", ".join(self.categories)
+        if count == 1:
+            shape = '{"labels": [<codes>]}'
+        else:
+            shape = (f'{{"images": [{{"image": 1, "labels": [<codes>]}}, ...]}} with one entry for each of the '
+                     f'{count} images, numbered in the order they are given')
+        return (f"{prompt_text}\n\nReply only with a JSON object of the form {shape}, using only these codes: "
+                f"{codes}.")
+
+    def validate_labels(self, labels):
+        """Returns the bitmask of a labels list, or None if it is not a list of known codes."""
+        if not isinstance(labels, list):
+            return None
+        mask = 0
+        for label in labels:
+            bit = self.bits.get(normalise_label(label)) if isinstance(label, str) else None
+            if bit is None:
+                return None
+            mask |= bit
+        return mask
+
+    def decode(self, result, count=1):
+        """Validates a reply and returns one bitmask per image, with None for invalid or missing answers."""
+        try:
+            reply = json.loads(reply_content(result))
+        except (ValueError, KeyError, IndexError, TypeError):
+            return [None] * count
+        if not isinstance(reply, dict):
+            return [None] * count
+        if count == 1 and "labels" in reply:
+            return [self.validate_labels(reply["labels"])]
+        masks = [None] * count
+        entries = reply.get("images")
+        if not isinstance(entries, list):
+            return masks
+        for entry in entries:
+            if not isinstance(entry, dict) or not isinstance(entry.get("image"), int):
+                continue
+            if 1 <= entry["image"] <= count:
+                masks[entry["image"] - 1] = self.validate_labels(entry.get("labels"))
+        return masks
+
+    def split(self, result, count=1):
+        """Returns one response per image with canonical {"labels": [...]} content, or None where invalid.
+
+        Like image_groups.split_group_result(), each response keeps the original
+        fields with an equal share of the token usage; grouped responses also get a
+        "group" entry with the group size and the image's position.
+        """
+        usage = result.get("usage", {})
+        results = []
+        for index, mask in enumerate(self.decode(result, count)):
+            if mask is None:
+                results.append(None)
+                continue
+            image_result = copy.deepcopy(result)
+            image_result["choices"] = image_result["choices"][:1]
+            image_result["choices"][0]["message"] = {
+                "role": "assistant", "content": json.dumps({"labels": decode_mask(mask, self.categories)})}
+            if count > 1:
+                image_result["usage"] = {key: round(value / count) for key, value in usage.items()
+                                         if isinstance(value, (int, float))}
+                image_result["group"] = {"size": count, "index": index}
+            results.append(image_result)
+        return results
@@ -0,0 +1,713 @@
+#!/usr/bin/env python3
+"""
+vision_client.py
+
+Provider-agnostic client for the chat-completions vision APIs, shared by the
+OpenAI and Azure image analysis scripts and the streaming pipeline. There is one
+request builder, one retry/rate-limit path and one output writer; the providers
+only differ in endpoint, authentication and cache key:
+
+- OpenAIProvider:     api.openai.com (or any endpoint speaking the same protocol),
+- AzureProvider:      one Azure OpenAI deployment,
+- CompatibleProvider: an OpenAI-compatible local server such as vLLM or llama.cpp.
+
+A client can hold several providers, e.g. deployments of the same model in
+different regions or with different keys. Each provider has its own rate limiter,
+requests go to the provider that is free soonest with the fewest requests in
+flight, and a request throttled or failed on one provider is retried right away
+on another one, so the usable quota is the sum of all providers.
+
+Batch runs can be configured in a JSON providers file:
+
+    [{"type": "azure", "api_base": "https://a.openai.azure.com/", "deployment": "gpt-4o",
+      "api_key_env": "AZURE_KEY_A", "requests_per_minute": 60},
+     {"type": "compatible", "base_url": "http://localhost:8000", "model": "llava"}]
+
+    python vision_client.py images/ --providers providers.json --prompt-file prompt.txt --output output
+
+The command-line options of this script and the two single-provider scripts
+(add_request_arguments()) can also be set in a --config file or in environment
+variables, VISION_* here (see cli_config.py); nothing is asked interactively.
+
+Requirements:
+    pip install requests
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from cli_config import parse_args_with_config, read_prompt
+from image_groups import chunked, group_prompt, split_group_result
+from image_preprocessing import MIME_TYPES, ImagePreprocessor, sniff_mime_type
+from metrics import METRICS_FILENAME, NULL_METRICS, ProgressLine, RunMetrics
+from rate_limit import AdaptiveRateLimiter, backoff_delay, estimate_request_tokens, parse_retry_after
+from request_body import InlineImage, build_json_body
+from response_cache import CACHE_FILENAME, ResponseCache
+from run_manifest import MANIFEST_FILENAME, RunManifest
+from structured_output import CATEGORY_CODES, STRUCTURED_MODES, StructuredOutput, has_reply_content, normalise_label
+
+OPENAI_ENDPOINT = "https://api.openai.com/v1/chat/completions"
+AZURE_API_VERSION = "2023-12-01-preview"
+DEFAULT_MODEL = "gpt-4-vision-preview"
+SYSTEM_PROMPT = "You are a helpful assistant"
+REQUEST_TIMEOUT = 120  # seconds
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+class Provider:
+    """One chat-completions endpoint with its credentials, model and rate limiter.
+
+    `limiter` is shared by every request sent to this provider; with None, nothing
+    is paced on the client side. Requests failing here are marked with a cool-down
+    so the client prefers the other providers for that long.
+    """
+
+    def __init__(self, name, endpoint, headers, model=DEFAULT_MODEL, limiter=None):
+        self.name = name
+        self.endpoint = endpoint
+        self.headers = {"Content-Type": "application/json", **headers}
+        self.model = model
+        self.limiter = limiter
+        self.in_flight = 0
+        self.unavailable_until = 0.0
+
+    def cache_params(self):
+        """Extra request parameters that distinguish this provider's responses in the cache."""
+        return {}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class OpenAIProvider(Provider):
+    """The OpenAI API, authenticated with a bearer key."""
+
+    def __init__(self, api_key, model=DEFAULT_MODEL, endpoint=OPENAI_ENDPOINT, limiter=None):
+        super().__init__("openai", endpoint, {"Authorization": f"Bearer {api_key}"}, model=model, limiter=limiter)
+
+
+class AzureProvider(Provider):
+    """One Azure OpenAI deployment; the deployment is part of the cache key."""
+
+    def __init__(self, api_base, deployment, api_key, model=DEFAULT_MODEL, api_version=AZURE_API_VERSION,
+                 limiter=None):
+        endpoint = (f"{api_base.rstrip('/')}/openai/deployments/{deployment}/chat/completions"
+                    f"?api-version={api_version}")
+        super().__init__(f"azure:{deployment}", endpoint, {"api-key": api_key}, model=model, limiter=limiter)
+        self.deployment = deployment
+
+    def cache_params(self):
+        return {"deployment": self.deployment}
+
+
+class CompatibleProvider(Provider):
+    """An OpenAI-compatible server such as vLLM or llama.cpp, at `<base_url>/v1/chat/completions`.
+
+    Local servers usually need no key; one is only sent if given.
+    """
+
+    def __init__(self, base_url, model, api_key=None, limiter=None):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        super().__init__(f"compatible:{base_url}", f"{base_url.rstrip('/')}/v1/chat/completions", headers,
+                         model=model, limiter=limiter)
+
+
+PROVIDER_TYPES = {"openai": OpenAIProvider, "azure": AzureProvider, "compatible": CompatibleProvider}
+
+
+def provider_from_config(config):
+    """Builds a provider from one entry of a providers file.
+
+    "type" selects the provider class and the other keys are its arguments. A key
+    can be read from an environment variable with "api_key_env", and the limiter is
+    set up from "requests_per_minute" and "tokens_per_minute".
+    """
+    config = dict(config)
+    provider_type = config.pop("type", "openai")
+    if provider_type not in PROVIDER_TYPES:
+        raise ValueError(f"Unknown provider type '{provider_type}', use one of {sorted(PROVIDER_TYPES)}.")
+    api_key_env = config.pop("api_key_env", None)
+    if api_key_env:
+        config["api_key"] = os.environ.get(api_key_env)
+        if not config["api_key"]:
+            raise ValueError(f"Environment variable {api_key_env} is not set.")
+    requests_per_minute = config.pop("requests_per_minute", None)
+    tokens_per_minute = config.pop("tokens_per_minute", None)
+    config["limiter"] = AdaptiveRateLimiter(requests_per_minute, tokens_per_minute)
+    return PROVIDER_TYPES[provider_type](**config)
+
+
+def load_providers(path):
+    """Loads a JSON list of provider configurations (see provider_from_config())."""
+    with open(path, "r") as providers_file:
+        configs = json.load(providers_file)
+    if isinstance(configs, dict):
+        configs = [configs]
+    return [provider_from_config(config) for config in configs]
+
+
+def save_output(result, image_path, output_directory, output_name=None, metrics=NULL_METRICS):
+    """Saves an API response as JSON named after the image (or `output_name` if given)."""
+    output_filename = output_name or f"{os.path.splitext(os.path.basename(image_path))[0]}.json"
+    output_filepath = os.path.join(output_directory, output_filename)
+
+    try:
+        with metrics.timer("json_write"), open(output_filepath, 'w') as output_file:
+            json.dump(result, output_file, indent=4)
+        print(f"Output saved to {output_filepath}")
+    except Exception as e:
+        print(f"Error saving output for image '{image_path}': {e}")
+
+
+def unique_output_names(image_paths):
+    """Maps each image to its JSON output name, keeping the extension where basenames collide."""
+    stems = {}
+    for image_path in image_paths:
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        stems[stem] = stems.get(stem, 0) + 1
+    output_names = {}
+    for image_path in image_paths:
+        name = os.path.basename(image_path)
+        stem = os.path.splitext(name)[0]
+        output_names[image_path] = f"{stem}.json" if stems[stem] == 1 else f"{name}.json"
+    return output_names
+
+
+class VisionClient:
+    """Sends images with a prompt to one or more providers and returns the parsed responses.
+
+    Rate limits (429), server errors (5xx) and connection errors are retried up to
+    `max_retries` times. The failing provider cools down for the backoff delay (at
+    least its Retry-After); the retry goes straight to another provider if one is
+    free, and otherwise waits for the first one to become free. If a `cache` is
+    given, a stored response for the same images and request parameters is
+    returned without calling the API. A `preprocessor` resizes and re-encodes
+    images before upload, and `metrics` records timings and counters.
+
+    With `structured` (a StructuredOutput), the reply is constrained to JSON listing
+    the category codes and validated. Invalid replies, and with or without structured
+    output replies that carry no content at all, are not cached, and batch runs
+    send the images with invalid answers again up to `invalid_retries` times.
+    """
+
+    def __init__(self, providers, max_tokens=300, temperature=0.1, system_prompt=SYSTEM_PROMPT, max_retries=5,
+                 cache=None, preprocessor=None, metrics=NULL_METRICS, structured=None, invalid_retries=2):
+        if isinstance(providers, Provider):
+            providers = [providers]
+        if not providers:
+            raise ValueError("At least one provider is required.")
+        self.providers = list(providers)
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.system_prompt = system_prompt
+        self.max_retries = max_retries
+        self.cache = cache
+        self.preprocessor = preprocessor
+        self.metrics = metrics
+        self.structured = structured
+        self.invalid_retries = invalid_retries
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def with_options(self, **options):
+        """Returns a copy sharing the providers (and their limiters) with some options replaced."""
+        client = copy.copy(self)
+        for name, value in options.items():
+            if not hasattr(self, name):
+                raise TypeError(f"Unknown client option '{name}'.")
+            setattr(client, name, value)
+        return client
+
+    def cache_key(self, prompt_text, images, max_tokens, provider=None):
+        """Hashes the images and request parameters with the model and parameters of `provider` (default: the first)."""
+        provider = provider or self.providers[0]
+        cache_params = provider.cache_params()
+        if self.preprocessor is not None:
+            cache_params["preprocess"] = self.preprocessor.settings()
+        if len(images) > 1:
+            cache_params["image_sizes"] = [len(image_bytes) for image_bytes in images]
+        if self.structured is not None:
+            cache_params["structured"] = self.structured.mode
+        return ResponseCache.make_key(images, prompt_text, provider.model, max_tokens, self.temperature,
+                                      **cache_params)
+
+    def build_content(self, prompt_text, images):
+        """Returns the user message content and the estimated tokens of the most expensive image (or None).
+
+        The images stay raw bytes (InlineImage) until build_body() encodes them into the request body.
+        """
+        content = [{"type": "text", "text": prompt_text}]
+        image_tokens = None
+        for image_bytes in images:
+            mime_type, detail = sniff_mime_type(image_bytes), "high"
+            if self.preprocessor is not None:
+                image_bytes, mime_type, detail, tokens = self.preprocessor.process(image_bytes)
+                # The most expensive image sets the estimate so the token budget is never undercounted.
+                image_tokens = max(image_tokens or 0, tokens)
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": InlineImage(image_bytes, mime_type),
+                    "detail": detail
+                }
+            })
+        return content, image_tokens
+
+    def build_body(self, provider, content, max_tokens, count=1):
+        """Serialises the request body for one provider, base64-encoding the images straight into it."""
+        data = {
+            "model": provider.model,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": content}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": self.temperature
+        }
+        if self.structured is not None:
+            data.update(self.structured.request_fields(count))
+        return build_json_body(data)
+
+    def _acquire_provider(self):
+        """Picks the provider that is free soonest, then with the fewest requests in flight, round-robin on ties."""
+        with self._lock:
+            now = time.monotonic()
+            count = len(self.providers)
+            order = [self.providers[(self._next + offset) % count] for offset in range(count)]
+            provider = min(order, key=lambda p: (max(0.0, p.unavailable_until - now), p.in_flight))
+            self._next = (self.providers.index(provider) + 1) % count
+            provider.in_flight += 1
+            return provider, max(0.0, provider.unavailable_until - now)
+
+    def _release_provider(self, provider, cool_down=None):
+        with self._lock:
+            provider.in_flight -= 1
+            if cool_down:
+                provider.unavailable_until = max(provider.unavailable_until, time.monotonic() + cool_down)
+
+    def analyze_images(self, prompt_text, images, stats=None, label="image", max_tokens=None):
+        """Sends one or more images (as encoded bytes) in a single request and returns the parsed response.
+
+        Returns None if the request failed; `label` names the images in log messages.
+        If a `stats` dict is given it receives the number of API attempts made,
+        whether the cache answered, the provider that answered and, with structured
+        output, the number of images without a valid answer.
+        """
+        metrics = self.metrics
+        max_tokens = max_tokens or self.max_tokens
+        if stats is None:
+            stats = {}
+        stats["attempts"] = 0
+        stats["cached"] = False
+        stats["invalid"] = 0
+        if self.structured is not None:
+            prompt_text = self.structured.prompt(prompt_text, len(images))
+        if self.cache is not None:
+            # Answers are stored under the model of the provider that gave them; any provider's answer will do.
+            cache_keys = [self.cache_key(prompt_text, images, max_tokens, provider) for provider in self.providers]
+            result = self.cache.get_any(list(dict.fromkeys(cache_keys)))
+            if result is not None:
+                stats["cached"] = True
+                metrics.count("cache_hits")
+                return result
+
+        with metrics.timer("encode"):
+            content, image_tokens = self.build_content(prompt_text, images)
+        estimated_tokens = estimate_request_tokens(prompt_text, max_tokens, images=len(images),
+                                                   image_tokens=image_tokens)
+        body, body_provider = None, None
+
+        for attempt in range(self.max_retries + 1):
+            provider, wait = self._acquire_provider()
+            cool_down = None
+            try:
+                if wait > 0:
+                    # Every provider is cooling down; wait for the first one to become free.
+                    with metrics.timer("retry_sleep"):
+                        time.sleep(wait)
+                if body_provider is not provider:
+                    # Only one body is kept; it is rebuilt when a retry moves to another provider.
+                    body = None
+                    with metrics.timer("encode"):
+                        body = self.build_body(provider, content, max_tokens, len(images))
+                    body_provider = provider
+                if provider.limiter is not None:
+                    with metrics.timer("limiter_wait"):
+                        provider.limiter.acquire(estimated_tokens)
+                stats["attempts"] += 1
+                metrics.count("requests")
+                metrics.count("bytes_sent", len(body))
+                retry_after = None
+                try:
+                    with metrics.timer("network"):
+                        response = requests.post(provider.endpoint, headers=provider.headers, data=body,
+                                                 timeout=REQUEST_TIMEOUT)
+                    if provider.limiter is not None:
+                        provider.limiter.update_from_headers(response.headers)
+                    response.raise_for_status()
+                    result = response.json()
+                except requests.exceptions.HTTPError as e:
+                    if response.status_code == 429:  # Too Many Requests
+                        retry_after = parse_retry_after(response.headers)
+                        if provider.limiter is not None:
+                            provider.limiter.record_throttle(retry_after)
+                        metrics.count("throttled")
+                        reason = "Rate limit exceeded"
+                    elif response.status_code >= 500:
+                        retry_after = parse_retry_after(response.headers)
+                        metrics.count("server_errors")
+                        reason = f"Server error {response.status_code}"
+                    else:
+                        print(f"Error processing image '{label}' on {provider.name}: {e}")
+                        return None
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    metrics.count("connection_errors")
+                    reason = f"Connection error ({e})"
+                except ValueError as e:
+                    # A gateway answering 200 with HTML or a truncated body is treated like a server error.
+                    metrics.count("server_errors")
+                    reason = f"Unreadable response ({e})"
+                else:
+                    stats["provider"] = provider.name
+                    break
+                cool_down = backoff_delay(attempt, retry_after)
+                if attempt < self.max_retries:
+                    metrics.count("retries")
+                    if len(self.providers) > 1:
+                        metrics.count("failovers")
+                        print(f"{reason} for image '{label}' on {provider.name}. "
+                              f"Retrying on the next free provider...")
+                    else:
+                        print(f"{reason} for image '{label}'. Retrying in {cool_down:.1f} seconds...")
+            finally:
+                self._release_provider(provider, cool_down)
+        else:
+            print(f"Failed to process image '{label}' after {self.max_retries} retries.")
+            return None
+
+        for key, value in result.get('usage', {}).items():
+            if isinstance(value, int):
+                metrics.count(key, value)
+        if provider.limiter is not None:
+            provider.limiter.record_success()
+            provider.limiter.record_usage(estimated_tokens, result.get('usage', {}).get('total_tokens'))
+
+        if self.structured is not None:
+            stats["invalid"] = sum(1 for mask in self.structured.decode(result, len(images)) if mask is None)
+            reason = "Invalid structured reply"
+        else:
+            stats["invalid"] = 0 if has_reply_content(result) else len(images)
+            reason = "Empty reply"
+        if stats["invalid"]:
+            metrics.count("invalid_replies")
+            print(f"{reason} for {stats['invalid']} of {len(images)} images in '{label}'.")
+        if self.cache is not None and not stats["invalid"]:
+            self.cache.put(cache_keys[self.providers.index(provider)], result)
+        return result
+
+    def analyze_image_bytes(self, prompt_text, image_bytes, stats=None, label="image"):
+        """Sends an image (as encoded bytes) and returns the parsed response, or None on failure.
+
+        With structured output, the response has canonical {"labels": [...]} content.
+        None is returned for an invalid reply, including one without any content.
+        """
+        stats = {} if stats is None else stats
+        result = self.analyze_images(prompt_text, [image_bytes], stats=stats, label=label)
+        if result is None or stats["invalid"]:
+            return None
+        if self.structured is not None:
+            return self.structured.split(result)[0]
+        return result
+
+    def process_image(self, prompt_text, image_path, output_directory, output_name=None, stats=None):
+        """Processes an image and saves the response as JSON.
+
+        Returns the parsed API response, or None if the image could not be processed.
+        """
+        with open(image_path, "rb") as image_file:
+            image_bytes = image_file.read()
+        result = self.analyze_image_bytes(prompt_text, image_bytes, stats=stats, label=image_path)
+        if result is not None:
+            save_output(result, image_path, output_directory, output_name, metrics=self.metrics)
+        return result
+
+    def process_image_group(self, prompt_text, image_paths, output_directory, output_names=None, stats=None):
+        """Sends several images in one request and saves a separate JSON response for each.
+
+        The prompt is extended to ask for one numbered answer per image and `max_tokens`
+        applies per image. Returns the parsed response for each image, with None for
+        images that failed or were missing from the reply.
+        """
+        stats = {} if stats is None else stats
+        images = []
+        for image_path in image_paths:
+            with open(image_path, "rb") as image_file:
+                images.append(image_file.read())
+        label = f"{image_paths[0]} (+{len(image_paths) - 1} more)"
+        if self.structured is None:
+            # Structured output asks for its own per-image JSON format instead of numbered lines.
+            prompt_text = group_prompt(prompt_text, len(images))
+        result = self.analyze_images(prompt_text, images, stats=stats, label=label,
+                                     max_tokens=self.max_tokens * len(images))
+        if result is None:
+            return [None] * len(image_paths)
+        if self.structured is not None:
+            results = self.structured.split(result, len(image_paths))
+        elif stats["invalid"]:
+            results = [None] * len(image_paths)
+        else:
+            results = split_group_result(result, len(image_paths))
+        for image_path, image_result in zip(image_paths, results):
+            if image_result is None:
+                print(f"No answer for image '{image_path}' in the grouped reply.")
+                continue
+            save_output(image_result, image_path, output_directory, (output_names or {}).get(image_path),
+                        metrics=self.metrics)
+        return results
+
+    def process_directory(self, prompt_text, directory_path, output_directory, max_workers=1, use_cache=True,
+                          cache_path=None, group_size=1, collect_metrics=False, progress_interval=None):
+        """Processes all images in a directory and saves outputs as JSON files.
+
+        Up to `max_workers` requests are in flight at once, spread over the providers
+        and paced by their limiters. With `use_cache`, responses are stored in an
+        on-disk cache (by default inside the output directory) so re-runs over the
+        same images do not call the API again. Each outcome is appended to a run
+        manifest in the output directory; a restarted run skips images already
+        completed and retries only the failed ones. With `group_size` above 1, that
+        many images are sent per request and the reply is split back into one JSON
+        file per image. Images whose answer was invalid (or empty, without structured
+        output) are recorded as "invalid" and sent again, without the valid ones, for up to
+        `invalid_retries` more rounds. With `collect_metrics`, stage timings and counters are written
+        to run_metrics.json in the output directory; `progress_interval` prints a
+        progress line with ETA every that many seconds.
+        Returns the number of images processed successfully in this run.
+        """
+        if not os.path.exists(output_directory):
+            os.makedirs(output_directory)
+
+        image_paths = [entry.path for entry in os.scandir(directory_path)
+                       if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)]
+        output_names = unique_output_names(image_paths)
+        manifest = RunManifest(os.path.join(output_directory, MANIFEST_FILENAME))
+        pending = [image_path for image_path in image_paths if not manifest.is_done(os.path.basename(image_path))]
+        if len(pending) < len(image_paths):
+            print(f"Skipping {len(image_paths) - len(pending)} images already completed in an earlier run.")
+        cache = ResponseCache(cache_path or os.path.join(output_directory, CACHE_FILENAME)) if use_cache else None
+        metrics = RunMetrics(output_directory) if collect_metrics else NULL_METRICS
+        client = self.with_options(cache=cache, metrics=metrics)
+        invalid = []
+
+        def record(image_path, result, stats, request_start, **fields):
+            image = os.path.basename(image_path)
+            if result is not None:
+                status = "done"
+            else:
+                status = "invalid" if stats.get("invalid") else "failed"
+            if status == "invalid":
+                invalid.append(image_path)
+            metrics.count("images_processed")
+            metrics.count(f"images_{status}")
+            metrics.observe("image", time.time() - request_start)
+            manifest.record(image, status,
+                            attempts=manifest.attempts(image) + stats.get("attempts", 0),
+                            latency=round(time.time() - request_start, 3),
+                            total_tokens=(result or {}).get("usage", {}).get("total_tokens"),
+                            cached=stats.get("cached", False), output=output_names[image_path],
+                            provider=stats.get("provider"), **fields)
+
+        def run(image_path):
+            stats = {}
+            request_start = time.time()
+            try:
+                result = client.process_image(prompt_text, image_path, output_directory,
+                                              output_name=output_names[image_path], stats=stats)
+            except Exception as e:
+                print(f"Error processing image '{image_path}': {e}")
+                result = None
+            record(image_path, result, stats, request_start)
+            return [result]
+
+        def run_group(group):
+            stats = {}
+            request_start = time.time()
+            try:
+                results = client.process_image_group(prompt_text, group, output_directory, output_names=output_names,
+                                                     stats=stats)
+            except Exception as e:
+                print(f"Error processing images '{group[0]}' and {len(group) - 1} more: {e}")
+                results = [None] * len(group)
+            for image_path, result in zip(group, results):
+                record(image_path, result, stats, request_start, group=len(group))
+            return results
+
+        start_time = time.time()
+        succeeded = 0
+        request_count = 0
+        batch = pending
+        with ProgressLine(metrics, "images_processed", len(pending), progress_interval, unit="images") as progress, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for round_number in range(self.invalid_retries + 1):
+                if round_number:
+                    if not invalid:
+                        break
+                    # Only the images whose answers were invalid are sent again.
+                    batch = list(invalid)
+                    invalid.clear()
+                    # Re-sent images are processed (and counted) again, so they extend the progress total.
+                    progress.total += len(batch)
+                    print(f"Re-sending {len(batch)} images with invalid replies.")
+                if group_size > 1:
+                    futures = [executor.submit(run_group, group) for group in chunked(batch, group_size)]
+                else:
+                    futures = [executor.submit(run, image_path) for image_path in batch]
+                request_count += len(futures)
+                for future in as_completed(futures):
+                    succeeded += sum(1 for result in future.result() if result is not None)
+
+        elapsed_time = time.time() - start_time
+        rate = succeeded * 60 / elapsed_time if elapsed_time > 0 else 0.0
+        print(f"Processed {succeeded}/{len(pending)} images in {request_count} requests in {elapsed_time:.1f} seconds "
+              f"({rate:.1f} images/minute).")
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
+        if self.preprocessor is not None:
+            print(self.preprocessor.summary())
+        counts = manifest.counts()
+        print(f"Run manifest: {counts.get('done', 0)} done, {counts.get('failed', 0)} failed, "
+              f"{counts.get('invalid', 0)} invalid ({manifest.path}).")
+        manifest.close()
+        if metrics.enabled:
+            metrics.write(os.path.join(output_directory, METRICS_FILENAME))
+            print(f"Run metrics saved to {os.path.join(output_directory, METRICS_FILENAME)}.")
+        return succeeded
+
+
+def print_single_image(client, prompt_text, image_path):
+    """Processes a single image and prints the response."""
+    try:
+        with open(image_path, "rb") as image_file:
+            result = client.analyze_image_bytes(prompt_text, image_file.read(), label=image_path)
+    except Exception as e:
+        print(f"Error processing image: {e}")
+        return
+    if result is not None:
+        print(json.dumps(result, indent=4))
+
+
+def add_request_arguments(parser, workers=8):
+    """Adds the prompt, request, batch and output options shared by the image analysis scripts."""
+    parser.add_argument("--prompt", help="Prompt text.")
+    parser.add_argument("--prompt-file", help="File containing the prompt text.")
+    parser.add_argument("--output", default="output", help="Output directory for the JSON files.")
+    parser.add_argument("--workers", type=int, default=workers, help="Maximum concurrent requests.")
+    parser.add_argument("--max-tokens", type=int, default=300)
+    parser.add_argument("--temperature", type=float, default=0.1)
+    parser.add_argument("--group-size", type=int, default=1, help="Images per request.")
+    parser.add_argument("--max-side", type=int, help="Downscale images to this longer side before upload.")
+    parser.add_argument("--upload-format", choices=sorted(MIME_TYPES), default="jpeg",
+                        help="With --max-side, the format images are re-encoded to.")
+    parser.add_argument("--upload-quality", type=int, default=85, help="With --max-side, the encoding quality.")
+    parser.add_argument("--no-auto-detail", action="store_true",
+                        help="With --max-side, send small images with detail 'high' too.")
+    parser.add_argument("--structured", choices=STRUCTURED_MODES,
+                        help="Request JSON labels with this mode and re-send invalid replies.")
+    parser.add_argument("--categories", nargs="+", type=normalise_label, default=list(CATEGORY_CODES),
+                        help="With --structured, the category codes replies may use.")
+    parser.add_argument("--invalid-retries", type=int, default=2, help="Rounds re-sending invalid replies.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse or store cached responses.")
+    parser.add_argument("--metrics", action="store_true", help="Save run_metrics.json in the output directory.")
+    parser.add_argument("--progress-interval", type=float,
+                        help="With --metrics, print a progress line with ETA every N seconds.")
+
+
+def check_request_arguments(parser, args, path):
+    """Ends with a usage error unless `path` exists, a prompt is given and the request options are in range."""
+    if not os.path.exists(path):
+        parser.error(f"'{path}' does not exist")
+    if not args.prompt and not args.prompt_file:
+        parser.error("one of --prompt or --prompt-file is required")
+    if args.prompt_file and not os.path.isfile(args.prompt_file):
+        parser.error(f"prompt file '{args.prompt_file}' does not exist")
+    for name, value, low in (("--workers", args.workers, 1), ("--max-tokens", args.max_tokens, 1),
+                             ("--group-size", args.group_size, 1), ("--max-side", args.max_side, 1),
+                             ("--upload-quality", args.upload_quality, 1), ("--invalid-retries", args.invalid_retries, 0)):
+        if value is not None and value < low:
+            parser.error(f"{name} must be at least {low}")
+    if args.upload_quality > 100:
+        parser.error("--upload-quality must be at most 100")
+    if not 0 <= args.temperature <= 2:
+        parser.error("--temperature must be between 0 and 2")
+    if not 1 <= len(args.categories) <= 63:
+        parser.error("--categories must list between 1 and 63 codes")
+    if args.progress_interval is not None:
+        if args.progress_interval <= 0:
+            parser.error("--progress-interval must be positive")
+        if not args.metrics:
+            parser.error("--progress-interval requires --metrics")
+
+
+def preprocessor_from_args(args):
+    """Returns the ImagePreprocessor selected by add_request_arguments() options, or None."""
+    if not args.max_side:
+        return None
+    return ImagePreprocessor(max_side=args.max_side, image_format=args.upload_format, quality=args.upload_quality,
+                             auto_detail=not args.no_auto_detail)
+
+
+def structured_from_args(args):
+    """Returns the StructuredOutput selected by add_request_arguments() options, or None."""
+    if not args.structured:
+        return None
+    return StructuredOutput(args.categories, mode=args.structured)
+
+
+def run_request_arguments(client, args, prompt_text, path):
+    """Prints the reply for a single image file, or processes a directory as configured by the options."""
+    if os.path.isfile(path):
+        print_single_image(client, prompt_text, path)
+        return 0
+    client.process_directory(prompt_text, path, args.output, max_workers=args.workers, use_cache=not args.no_cache,
+                             group_size=args.group_size, collect_metrics=args.metrics,
+                             progress_interval=args.progress_interval)
+    return 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Analyze a directory of images with one or more vision providers.")
+    parser.add_argument("directory", help="Directory of images to analyze, or a single image to print the reply for.")
+    parser.add_argument("--providers", required=True, help="JSON file listing the providers.")
+    add_request_arguments(parser)
+    args = parse_args_with_config(parser, argv, "VISION")
+    check_request_arguments(parser, args, args.directory)
+    if not os.path.isfile(args.providers):
+        parser.error(f"providers file '{args.providers}' does not exist")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    prompt_text = read_prompt(args)
+    try:
+        providers = load_providers(args.providers)
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Invalid providers file '{args.providers}': {e}")
+        return 1
+    print(f"Using {len(providers)} providers: {', '.join(provider.name for provider in providers)}")
+    client = VisionClient(providers, max_tokens=args.max_tokens, temperature=args.temperature,
+                          preprocessor=preprocessor_from_args(args), structured=structured_from_args(args),
+                          invalid_retries=args.invalid_retries)
+    return run_request_arguments(client, args, prompt_text, args.directory)
+
+
+if __name__ == '__main__':
+    sys.exit(main())